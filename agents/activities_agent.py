@@ -1,29 +1,83 @@
 import os
-from amadeus import Client, ResponseError
-
-def init_amadeus():
-    amadeus_api_key = os.getenv("AMADEUS_API_KEY")
-    amadeus_api_secret = os.getenv("AMADEUS_API_SECRET")
-    
-    amadeus = Client(
-        client_id=amadeus_api_key,
-        client_secret=amadeus_api_secret,
-        hostname ="production"
-    )
-    return amadeus
+from concurrent.futures import ThreadPoolExecutor
+from amadeus import ResponseError
+from helpers.amadeus_pool import get_amadeus
+from helpers.response_cache import cached
+from helpers.metrics import traced, incr, bind
+from helpers.resilience import call, ResilienceError
+from helpers.scheduler import scheduled
+from helpers.geo import haversine_km, geohash_bbox, covering_tiles, tile_precision
 
-def find_activities(lat, lon, radius_km=3):
+# Activities are fetched and cached per geohash tile, so nearby searches
+# share their upstream calls. Tiles are sized to the search radius (the
+# app's 5 km searches use precision 4, about 20 x 39 km, and touch one or
+# two tiles); TRAVELBOT_ACTIVITY_TILE_PRECISION pins a precision instead.
+TILE_PRECISION = os.getenv("TRAVELBOT_ACTIVITY_TILE_PRECISION")
+# by-square calls are only made for boxes up to this coarse
+COARSEST_TILE_PRECISION = 4
+
+_tile_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TRAVELBOT_ACTIVITY_WORKERS", "8")),
+    thread_name_prefix="activity-tiles"
+)
+
+
+@cached("activity_tile")
+@scheduled("activities")
+def get_tile_activities(tile: str):
     """
-    Use Amadeus Tours & Activities around a lat/lon.
+    Use Amadeus Tours & Activities by square for one geohash tile.
+    Returns {"activities": [...]} (possibly empty), or None on error so
+    failures are never cached.
     """
-    amadeus = init_amadeus()
+    south, west, north, east = geohash_bbox(tile)
+    amadeus = get_amadeus()
     try:
-        response = amadeus.shopping.activities.get(
-            latitude=lat,
-            longitude=lon,
-            radius=radius_km
+        response = call(
+            "activities", amadeus.shopping.activities.by_square.get,
+            north=north,
+            west=west,
+            south=south,
+            east=east
         )
-        return response.data
-    except ResponseError as e:
+        return {"activities": response.data or []}
+    except (ResponseError, ResilienceError) as e:
         print(f"Amadeus Activities Query Error: {e}")
-        return []
+        incr("errors", op="get_tile_activities")
+        return None
+
+
+def _position(activity):
+    geo = activity.get("geoCode") or {}
+    try:
+        return float(geo["latitude"]), float(geo["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+@traced("find_activities")
+def find_activities(lat, lon, radius_km=3):
+    """
+    Activities within 'radius_km' of lat/lon, nearest first.
+
+    The circle is covered with geohash tiles as wide as its diameter;
+    cached tiles are read locally and only the missing ones are fetched
+    (in parallel). Results are filtered by actual distance and deduplicated
+    by activity ID.
+    """
+    precision = (int(TILE_PRECISION) if TILE_PRECISION
+                 else tile_precision(lat, radius_km, COARSEST_TILE_PRECISION))
+    tiles = covering_tiles(lat, lon, radius_km, precision)
+    futures = [_tile_executor.submit(bind(get_tile_activities), tile) for tile in tiles]
+
+    found = {}
+    for future in futures:
+        for activity in (future.result() or {}).get("activities", []):
+            position = _position(activity)
+            if position is None or activity.get("id") in found:
+                continue
+            distance = haversine_km(lat, lon, *position)
+            if distance <= radius_km:
+                found[activity.get("id")] = (distance, activity)
+    incr("activity_tiles", len(tiles))
+    return [activity for _, activity in sorted(found.values(), key=lambda pair: pair[0])]
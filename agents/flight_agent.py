@@ -1,27 +1,55 @@
 import os
-from amadeus import Client, ResponseError
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from amadeus import ResponseError
+from helpers.amadeus_pool import get_amadeus
+from helpers.response_cache import cached
+from helpers.airport_index import get_airport_index, fold
+from helpers.offers import OfferSet, parse_flight_offers
+from helpers.metrics import traced, incr, bind
+from helpers.resilience import call, ResilienceError
+from helpers.scheduler import scheduled
 
+# Offers requested per search; filtering and ranking happen locally
+# (helpers.flight_ranking), so one search serves every re-sort
+MAX_OFFERS = int(os.getenv("AMADEUS_FLIGHT_MAX_OFFERS", "250"))
+# The date grid only needs the cheapest few per cell
+FLEX_MAX_OFFERS = 20
+# Airports searched on each side in nearby mode; 3 x 3 routes fit in the
+# burst of the default flight search rate, so they all start at once
+NEARBY_AIRPORTS = int(os.getenv("AMADEUS_NEARBY_AIRPORTS", "3"))
 
-def init_amadeus():
-    amadeus_api_key = os.getenv("AMADEUS_API_KEY")
-    amadeus_api_secret = os.getenv("AMADEUS_API_SECRET")
-    
-    amadeus = Client(
-        client_id=amadeus_api_key,
-        client_secret=amadeus_api_secret,
-        hostname ="production"
-    )
-    return amadeus
+_flex_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AMADEUS_FLEX_WORKERS", "8")),
+    thread_name_prefix="flex-search"
+)
 
-#https://developers.amadeus.com/self-service/category/flights/api-doc/airline-code-lookup/api-reference
+@traced("guess_airport_code")
 def guess_airport_code(place_query: str):
+    """
+    Return the best IATA city/airport code for 'place_query', or None.
+    The bundled airport index answers confident matches locally; only
+    unknown or ambiguous places go to the Amadeus API.
+    """
+    code = get_airport_index().guess_code(place_query)
+    if code:
+        return code
+    return lookup_airport_code(place_query)
+
+#https://developers.amadeus.com/self-service/category/flights/api-doc/airline-code-lookup/api-reference
+@traced("lookup_airport_code")
+@cached("airport_code")
+@scheduled("airport_code")
+def lookup_airport_code(place_query: str):
     """
     Use Amadeus reference_data.locations to find possible airport/city codes
-    that match 'place_query'. Return the first IATA code or None if not found.
+    that match 'place_query'. Prefer a CITY whose name matches the query,
+    otherwise return the first IATA code, or None if not found.
     """
-    amadeus = init_amadeus()
+    amadeus = get_amadeus()
     try:
-        response = amadeus.reference_data.locations.get(
+        response = call(
+            "airport_code", amadeus.reference_data.locations.get,
             keyword=place_query,
             subType="AIRPORT,CITY",
             page={"limit": 5}  # optionally increase/decrease
@@ -29,18 +57,25 @@ def guess_airport_code(place_query: str):
         data = response.data
         if not data:
             return None
-        # Just pick the first match for demonstration
+        wanted = fold(place_query.split(",")[0])
+        for loc in data:
+            if loc.get("subType") == "CITY" and fold(loc.get("name", "")) == wanted:
+                return loc.get("iataCode")
         return data[0].get("iataCode")
-    except ResponseError as e:
+    except (ResponseError, ResilienceError) as e:
         print(f"Error guessing airport code for '{place_query}': {e}")
+        incr("errors", op="lookup_airport_code")
         return None
 
+@traced("find_flights")
+@cached("flight_offers")
+@scheduled("flight_offers")
 def find_flights(origin_code, dest_code, departure_date,
-                  return_date=None, max_price=None):
+                  return_date=None, max_price=None, max_offers=MAX_OFFERS):
     """
     Query the Amadeus Flight Offers Search API for flights.
     """
-    amadeus = init_amadeus()
+    amadeus = get_amadeus()
     try:
         flight_params = {
             "originLocationCode": origin_code,
@@ -48,16 +83,110 @@ def find_flights(origin_code, dest_code, departure_date,
             "departureDate": departure_date,
             "adults": 1,
             "currencyCode": "USD",
-            "max": 5
+            "max": max_offers
         }
         if return_date:
             flight_params["returnDate"] = return_date
         if max_price:
             flight_params["maxPrice"] = max_price
 
-        response = amadeus.shopping.flight_offers_search.get(**flight_params)
+        response = call("flight_offers", amadeus.shopping.flight_offers_search.get, **flight_params)
         return response.data
-    except ResponseError as e:
+    except (ResponseError, ResilienceError) as e:
         print(f"Amadeus Flight Query Error: {e}")
+        incr("errors", op="find_flights")
         print(flight_params)
         return []
+
+
+@traced("find_flexible_flights")
+def find_flexible_flights(origin_code, dest_code, departure_date,
+                          return_date=None, days=3, max_price=None):
+    """
+    Search every departure/return pair within +/- 'days' of the requested
+    dates concurrently, under the flight search rate limit. Cells already
+    in the response cache cost nothing.
+
+    Returns a dict with:
+      departure_dates / return_dates: the grid axes (return_dates is [None]
+        for one-way trips)
+      prices: rows per departure date, columns per return date; the cheapest
+        fare for that cell, or None
+      best: {(departure, return): cheapest FlightOffer}
+      cheapest: the (departure, return) cell with the lowest fare, or None
+    """
+    dep0 = date.fromisoformat(departure_date)
+    offsets = range(-days, days + 1)
+    today = date.today()
+    departures = [(dep0 + timedelta(d)).isoformat() for d in offsets if dep0 + timedelta(d) >= today]
+    if return_date:
+        ret0 = date.fromisoformat(return_date)
+        returns = [(ret0 + timedelta(d)).isoformat() for d in offsets]
+    else:
+        returns = [None]
+
+    cells = [(dep, ret) for dep in departures for ret in returns if ret is None or ret > dep]
+    futures = {
+        cell: _flex_executor.submit(bind(find_flights), origin_code, dest_code, cell[0], cell[1],
+                                    max_price, FLEX_MAX_OFFERS)
+        for cell in cells
+    }
+
+    best = {}
+    seen = set()
+    for cell, future in futures.items():
+        cheapest = None
+        for offer in parse_flight_offers(future.result()):
+            signature = offer.signature()
+            if offer.price is None or signature in seen:
+                continue
+            seen.add(signature)
+            if cheapest is None or offer.price < cheapest.price:
+                cheapest = offer
+        if cheapest is not None:
+            best[cell] = cheapest
+
+    prices = [[best[(dep, ret)].price if (dep, ret) in best else None for ret in returns]
+              for dep in departures]
+    return {
+        "departure_dates": departures,
+        "return_dates": returns,
+        "prices": prices,
+        "best": best,
+        "cheapest": min(best, key=lambda c: best[c].price) if best else None,
+    }
+
+
+@traced("find_nearby_flights")
+def find_nearby_flights(origin_code, dest_code, departure_date,
+                        return_date=None, radius_km=100, max_price=None):
+    """
+    Search every route between the airports within 'radius_km' of the
+    origin and of the destination concurrently, under the flight search
+    rate limit, and merge the results into one OfferSet, cheapest first.
+    The same journey and fare returned by more than one search is kept
+    once. Offer IDs are prefixed with their route ("DTW-LIS-12"), since
+    each response numbers its offers from 1.
+    """
+    index = get_airport_index()
+    origins = index.nearby_airports(origin_code, radius_km, NEARBY_AIRPORTS)
+    destinations = index.nearby_airports(dest_code, radius_km, NEARBY_AIRPORTS)
+    routes = [(o, d) for o in origins for d in destinations if o != d]
+    futures = [
+        _flex_executor.submit(bind(find_flights), o, d, departure_date, return_date, max_price)
+        for o, d in routes
+    ]
+
+    offers = []
+    seen = set()
+    for (o, d), future in zip(routes, futures):
+        for offer in parse_flight_offers(future.result()):
+            signature = offer.signature()
+            if signature in seen:
+                continue
+            seen.add(signature)
+            offer.id = f"{o}-{d}-{offer.id}"
+            offers.append(offer)
+    incr("nearby_routes", len(routes))
+    offers.sort(key=lambda offer: (offer.price is None, offer.price or 0))
+    return OfferSet(offers)
@@ -1,47 +1,58 @@
 import os
-from amadeus import Client, ResponseError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from amadeus import ResponseError
+from helpers.amadeus_pool import get_amadeus
+from helpers.response_cache import cached
+from helpers.offers import OfferSet, parse_hotel_offers
+from helpers.metrics import traced, incr, bind
+from helpers.resilience import call, ResilienceError
+from helpers.scheduler import scheduled
 
+# Hotel IDs sent per Hotel Search request, and how many such requests may
+# be in flight at once across the whole process
+HOTEL_IDS_PER_REQUEST = int(os.getenv("AMADEUS_HOTEL_IDS_PER_REQUEST", "20"))
+BULK_MAX_WORKERS = int(os.getenv("AMADEUS_HOTEL_BULK_WORKERS", "4"))
 
-def init_amadeus():
-    amadeus_api_key = os.getenv("AMADEUS_API_KEY")
-    amadeus_api_secret = os.getenv("AMADEUS_API_SECRET")
-    
-    amadeus = Client(
-        client_id=amadeus_api_key,
-        client_secret=amadeus_api_secret,
-        hostname ="production"
-    )
-    return amadeus
+_bulk_executor = ThreadPoolExecutor(max_workers=BULK_MAX_WORKERS, thread_name_prefix="hotel-offers")
 
 #https://developers.amadeus.com/self-service/category/hotels/api-doc/hotel-list/api-reference
+@traced("get_hotels_in_city")
+@cached("hotel_list")
+@scheduled("hotel_list")
 def get_hotels_in_city(city_code: str, radius_km=10):
     """
     Use reference_data.locations.hotels.by_city to list hotels in that city.
     Returns a list of hotels (each has a 'hotelId').
     """
-    amadeus = init_amadeus()
+    amadeus = get_amadeus()
     try:
-        response = amadeus.reference_data.locations.hotels.by_city.get(
+        response = call(
+            "hotel_list", amadeus.reference_data.locations.hotels.by_city.get,
             cityCode=city_code,
             radius=radius_km,
             radiusUnit="KM"
         )
         return response.data  # list of hotels
-    except ResponseError as e:
+    except (ResponseError, ResilienceError) as e:
         print(f"Error retrieving hotels by city: {e}")
+        incr("errors", op="get_hotels_in_city")
         return []
     
 #https://developers.amadeus.com/self-service/category/hotels/api-doc/hotel-search/api-reference
+@traced("get_hotel_offers")
+@cached("hotel_offers")
+@scheduled("hotel_offers")
 def get_hotel_offers(hotel_ids, check_in, check_out, adults=1, rooms=1):
     """
     Fetch actual offers for the given hotel(s) using the v3 Hotel Search endpoint.
     """
-    amadeus = init_amadeus()
+    amadeus = get_amadeus()
     if not hotel_ids:
         return []
 
     try:
-        response = amadeus.shopping.hotel_offers_search.get(
+        response = call(
+            "hotel_offers", amadeus.shopping.hotel_offers_search.get,
             hotelIds=",".join(hotel_ids),
             checkInDate=check_in,
             checkOutDate=check_out,
@@ -50,6 +61,50 @@ def get_hotel_offers(hotel_ids, check_in, check_out, adults=1, rooms=1):
             currency="USD"
         )
         return response.data
-    except ResponseError as e:
+    except (ResponseError, ResilienceError) as e:
         print(f"Error retrieving hotel offers: {e}")
-        return []
\ No newline at end of file
+        incr("errors", op="get_hotel_offers")
+        return []
+
+
+def _distance_km(hotel):
+    distance = hotel.get("distance") or {}
+    value = distance.get("value")
+    if value is None:
+        return None
+    return float(value) * (1.609 if distance.get("unit") == "MILE" else 1.0)
+
+
+@traced("get_hotel_offers_bulk")
+def get_hotel_offers_bulk(hotels, check_in, check_out, adults=1, rooms=1,
+                          chunk_size=HOTEL_IDS_PER_REQUEST, on_progress=None):
+    """
+    Search offers for every hotel in 'hotels' (the get_hotels_in_city list)
+    and return them as an OfferSet of HotelOffer, cheapest first and
+    nearest first on ties.
+
+    Hotel IDs are split into chunks of 'chunk_size', fetched in parallel on
+    a capped pool, and merged as each chunk arrives. on_progress(done, total)
+    is called after every chunk.
+    """
+    by_id = {h.get("hotelId"): h for h in hotels if h.get("hotelId")}
+    ids = list(by_id)
+    chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+    if not chunks:
+        return OfferSet([])
+
+    futures = [
+        _bulk_executor.submit(bind(get_hotel_offers), chunk, check_in, check_out, adults, rooms)
+        for chunk in chunks
+    ]
+    ranked = []
+    for done, future in enumerate(as_completed(futures), start=1):
+        offers = parse_hotel_offers(
+            future.result(), by_id, distance=lambda hid: _distance_km(by_id.get(hid, {}))
+        )
+        ranked.extend(o for o in offers if o.price is not None)
+        if on_progress:
+            on_progress(done, len(chunks))
+
+    ranked.sort(key=lambda o: (o.price, o.distance_km))
+    return OfferSet(ranked)
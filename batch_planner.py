@@ -0,0 +1,208 @@
+"""
+Headless batch trip planner.
+
+Reads one trip request per line of a JSONL file, runs the same pipeline as
+the Streamlit flow (location parsing, airport guess, flights, hotels,
+geocoding and activities) on a bounded pool of workers, and appends one
+JSON result per line to the output file as each trip finishes.
+
+Input lines look like:
+    {"id": "t1", "destination": "Lisbon, Portugal", "depart_date": "2026-05-12",
+     "return_date": "2026-05-16", "origin": "DTW"}
+"origin" defaults to DTW; instead of depart_date/return_date a free-text
+"dates" field ("May 12-16") may be given.
+
+Re-running with the same output file skips trips already planned, so a
+crashed run can simply be started again. Provider rate limits are the
+process-wide ones (AMADEUS_RATE, AMADEUS_FLIGHT_SEARCH_RATE, NOMINATIM_RATE,
+OPENAI_RATE).
+
+    python batch_planner.py trips.jsonl plans.jsonl --workers 8
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+from agents.flight_agent import guess_airport_code, find_flights
+from agents.hotel_agent import get_hotels_in_city, get_hotel_offers_bulk
+from agents.activities_agent import find_activities
+from helpers.llm_helpers import get_conversation_chain, parse_location, parse_dates, geocode_place
+from helpers.offers import parse_flight_offers, parse_activities
+from helpers import metrics
+from helpers.scheduler import background
+
+DEFAULT_ORIGIN = "DTW"
+
+
+def read_trips(path):
+    with open(path, encoding="utf-8") as fh:
+        for n, line in enumerate(fh, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                trip = json.loads(line)
+            except ValueError as e:
+                print(f"Skipping line {n}: {e}")
+                continue
+            trip.setdefault("id", f"line-{n}")
+            yield trip
+
+
+def planned_ids(path):
+    """
+    IDs already planned successfully in an existing output file.
+    A half-written last line (from a crash) is ignored.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if result.get("status") == "ok":
+                done.add(str(result.get("id")))
+    return done
+
+
+def _airport(place):
+    if len(place) == 3 and place.isalpha() and place.isupper():
+        return place
+    return guess_airport_code(place)
+
+
+def plan_trip(chain, trip, top=5, max_hotels=40):
+    """
+    Run one trip request through the whole pipeline and return its result
+    record (never raises).
+    """
+    started = time.perf_counter()
+    metrics.set_context(step="batch", session=trip["id"])
+    result = {"id": trip["id"], "status": "ok"}
+    try:
+        with background():
+            _plan(chain, trip, result, top, max_hotels)
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _plan(chain, trip, result, top, max_hotels):
+    location = parse_location(chain, trip["destination"])
+    city = location.get("city", "") or ""
+    result["location"] = location
+
+    depart, ret = trip.get("depart_date", ""), trip.get("return_date", "")
+    if not depart and trip.get("dates"):
+        dates = parse_dates(chain, trip["dates"])
+        depart, ret = dates.get("start_date", ""), dates.get("end_date", "")
+    if not depart:
+        raise ValueError("no departure date")
+    result["depart_date"], result["return_date"] = depart, ret or None
+
+    origin = _airport(trip.get("origin") or DEFAULT_ORIGIN)
+    destination = guess_airport_code(city) if city else None
+    if not origin or not destination:
+        raise ValueError(f"no airport code for origin={origin} destination={destination}")
+    result["origin_code"], result["destination_code"] = origin, destination
+
+    flights = parse_flight_offers(find_flights(origin, destination, depart, ret or None))
+    result["flights"] = [
+        {"id": f.id, "price": f.price, "currency": f.currency, "label": f.label()}
+        for f in sorted(flights, key=lambda f: (f.price is None, f.price))[:top]
+    ]
+
+    hotels = get_hotels_in_city(destination, radius_km=10) if ret else []
+    offers = get_hotel_offers_bulk(hotels[:max_hotels], depart, ret) if hotels else []
+    result["hotels"] = [
+        {"id": o.id, "hotel_id": o.hotel_id, "price": o.price, "label": o.label()}
+        for o in list(offers)[:top]
+    ]
+
+    geo = geocode_place(f"{city} {location.get('state', '') or ''}, {location.get('country', '') or ''}")
+    activities = parse_activities(
+        find_activities(geo["latitude"], geo["longitude"], radius_km=5) if geo else []
+    )
+    result["activities"] = [
+        {"id": a.id, "name": a.name, "price": a.price, "currency": a.currency}
+        for a in list(activities)[:top]
+    ]
+
+
+def run(input_path, output_path, workers=4, top=5, max_hotels=40, report_every=25):
+    """
+    Plan every trip in 'input_path' not yet in 'output_path'. At most
+    2 x workers trips are queued at once, so huge inputs stream through.
+    Returns the summary dict that is also printed.
+    """
+    chain = get_conversation_chain()
+    skip = planned_ids(output_path)
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+    started = time.perf_counter()
+
+    def report(final=False):
+        elapsed = time.perf_counter() - started
+        finished = counts["ok"] + counts["error"]
+        summary = dict(counts, elapsed_s=round(elapsed, 1),
+                       trips_per_minute=round(finished / elapsed * 60, 1) if elapsed else 0.0)
+        print(("Done: " if final else "Progress: ") + json.dumps(summary), file=sys.stderr)
+        return summary
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="planner") as pool, \
+            open(output_path, "a+", encoding="utf-8") as out:
+        # Start on a fresh line after a half-written one from a crash
+        if out.tell():
+            out.seek(out.tell() - 1)
+            if out.read(1) != "\n":
+                out.write("\n")
+        pending = set()
+
+        def drain(block_until):
+            nonlocal pending
+            while len(pending) > block_until:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+                    counts[result["status"]] += 1
+                    if (counts["ok"] + counts["error"]) % report_every == 0:
+                        report()
+
+        for trip in read_trips(input_path):
+            if str(trip["id"]) in skip:
+                counts["skipped"] += 1
+                continue
+            pending.add(pool.submit(plan_trip, chain, trip, top, max_hotels))
+            drain(2 * workers)
+        drain(0)
+
+    return report(final=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan trips from a JSONL file without the UI.")
+    parser.add_argument("input", help="trip requests, one JSON object per line")
+    parser.add_argument("output", help="results file (appended to; finished trips are skipped)")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("TRAVELBOT_BATCH_WORKERS", "4")))
+    parser.add_argument("--top", type=int, default=5, help="offers kept per category")
+    parser.add_argument("--max-hotels", type=int, default=40, help="hotels searched for offers per trip")
+    parser.add_argument("--metrics", help="write Prometheus metrics here when done")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    run(args.input, args.output, workers=args.workers, top=args.top, max_hotels=args.max_hotels)
+    if args.metrics:
+        metrics.export_prometheus(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
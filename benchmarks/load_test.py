@@ -0,0 +1,403 @@
+"""
+Concurrent-session load test for the Streamlit flow.
+
+Starts one real `streamlit run streamlit_app.py` server per concurrency
+level and connects N simulated users to it over Streamlit's websocket
+protocol, the way N browser tabs would: every session shares the server's
+process-wide state (payload store, scheduler queues and rate limits,
+connection pools, prefetch workers, caches), so contention shows up where
+it would in production. The backend runs in "stub" mode, so OpenAI,
+Amadeus and Nominatim answer with synthetic data after a configurable
+delay. Each user goes through Steps 0-7 (location, airports, dates,
+flight with a re-sort, bulk hotel offers, activities, final page).
+
+For each concurrency level the report gives p50/p95/p99 latency per step
+(one sample per script run the user triggers, until the server reports
+the run finished), script runs per step, external calls per session (from
+the server's traces), the server's RSS and its growth per session, and
+sessions per minute. The saturation point is the first level at which
+throughput gains less than 10% over the previous level or the p95 of any
+step more than doubles relative to a single user.
+
+Prints one JSON object; --save also appends it, tagged with the current
+commit, to benchmarks/results/load_test.jsonl.
+
+    python benchmarks/load_test.py --levels 1,2,4,8,16 --rounds 2 \\
+        --latency "amadeus=lognormal:300:0.5,openai=uniform:600:1500,nominatim=fixed:150"
+"""
+import os
+import sys
+import json
+import time
+import socket
+import random
+import argparse
+import tempfile
+import statistics
+import subprocess
+import urllib.request
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from websockets.sync.client import connect
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from _common import ROOT, RESULTS_DIR, commit, append_result
+
+APP = os.path.join(ROOT, "streamlit_app.py")
+RESULTS_PATH = os.path.join(RESULTS_DIR, "load_test.jsonl")
+
+# Mix of gazetteer hits (parsed locally) and inputs that need the LLM
+DESTINATIONS = [
+    "Paris, France", "Lisbon, Portugal", "Tokyo, Japan", "Rome, Italy", "Denver, Colorado",
+    "Barcelona", "the capital of Hungary", "somewhere warm in Mexico", "Cape Town",
+    "Kyoto, Japan", "Vancouver, Canada", "Marrakech",
+]
+
+DEFAULT_LATENCY = "amadeus=lognormal:300:0.5,openai=uniform:600:1500,nominatim=fixed:150"
+
+FINISHED_EARLY_FOR_RERUN = ForwardMsg.ScriptFinishedStatus.Value("FINISHED_EARLY_FOR_RERUN")
+
+
+def _rss_mb(pid):
+    """
+    Current resident set size of process 'pid' in MB.
+    """
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def _pick(values, q):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 1)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Server:
+    """
+    One `streamlit run` of the app on stub backends, with its own fresh
+    on-disk caches (response cache and hotel catalog).
+    """
+
+    def __init__(self, latency, seed, cache_dir):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        env = dict(os.environ)
+        env.update({
+            "TRAVELBOT_BACKEND": "stub",
+            "TRAVELBOT_REPLAY_LATENCY": latency,
+            "TRAVELBOT_REPLAY_SEED": str(seed),
+            "TRAVELBOT_MAX_TRACES": "1000000",
+            "TRAVELBOT_CACHE_PATH": os.path.join(cache_dir, "travelbot.sqlite3"),
+            "TRAVELBOT_CATALOG_PATH": os.path.join(cache_dir, "hotels.sqlite3"),
+        })
+        for key in ("OPENAI_API_KEY", "AMADEUS_API_KEY", "AMADEUS_API_SECRET"):
+            env.setdefault(key, "stub")
+        self.log = open(os.path.join(cache_dir, "server.log"), "w")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", APP, "--server.headless", "true",
+             "--server.port", str(self.port), "--browser.gatherUsageStats", "false"],
+            cwd=ROOT, env=env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+
+    def wait_ready(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with {self.process.returncode}, see {self.log.name}")
+            try:
+                with urllib.request.urlopen(f"{self.url}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError(f"Server not ready after {timeout}s, see {self.log.name}")
+
+    def wait_warm(self, settle=2.0, timeout=120):
+        """
+        Wait for the app's background warmup (imports, shared clients,
+        indexes) to finish, i.e. for the server's RSS to stop growing.
+        """
+        deadline = time.monotonic() + timeout
+        last = _rss_mb(self.process.pid)
+        while time.monotonic() < deadline:
+            time.sleep(settle)
+            rss = _rss_mb(self.process.pid)
+            if rss - last < 1:
+                return
+            last = rss
+
+    def rss_mb(self):
+        return _rss_mb(self.process.pid)
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+
+class Session:
+    """
+    One browser tab: a websocket to the server that reruns the script with
+    the widget values a user has entered so far, as the frontend does.
+    """
+
+    def __init__(self, server, timeout, query_string=""):
+        self.server = server
+        self.timeout = timeout
+        self.query_string = query_string
+        self.ws = connect(server.url.replace("http", "ws", 1) + "/_stcore/stream",
+                          subprotocols=["streamlit"], max_size=None)
+        self.values = {}       # widget id -> WidgetState the user has set
+        self.elements = []
+
+    def close(self):
+        self.ws.close()
+
+    def run(self, trigger=None):
+        """
+        Rerun the script (with a button press if 'trigger' is a widget id)
+        and read messages until it finishes, following st.rerun(). Returns
+        the elements of the final run.
+        """
+        back = BackMsg()
+        back.rerun_script.query_string = self.query_string
+        states = back.rerun_script.widget_states.widgets
+        states.extend(self.values.values())
+        if trigger:
+            states.add(id=trigger, trigger_value=True)
+        self.ws.send(back.SerializeToString())
+
+        deadline = time.monotonic() + self.timeout
+        elements = {}
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(self.ws.recv(timeout=max(deadline - time.monotonic(), 0)))
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                elements = {}
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                if element.WhichOneof("type") == "exception":
+                    raise RuntimeError(element.exception.message)
+                elements[tuple(msg.metadata.delta_path)] = element
+            elif kind == "script_finished" and msg.script_finished != FINISHED_EARLY_FOR_RERUN:
+                break
+        self.elements = [elements[path] for path in sorted(elements)]
+        return self.elements
+
+    def widgets(self, kind):
+        return [getattr(e, kind) for e in self.elements if e.WhichOneof("type") == kind]
+
+    def widget(self, kind, key):
+        for widget in self.widgets(kind):
+            if widget.id.endswith(f"-{key}"):
+                return widget
+        raise RuntimeError(f"No {kind} with key '{key}' on the page")
+
+    def set(self, widget, **value):
+        self.values[widget.id] = WidgetState(id=widget.id, **value)
+
+    def click(self, key):
+        return self.run(trigger=self.widget("button", key).id)
+
+    def download(self, label):
+        for button in self.widgets("download_button"):
+            if button.label == label:
+                with urllib.request.urlopen(self.server.url + button.url) as response:
+                    return response.read()
+        raise RuntimeError(f"No download button '{label}' on the page")
+
+
+def simulate(server, destination, rng, timeout):
+    """
+    One user through Steps 0-7. Returns [(step, seconds)], one sample per
+    script run triggered from that step.
+    """
+    session = Session(server, timeout)
+    samples = []
+
+    def run(step, action):
+        start = time.perf_counter()
+        action()
+        samples.append((step, time.perf_counter() - start))
+
+    try:
+        run(0, session.run)
+        session.set(session.widgets("text_input")[0], string_value=destination)
+        run(0, lambda: session.click("submit_location_step0"))
+        run(1, lambda: session.click("confirm_location_step1"))
+        run(2, lambda: session.click("confirm_codes_step2"))
+
+        depart = date.today() + timedelta(days=rng.randint(14, 90))
+        back = depart + timedelta(days=rng.randint(2, 10))
+        session.widget("date_input", "dep_date")
+        session.set(session.widget("date_input", "dep_date"), string_array_value={"data": [depart.isoformat()]})
+        session.set(session.widget("date_input", "ret_date"), string_array_value={"data": [back.isoformat()]})
+        run(3, lambda: session.click("next_dates_step3"))
+
+        session.set(session.widget("selectbox", "flight_sort"), string_value=rng.choice(["duration", "best"]))
+        run(4, session.run)
+        run(4, lambda: session.click("confirm_flight_step4"))
+        run(5, lambda: session.click("bulk_offers_button"))
+        run(5, lambda: session.click("confirm_bulk_offer"))
+
+        checkboxes = session.widgets("checkbox")
+        if checkboxes:
+            session.set(rng.choice(checkboxes), bool_value=True)
+            run(6, session.run)
+        run(6, lambda: session.click("confirm_activities_step6"))
+    finally:
+        session.close()
+    return samples
+
+
+def _user(server, index, rounds, timeout, seed):
+    """
+    One simulated user planning 'rounds' trips back to back, each in a new
+    session. Returns the samples of each session and the errors.
+    """
+    rng = random.Random(seed * 1000 + index)
+    sessions, errors = [], []
+    for _ in range(rounds):
+        try:
+            sessions.append(simulate(server, rng.choice(DESTINATIONS), rng, timeout))
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+    return sessions, errors
+
+
+def _external_calls(server, timeout):
+    """
+    External calls per app session, from the traces on the server's debug
+    panel (the panel's own session makes none).
+    """
+    session = Session(server, timeout, query_string="debug=1")
+    try:
+        session.run()
+        traces = json.loads(session.download("Traces (JSON)"))
+    finally:
+        session.close()
+    calls = {}
+    for trace in traces:
+        if trace["name"].startswith("external:"):
+            calls[trace["session"]] = calls.get(trace["session"], 0) + 1
+    return calls
+
+
+def run_level(users, rounds, timeout, latency, seed, cache_dir):
+    """
+    'users' concurrent users, each planning 'rounds' trips, against one
+    fresh server.
+    """
+    level_dir = tempfile.mkdtemp(prefix=f"users{users}-", dir=cache_dir)
+    server = Server(latency, seed, level_dir)
+    try:
+        server.wait_ready()
+        # First script run starts the app's warmup; measure RSS after it
+        warm = Session(server, timeout)
+        warm.run()
+        warm.close()
+        server.wait_warm()
+        rss_start = server.rss_mb()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            results = list(pool.map(_user, [server] * users, range(users), [rounds] * users,
+                                    [timeout] * users, [seed] * users))
+        elapsed = time.perf_counter() - start
+
+        rss_end = server.rss_mb()
+        calls = _external_calls(server, timeout)
+    finally:
+        server.stop()
+
+    sessions = [s for user_sessions, _ in results for s in user_sessions]
+    errors = [e for _, user_errors in results for e in user_errors]
+    per_step = {}
+    for samples in sessions:
+        for step, seconds in samples:
+            per_step.setdefault(step, []).append(seconds * 1000)
+    steps = {
+        str(step): {"runs": len(values),
+                    "runs_per_session": round(len(values) / max(len(sessions), 1), 2),
+                    "p50_ms": _pick(values, 0.50), "p95_ms": _pick(values, 0.95),
+                    "p99_ms": _pick(values, 0.99)}
+        for step, values in sorted(per_step.items())
+    }
+    completed = max(len(sessions), 1)
+
+    return {
+        "users": users,
+        "sessions": len(sessions),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "seconds": round(elapsed, 2),
+        "sessions_per_min": round(len(sessions) / elapsed * 60, 2),
+        "steps": steps,
+        "external_calls_per_session": {"mean": round(sum(calls.values()) / completed, 2),
+                                       "max": max(calls.values(), default=0)},
+        "rss_mb_server": round(rss_end, 1),
+        "rss_mb_per_session": round((rss_end - rss_start) / completed, 2),
+    }
+
+
+def saturation(levels):
+    """
+    First level whose throughput gain is under 10%, or whose p95 for some
+    step is more than double the single-user p95.
+    """
+    base = levels[0]["steps"]
+    for previous, level in zip(levels, levels[1:]):
+        if level["sessions_per_min"] < previous["sessions_per_min"] * 1.1:
+            return level["users"]
+        if any(step in base and stats["p95_ms"] > 2 * base[step]["p95_ms"]
+               for step, stats in level["steps"].items()):
+            return level["users"]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Streamlit flow against stub backends.")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="comma-separated concurrent users")
+    parser.add_argument("--rounds", type=int, default=2, help="trips each user plans per level")
+    parser.add_argument("--latency", default=DEFAULT_LATENCY,
+                        help="per-service stub latency (TRAVELBOT_REPLAY_LATENCY syntax)")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per script run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", action="store_true", help=f"append the result to {RESULTS_PATH}")
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="travelbot-load-")
+    levels = []
+    for users in (int(n) for n in args.levels.split(",")):
+        level = run_level(users, args.rounds, args.timeout, args.latency, args.seed, cache_dir)
+        print(f"{users} users: {level['sessions_per_min']} sessions/min, "
+              f"{level['errors']} errors", file=sys.stderr)
+        levels.append(level)
+
+    result = {
+        "commit": commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "latency": args.latency,
+        "rounds": args.rounds,
+        "levels": levels,
+        "saturation_users": saturation(levels),
+    }
+    print(json.dumps(result, indent=2))
+    if args.save:
+        append_result(RESULTS_PATH, result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Trip optimizer micro-benchmark.
+
+Times helpers.trip_optimizer.optimize_trip on synthetic offers (mixed
+currencies, a spread of prices, durations, stops and hotel distances) at a
+few sizes, in-process. The target is under 50 ms at the largest size so
+the Step 7 planner can rerun on every widget change.
+
+Prints one JSON object; --save also appends it, tagged with the current
+commit, to benchmarks/results/optimizer.jsonl.
+
+    python benchmarks/optimizer_benchmark.py --repeat 50 --save
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+
+from _common import ROOT, RESULTS_DIR, commit, append_result
+sys.path.insert(0, ROOT)
+
+from helpers.offers import FlightOffer, HotelOffer, Activity
+from helpers.trip_optimizer import optimize_trip
+
+RESULTS_PATH = os.path.join(RESULTS_DIR, "optimizer.jsonl")
+
+# (flights, hotel offers, activities)
+SIZES = [(50, 50, 10), (250, 300, 40), (500, 600, 80)]
+
+
+def synthetic_offers(flights, hotels, activities, seed=0):
+    rng = random.Random(seed)
+    currencies = ["USD", "USD", "EUR", "GBP"]
+
+    def segments():
+        return [{"carrierCode": rng.choice("AA DL UA LH AF BA".split()), "number": str(rng.randint(1, 9999)),
+                 "departure": {"at": f"2026-05-12T{rng.randint(0, 23):02d}:00:00"}}
+                for _ in range(rng.randint(1, 3))]
+
+    flight_offers = [FlightOffer({
+        "id": str(i),
+        "price": {"grandTotal": f"{rng.uniform(150, 1800):.2f}", "currency": rng.choice(currencies)},
+        "itineraries": [{"duration": f"PT{rng.randint(2, 22)}H{rng.randint(0, 59)}M", "segments": segments()}
+                        for _ in range(2)],
+    }) for i in range(flights)]
+    hotel_offers = [HotelOffer(
+        {"id": f"O{i}", "price": {"total": f"{rng.uniform(200, 3000):.2f}", "currency": rng.choice(currencies)}},
+        f"H{i // 3}", f"Hotel {i // 3}", rng.uniform(0.1, 15)
+    ) for i in range(hotels)]
+    acts = [Activity({
+        "id": f"A{i}", "name": f"Activity {i}",
+        "price": {"amount": f"{rng.uniform(5, 250):.2f}", "currencyCode": rng.choice(currencies)},
+    }) for i in range(activities)]
+    return flight_offers, hotel_offers, acts
+
+
+def measure(repeat=20, budget=5000, k=5, travellers=2):
+    """
+    Median and p95 milliseconds per optimize_trip call for each of SIZES.
+    """
+    results = []
+    for flights, hotels, activities in SIZES:
+        offers = synthetic_offers(flights, hotels, activities)
+        optimize_trip(*offers, budget, k=k, travellers=travellers)
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            trips = optimize_trip(*offers, budget, k=k, travellers=travellers)
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        results.append({
+            "flights": flights, "hotel_offers": hotels, "activities": activities,
+            "trips": len(trips),
+            "median_ms": round(statistics.median(samples), 2),
+            "p95_ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 2),
+        })
+    return {"repeat": repeat, "budget": budget, "k": k, "travellers": travellers, "sizes": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the budget trip optimizer on synthetic offers.")
+    parser.add_argument("--repeat", type=int, default=20, help="timed calls per size")
+    parser.add_argument("--budget", type=float, default=5000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--travellers", type=int, default=2)
+    parser.add_argument("--save", action="store_true", help=f"append the result to {RESULTS_PATH}")
+    args = parser.parse_args()
+
+    result = measure(args.repeat, args.budget, args.k, args.travellers)
+    # Timings vary several-fold between machines; keep what they were taken on
+    result = {"commit": commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "machine": {"cpu": platform.processor() or platform.machine(),
+                          "cpus": os.cpu_count(), "python": platform.python_version()},
+              **result}
+    print(json.dumps(result, indent=2))
+    if args.save:
+        append_result(RESULTS_PATH, result)
+
+
+if __name__ == "__main__":
+    main()
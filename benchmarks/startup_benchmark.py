@@ -0,0 +1,117 @@
+"""
+Startup benchmark.
+
+Measures, each in a fresh interpreter so nothing is already imported:
+- import time of the modules the app loads at boot or on its first steps
+- time to first render: loading streamlit_app.py with Streamlit's AppTest
+  and running it once (Step 0), from process start and excluding the
+  streamlit import itself
+
+Prints one JSON object; --save also appends it, tagged with the current
+commit, to benchmarks/results/startup.jsonl so runs can be compared across
+commits.
+
+    python benchmarks/startup_benchmark.py --repeat 5 --save
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+from _common import ROOT, RESULTS_DIR, commit, append_result
+
+RESULTS_PATH = os.path.join(RESULTS_DIR, "startup.jsonl")
+
+MODULES = [
+    "streamlit",
+    "helpers.metrics",
+    "helpers.llm_helpers",
+    "helpers.prefetch",
+    "helpers.flight_ranking",
+    "helpers.hotel_catalog",
+    "agents.flight_agent",
+]
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+RENDER_SNIPPET = """
+import time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+app = AppTest.from_file("streamlit_app.py", default_timeout=60)
+app.run()
+done = time.perf_counter()
+assert not app.exception, app.exception
+print(done - start, done - imported)
+"""
+
+
+def _run(snippet, warmup):
+    env = dict(os.environ, TRAVELBOT_WARMUP="1" if warmup else "0")
+    result = subprocess.run(
+        [sys.executable, "-c", snippet], cwd=ROOT, env=env,
+        capture_output=True, text=True, timeout=300
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "failed")
+    # The timings are the last line; anything the app printed comes before
+    return [float(x) for x in result.stdout.strip().splitlines()[-1].split()]
+
+
+def _median_ms(samples):
+    return round(statistics.median(samples) * 1000, 1)
+
+
+def measure(repeat=3, warmup=False):
+    """
+    Median import and first-render times in milliseconds over 'repeat'
+    fresh processes. A module that fails to import is reported as an error
+    instead of a time.
+    """
+    imports = {}
+    for module in MODULES:
+        try:
+            imports[module] = _median_ms(
+                [_run(IMPORT_SNIPPET.format(module=module), warmup)[0] for _ in range(repeat)]
+            )
+        except Exception as e:
+            imports[module] = {"error": str(e)}
+
+    try:
+        runs = [_run(RENDER_SNIPPET, warmup) for _ in range(repeat)]
+        first_render = {
+            "from_start_ms": _median_ms([r[0] for r in runs]),
+            "app_only_ms": _median_ms([r[1] for r in runs]),
+        }
+    except Exception as e:
+        first_render = {"error": str(e)}
+
+    return {"repeat": repeat, "warmup": warmup, "import_ms": imports, "first_render": first_render}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and time to first render.")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh processes per measurement")
+    parser.add_argument("--warmup", action="store_true",
+                        help="leave TRAVELBOT_WARMUP on while rendering")
+    parser.add_argument("--save", action="store_true", help=f"append the result to {RESULTS_PATH}")
+    args = parser.parse_args()
+
+    result = measure(args.repeat, args.warmup)
+    result = {"commit": commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), **result}
+    print(json.dumps(result, indent=2))
+    if args.save:
+        append_result(RESULTS_PATH, result)
+
+
+if __name__ == "__main__":
+    main()
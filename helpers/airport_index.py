@@ -0,0 +1,374 @@
+import os
+import csv
+import bisect
+import difflib
+import threading
+import unicodedata
+from array import array
+from helpers.geo import haversine_km
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+AIRPORTS_CSV = os.path.join(DATA_DIR, "airports.csv")
+ALIASES_CSV = os.path.join(DATA_DIR, "airport_aliases.csv")
+
+# Scores at or above this are trusted without asking Amadeus
+CONFIDENT_SCORE = 0.85
+# Score for a match that could be more than one city
+AMBIGUOUS_SCORE = 0.6
+
+
+def fold(text: str):
+    """
+    Lowercase, strip accents and punctuation, collapse whitespace:
+    "  Zürich-Flughafen " -> "zurich flughafen".
+    """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = "".join(c if c.isalnum() else " " for c in text.lower())
+    return " ".join(text.split())
+
+
+# ------------------------------------------------
+# Gazetteer tables
+# ------------------------------------------------
+COUNTRIES = {
+    "US": "United States", "CA": "Canada", "MX": "Mexico", "CU": "Cuba",
+    "DO": "Dominican Republic", "JM": "Jamaica", "BS": "Bahamas", "CR": "Costa Rica",
+    "PA": "Panama", "CO": "Colombia", "PE": "Peru", "EC": "Ecuador", "CL": "Chile",
+    "AR": "Argentina", "BR": "Brazil", "UY": "Uruguay", "GB": "United Kingdom",
+    "IE": "Ireland", "FR": "France", "NL": "Netherlands", "BE": "Belgium",
+    "LU": "Luxembourg", "DE": "Germany", "CH": "Switzerland", "AT": "Austria",
+    "CZ": "Czech Republic", "HU": "Hungary", "PL": "Poland", "DK": "Denmark",
+    "SE": "Sweden", "NO": "Norway", "FI": "Finland", "IS": "Iceland", "ES": "Spain",
+    "PT": "Portugal", "IT": "Italy", "GR": "Greece", "TR": "Turkey", "HR": "Croatia",
+    "SI": "Slovenia", "RO": "Romania", "BG": "Bulgaria", "RS": "Serbia",
+    "UA": "Ukraine", "LV": "Latvia", "EE": "Estonia", "LT": "Lithuania",
+    "RU": "Russia", "MT": "Malta", "CY": "Cyprus", "IL": "Israel", "JO": "Jordan",
+    "EG": "Egypt", "MA": "Morocco", "TN": "Tunisia", "AE": "United Arab Emirates",
+    "QA": "Qatar", "SA": "Saudi Arabia", "BH": "Bahrain", "OM": "Oman",
+    "ZA": "South Africa", "KE": "Kenya", "ET": "Ethiopia", "NG": "Nigeria",
+    "GH": "Ghana", "TZ": "Tanzania", "MU": "Mauritius", "SC": "Seychelles",
+    "IN": "India", "LK": "Sri Lanka", "MV": "Maldives", "NP": "Nepal",
+    "BD": "Bangladesh", "TH": "Thailand", "VN": "Vietnam", "KH": "Cambodia",
+    "MY": "Malaysia", "SG": "Singapore", "ID": "Indonesia", "PH": "Philippines",
+    "HK": "Hong Kong", "MO": "Macau", "TW": "Taiwan", "CN": "China",
+    "KR": "South Korea", "JP": "Japan", "AU": "Australia", "NZ": "New Zealand",
+    "FJ": "Fiji", "PF": "French Polynesia",
+}
+
+COUNTRY_ALIASES = {
+    "usa": "US", "us": "US", "u s": "US", "u s a": "US", "america": "US",
+    "united states of america": "US", "uk": "GB", "u k": "GB", "great britain": "GB",
+    "britain": "GB", "england": "GB", "scotland": "GB", "wales": "GB",
+    "holland": "NL", "the netherlands": "NL", "czechia": "CZ", "uae": "AE",
+    "korea": "KR", "republic of korea": "KR", "turkiye": "TR", "espana": "ES",
+    "deutschland": "DE", "italia": "IT", "brasil": "BR", "mexico": "MX",
+}
+
+REGIONS = {
+    "US": {
+        "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas",
+        "CA": "California", "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware",
+        "DC": "District of Columbia", "FL": "Florida", "GA": "Georgia", "HI": "Hawaii",
+        "ID": "Idaho", "IL": "Illinois", "IN": "Indiana", "IA": "Iowa", "KS": "Kansas",
+        "KY": "Kentucky", "LA": "Louisiana", "ME": "Maine", "MD": "Maryland",
+        "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota", "MS": "Mississippi",
+        "MO": "Missouri", "MT": "Montana", "NE": "Nebraska", "NV": "Nevada",
+        "NH": "New Hampshire", "NJ": "New Jersey", "NM": "New Mexico", "NY": "New York",
+        "NC": "North Carolina", "ND": "North Dakota", "OH": "Ohio", "OK": "Oklahoma",
+        "OR": "Oregon", "PA": "Pennsylvania", "PR": "Puerto Rico", "RI": "Rhode Island",
+        "SC": "South Carolina", "SD": "South Dakota", "TN": "Tennessee", "TX": "Texas",
+        "UT": "Utah", "VT": "Vermont", "VA": "Virginia", "WA": "Washington",
+        "WV": "West Virginia", "WI": "Wisconsin", "WY": "Wyoming",
+    },
+    "CA": {
+        "AB": "Alberta", "BC": "British Columbia", "MB": "Manitoba", "NB": "New Brunswick",
+        "NL": "Newfoundland and Labrador", "NS": "Nova Scotia", "ON": "Ontario",
+        "PE": "Prince Edward Island", "QC": "Quebec", "SK": "Saskatchewan",
+    },
+    "AU": {
+        "NSW": "New South Wales", "VIC": "Victoria", "QLD": "Queensland",
+        "WA": "Western Australia", "SA": "South Australia", "TAS": "Tasmania",
+        "ACT": "Australian Capital Territory", "NT": "Northern Territory",
+    },
+}
+
+# Well-known city names shared by several major places (not all of them in
+# the table); these need a state or country before a match is trusted.
+AMBIGUOUS_CITIES = {"portland", "birmingham", "san jose", "santiago", "valencia", "victoria"}
+
+
+def match_country(part):
+    """
+    Country code named by 'part' ("France", "UK", "FR"), or None.
+    """
+    key = fold(part)
+    if key in COUNTRY_ALIASES:
+        return COUNTRY_ALIASES[key]
+    if part.strip().upper() in COUNTRIES and len(part.strip()) == 2 and part.strip().isupper():
+        return part.strip().upper()
+    for code, name in COUNTRIES.items():
+        if fold(name) == key:
+            return code
+    return None
+
+
+def match_region(part, country):
+    """
+    Region code within 'country' named by 'part' ("Texas", "TX"), or None.
+    """
+    key = fold(part)
+    for code, name in REGIONS.get(country, {}).items():
+        if key == code.lower() or key == fold(name):
+            return code
+    return None
+
+
+class AirportIndex:
+    """
+    Read-only in-memory index over the bundled airport/city table.
+
+    Entries are stored column-wise in tuples; names are kept in one sorted
+    list with a parallel array of entry ids, so prefix lookups are a bisect
+    and the whole index stays at a few hundred KB.
+    """
+
+    def __init__(self, airports_csv=AIRPORTS_CSV, aliases_csv=ALIASES_CSV):
+        codes, kinds, city_codes, cities, regions, countries, names, lats, lons = (
+            [], [], [], [], [], [], [], [], []
+        )
+
+        def add(code, kind, city_code, city, region, country, name, lat, lon):
+            codes.append(code)
+            kinds.append(kind)
+            city_codes.append(city_code)
+            cities.append(city)
+            regions.append(region)
+            countries.append(country)
+            names.append(name)
+            lats.append(lat)
+            lons.append(lon)
+            return len(codes) - 1
+
+        with open(airports_csv, newline="", encoding="utf-8") as fh:
+            rows = list(csv.DictReader(fh))
+
+        # One CITY entry per city code, named after its main airport's city and
+        # placed at the mean position of its airports.
+        by_city = {}
+        for row in rows:
+            by_city.setdefault(row["city_code"], []).append(row)
+        for city_code, members in by_city.items():
+            main = next((r for r in members if r["iata"] == city_code), None)
+            if main is None:
+                names_seen = [r["city"] for r in members]
+                main = max(members, key=lambda r: names_seen.count(r["city"]))
+            lat = sum(float(r["lat"]) for r in members) / len(members)
+            lon = sum(float(r["lon"]) for r in members) / len(members)
+            add(city_code, "CITY", city_code, main["city"], main["region"],
+                main["country"], main["city"], lat, lon)
+        for row in rows:
+            add(row["iata"], "AIRPORT", row["city_code"], row["city"], row["region"],
+                row["country"], row["name"], float(row["lat"]), float(row["lon"]))
+
+        self.codes = tuple(codes)
+        self.kinds = tuple(kinds)
+        self.city_codes = tuple(city_codes)
+        self.cities = tuple(cities)
+        self.regions = tuple(regions)
+        self.countries = tuple(countries)
+        self.names = tuple(names)
+        self.lats = array("d", lats)
+        self.lons = array("d", lons)
+
+        # folded search key -> entry ids, for exact hits
+        self._exact = {}
+        keyed = []
+        for i in range(len(codes)):
+            keys = {fold(cities[i])}
+            if kinds[i] == "AIRPORT":
+                keys.add(fold(names[i]))
+            for key in keys:
+                self._exact.setdefault(key, []).append(i)
+                keyed.append((key, i))
+        keyed.sort()
+        self._keys = [k for k, _ in keyed]
+        self._key_ids = array("i", [i for _, i in keyed])
+        self._city_names = sorted({fold(c) for c in cities})
+
+        self._by_code = {}
+        for i, code in enumerate(codes):
+            # CITY entries come first, so a shared city/airport code keeps the city
+            self._by_code.setdefault(code, i)
+
+        self._aliases = {}
+        if os.path.exists(aliases_csv):
+            with open(aliases_csv, newline="", encoding="utf-8") as fh:
+                for row in csv.DictReader(fh):
+                    code = row["code"].strip().upper()
+                    if code in self._by_code:
+                        self._aliases[fold(row["alias"])] = self._by_code[code]
+
+    def entry(self, i, score=1.0):
+        """
+        Shape a match like an Amadeus reference_data.locations item.
+        """
+        return {
+            "iataCode": self.codes[i],
+            "subType": self.kinds[i],
+            "name": self.names[i],
+            "address": {
+                "cityCode": self.city_codes[i],
+                "cityName": self.cities[i],
+                "stateCode": self.regions[i],
+                "countryCode": self.countries[i],
+            },
+            "geoCode": {"latitude": self.lats[i], "longitude": self.lons[i]},
+            "score": round(score, 3),
+        }
+
+    def _rank(self, ids):
+        # Cities before airports, then by code for stable output
+        return sorted(set(ids), key=lambda i: (self.kinds[i] != "CITY", self.codes[i]))
+
+    def _prefix_ids(self, key, limit=50):
+        start = bisect.bisect_left(self._keys, key)
+        ids = []
+        for pos in range(start, min(start + limit, len(self._keys))):
+            if not self._keys[pos].startswith(key):
+                break
+            ids.append(self._key_ids[pos])
+        return ids
+
+    def _family(self, i):
+        # A city code plus its airports; an airport on its own
+        ids = [i]
+        if self.kinds[i] == "CITY":
+            code = self.codes[i]
+            ids += [j for j in range(len(self.codes))
+                    if self.kinds[j] == "AIRPORT" and self.city_codes[j] == code]
+        return ids
+
+    def _exact_ids(self, key):
+        if key in self._aliases:
+            return self._family(self._aliases[key])
+        return self._rank(self._exact.get(key, []))
+
+    def _narrow(self, ids, score, name, qualifiers):
+        """
+        Keep the entries whose state or country every qualifier names
+        ("Paris, Texas"), and cap the score below CONFIDENT_SCORE when the
+        match may still be another city than the one we'd pick.
+        """
+        if qualifiers:
+            matching = [i for i in ids if all(
+                match_country(q) == self.countries[i] or match_region(q, self.countries[i]) == self.regions[i]
+                for q in qualifiers
+            )]
+            if matching:
+                ids = matching
+            else:
+                score = min(score, AMBIGUOUS_SCORE)
+        elif name in AMBIGUOUS_CITIES:
+            score = min(score, AMBIGUOUS_SCORE)
+        if len({self.city_codes[i] for i in ids}) > 1:
+            score = min(score, AMBIGUOUS_SCORE)
+        return ids, score
+
+    def search(self, query: str, limit=8):
+        """
+        Ranked matches for a free-form place or code. Tries, in order:
+        alias, exact name, IATA code, name prefix, then fuzzy city name.
+        """
+        raw = (query or "").strip()
+        key = fold(raw)
+        if not key:
+            return []
+        # "Paris, France" / "Paris Ile-de-France": the city is the first part
+        head, *qualifiers = raw.split(",")
+        head = fold(head)
+        qualifiers = [q.strip() for q in qualifiers if fold(q)]
+
+        for candidate in (key, head):
+            ids = self._exact_ids(candidate)
+            if ids:
+                ids, score = self._narrow(ids, 1.0, candidate, qualifiers if candidate == head else [])
+                return [self.entry(i, score) for i in ids[:limit]]
+
+        if len(raw) == 3 and raw.isalpha() and raw.upper() in self._by_code:
+            return self._expand(self._by_code[raw.upper()], 1.0, limit)
+
+        for candidate in (key, head):
+            ids = self._rank(self._prefix_ids(candidate))
+            if ids:
+                # A prefix pointing at a single city is nearly as good as an exact hit
+                ids, score = self._narrow(ids, 0.9, candidate, qualifiers if candidate == head else [])
+                return [self.entry(i, score) for i in ids[:limit]]
+
+        close = difflib.get_close_matches(head, self._city_names, n=3, cutoff=0.75)
+        matches = []
+        for name in close:
+            ratio = difflib.SequenceMatcher(None, head, name).ratio()
+            ids, score = self._narrow(self._rank(self._exact.get(name, [])), ratio, name, qualifiers)
+            matches += [self.entry(i, score) for i in ids]
+        return matches[:limit]
+
+    def exact_matches(self, name: str):
+        """
+        Every alias or exact-name match for 'name', unscored and not narrowed,
+        for callers that tell same-named cities apart themselves.
+        """
+        return [self.entry(i) for i in self._exact_ids(fold(name))]
+
+    def _expand(self, i, score, limit):
+        """
+        A city code plus its airports; an airport on its own.
+        """
+        return [self.entry(j, score) for j in self._family(i)][:max(limit, 1)]
+
+    def has_code(self, code: str):
+        """
+        Whether 'code' is a city or airport code in the table.
+        """
+        return (code or "").upper() in self._by_code
+
+    def nearby_airports(self, code: str, radius_km=100, limit=3):
+        """
+        Up to 'limit' airport codes within 'radius_km' of 'code' (a city or
+        an airport), nearest first. Falls back to [code] when it isn't in the
+        table or has no airport in range.
+        """
+        i = self._by_code.get((code or "").upper())
+        if i is None:
+            return [code]
+        lat, lon = self.lats[i], self.lons[i]
+        found = sorted(
+            (haversine_km(lat, lon, self.lats[j], self.lons[j]), self.codes[j])
+            for j in range(len(self.codes)) if self.kinds[j] == "AIRPORT"
+        )
+        return [c for km, c in found if km <= radius_km][:limit] or [self.codes[i]]
+
+    def guess_code(self, query: str):
+        """
+        Best IATA code for 'query' if the match is confident, else None.
+        """
+        matches = self.search(query, limit=1)
+        if matches and matches[0]["score"] >= CONFIDENT_SCORE:
+            return matches[0]["iataCode"]
+        return None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_airport_index():
+    """
+    The shared index, loaded from data/ on first use.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = AirportIndex()
+    return _index
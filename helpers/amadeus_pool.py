@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import threading
+import http.client
+import urllib.error
+from urllib.parse import urlsplit
+from amadeus import Client
+from helpers.backends import get_backend
+from helpers.concurrency import TokenBucket
+from helpers.metrics import register_collector
+
+# Refresh the shared OAuth token this many seconds before Amadeus expires it,
+# so no request ever goes out with a token that dies in flight.
+TOKEN_REFRESH_MARGIN = 120
+TOKEN_PATH = "/v1/security/oauth2/token"
+_REPLAY_TOKEN = (200, "OK", [("Content-Type", "application/json")],
+                 b'{"access_token": "replay-token", "expires_in": 1799}')
+
+# Keep-alive pool sizing / socket timeout for the Amadeus host
+POOL_MAX_IDLE = int(os.getenv("AMADEUS_POOL_SIZE", "8"))
+HTTP_TIMEOUT = float(os.getenv("AMADEUS_HTTP_TIMEOUT", "20"))
+
+# Process-wide cap on Amadeus API calls per second (token requests excluded)
+REQUEST_RATE = float(os.getenv("AMADEUS_RATE", "10"))
+
+
+class PooledResponse:
+    """
+    Minimal stand-in for the urllib response object the Amadeus SDK parses
+    (status/code, getheader, read).
+    """
+
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.code = status
+        self.reason = reason
+        self.headers = headers
+        self._body = body
+
+    def getcode(self):
+        return self.status
+
+    def getheader(self, name, default=None):
+        for key, value in self.headers:
+            if key.lower() == name.lower():
+                return value
+        return default
+
+    def getheaders(self):
+        return list(self.headers)
+
+    def read(self):
+        return self._body
+
+
+class PooledTransport:
+    """
+    Thread-safe HTTP callable handed to amadeus.Client(http=...).
+
+    Keeps idle keep-alive connections per host and answers the SDK's OAuth
+    token requests from a process-wide cache, so every client built on top of
+    it shares one token that is refreshed shortly before it expires.
+    """
+
+    def __init__(self, max_idle=POOL_MAX_IDLE, timeout=HTTP_TIMEOUT,
+                 refresh_margin=TOKEN_REFRESH_MARGIN):
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.refresh_margin = refresh_margin
+        self._idle = {}
+        self._pool_lock = threading.Lock()
+        self._token_lock = threading.Lock()
+        self._token = None
+        self._token_expires_at = 0.0
+        self._bucket = TokenBucket(rate=REQUEST_RATE, capacity=REQUEST_RATE)
+        self.stats = {
+            "requests": 0,
+            "connections_opened": 0,
+            "connections_reused": 0,
+            "token_refreshes": 0,
+            "token_cache_hits": 0,
+        }
+
+    # -- connection pool -------------------------------------------------
+    def _checkout(self, scheme, netloc):
+        with self._pool_lock:
+            conns = self._idle.get((scheme, netloc))
+            if conns:
+                self.stats["connections_reused"] += 1
+                return conns.pop(), True
+            self.stats["connections_opened"] += 1
+        conn_cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return conn_cls(netloc, timeout=self.timeout), False
+
+    def _checkin(self, scheme, netloc, conn):
+        with self._pool_lock:
+            conns = self._idle.setdefault((scheme, netloc), [])
+            if len(conns) < self.max_idle:
+                conns.append(conn)
+                return
+        conn.close()
+
+    def send(self, method, url, headers, body=None):
+        """
+        Perform one HTTP exchange over a pooled connection.
+        Returns (status, reason, header_list, body_bytes).
+        """
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        with self._pool_lock:
+            self.stats["requests"] += 1
+
+        conn, reused = self._checkout(parts.scheme, parts.netloc)
+        try:
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                payload = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if not reused:
+                    raise
+                # The server dropped an idle keep-alive connection; retry once fresh.
+                with self._pool_lock:
+                    self.stats["connections_reused"] -= 1
+                    self.stats["connections_opened"] += 1
+                conn_cls = type(conn)
+                conn = conn_cls(parts.netloc, timeout=self.timeout)
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                payload = resp.read()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            # Refused connections, DNS failures, socket timeouts and broken
+            # responses (bad status line, truncated body): the SDK only turns
+            # URLError into NetworkError, which agents already handle
+            raise urllib.error.URLError(e) from e
+        except Exception:
+            conn.close()
+            raise
+
+        if resp.will_close:
+            conn.close()
+        else:
+            self._checkin(parts.scheme, parts.netloc, conn)
+        return resp.status, resp.reason, resp.getheaders(), payload
+
+    # -- OAuth token cache -----------------------------------------------
+    def _token_response(self):
+        remaining = int(self._token_expires_at - time.time())
+        body = json.dumps({
+            "type": "amadeusOAuth2Token",
+            "token_type": "Bearer",
+            "access_token": self._token,
+            "expires_in": max(remaining, 0),
+        }).encode("utf-8")
+        return PooledResponse(200, "OK", [("Content-Type", "application/json")], body)
+
+    def _fetch_token(self, request):
+        with self._token_lock:
+            if self._token and time.time() < self._token_expires_at - self.refresh_margin:
+                self.stats["token_cache_hits"] += 1
+                return self._token_response()
+
+            # Token exchanges are never recorded; replay hands out a dummy token
+            status, reason, headers, payload = get_backend().exchange(
+                "amadeus", request.get_method(), request.full_url,
+                dict(request.header_items()), request.data, self.send,
+                replay_default=_REPLAY_TOKEN
+            )
+            if status != 200:
+                return PooledResponse(status, reason, headers, payload)
+
+            result = json.loads(payload.decode("utf-8"))
+            self._token = result["access_token"]
+            self._token_expires_at = time.time() + int(result.get("expires_in", 0))
+            self.stats["token_refreshes"] += 1
+            return self._token_response()
+
+    def __call__(self, request):
+        if urlsplit(request.full_url).path == TOKEN_PATH:
+            return self._fetch_token(request)
+        self._bucket.acquire()
+        status, reason, headers, payload = get_backend().exchange(
+            "amadeus", request.get_method(), request.full_url,
+            dict(request.header_items()), request.data, self.send
+        )
+        return PooledResponse(status, reason, headers, payload)
+
+    def close(self):
+        with self._pool_lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
+
+
+_client = None
+_transport = None
+_client_lock = threading.Lock()
+
+
+def get_amadeus():
+    """
+    Return the process-wide Amadeus client, creating it on first use.
+    All agents share it, along with its connection pool and OAuth token.
+    """
+    global _client, _transport
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _transport = PooledTransport()
+                _client = Client(
+                    client_id=os.getenv("AMADEUS_API_KEY"),
+                    client_secret=os.getenv("AMADEUS_API_SECRET"),
+                    hostname="production",
+                    http=_transport
+                )
+    return _client
+
+
+def amadeus_stats():
+    """
+    Counters for the shared transport (token refreshes, connections reused, ...).
+    """
+    if _transport is None:
+        return {}
+    with _transport._pool_lock:
+        return dict(_transport.stats)
+
+
+register_collector("amadeus", amadeus_stats)
@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from urllib.parse import urlsplit, parse_qsl
+from helpers.metrics import span, incr, register_collector
+from helpers import stubs
+
+FIXTURES_DIR = os.getenv("TRAVELBOT_FIXTURES", "fixtures")
+
+
+class FixtureMissing(Exception):
+    pass
+
+
+class LatencyModel:
+    """
+    Delay distribution in milliseconds, written as "kind:args":
+    "fixed:120", "uniform:50:400", "lognormal:<median>:<sigma>".
+    """
+
+    def __init__(self, spec="fixed:0"):
+        kind, *args = spec.split(":")
+        self.kind = kind
+        self.args = [float(a) for a in args]
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution '{spec}'")
+
+    def sample(self, rng):
+        if self.kind == "fixed":
+            return self.args[0] / 1000
+        if self.kind == "uniform":
+            return rng.uniform(self.args[0], self.args[1]) / 1000
+        median, sigma = self.args
+        return rng.lognormvariate(0, sigma) * median / 1000
+
+
+def _parse_map(spec, convert):
+    """
+    "amadeus=lognormal:300:0.6,openai=fixed:900" -> {"amadeus": ..., "openai": ...}
+    A bare value applies to every service under the key "*".
+    """
+    result = {}
+    for item in filter(None, (spec or "").split(",")):
+        service, _, value = item.rpartition("=")
+        result[service.strip() or "*"] = convert(value.strip())
+    return result
+
+
+def request_key(service, method, url, headers, body):
+    """
+    Stable identity of a request: method, host and path, sorted query and a
+    canonical JSON body. Headers are left out; they carry credentials and
+    SDK/platform noise rather than anything that changes the answer.
+    """
+    parts = urlsplit(url)
+    query = sorted(parse_qsl(parts.query, keep_blank_values=True))
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True) if body else ""
+    except ValueError:
+        pass
+    return json.dumps([service, method.upper(), parts.netloc + parts.path, query, body])
+
+
+class Backend:
+    """
+    Seam every external HTTP exchange goes through.
+
+    live:   pass straight through
+    record: pass through and save each response under fixtures/<service>/
+    replay: answer from fixtures, after an injected delay; optionally fail a
+            share of calls with a 500 or a 429 rate-limit response
+    stub:   like replay, but answer with synthetic responses built from the
+            request (helpers/stubs.py), so no fixtures are needed
+    """
+
+    def __init__(self, mode="live", fixtures_dir=FIXTURES_DIR, latency=None,
+                 error_rate=None, rate_limit_rate=None, seed=None, strict=False):
+        if mode not in ("live", "record", "replay", "stub"):
+            raise ValueError(f"Unknown backend mode '{mode}'")
+        self.mode = mode
+        self.fixtures_dir = fixtures_dir
+        self.latency = {k: LatencyModel(v) if isinstance(v, str) else v
+                        for k, v in (latency or {}).items()}
+        self.error_rate = error_rate or {}
+        self.rate_limit_rate = rate_limit_rate or {}
+        self.strict = strict
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._fixtures = {}
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    def _setting(self, table, service, default):
+        return table.get(service, table.get("*", default))
+
+    def _path(self, service, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+        return os.path.join(self.fixtures_dir, service, f"{digest}.json")
+
+    def _count(self, service, what):
+        with self._lock:
+            counts = self.stats.setdefault(service, {})
+            counts[what] = counts.get(what, 0) + 1
+
+    def _record(self, service, key, response):
+        status, reason, headers, body = response
+        path = self._path(service, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        content_type = next((v for k, v in headers if k.lower() == "content-type"), "")
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({
+                "request": json.loads(key),
+                "status": status,
+                "reason": reason,
+                "content_type": content_type,
+                "body": body.decode("utf-8", "replace"),
+            }, fh, indent=1)
+
+    def _load(self, service, key):
+        path = self._path(service, key)
+        with self._lock:
+            if path in self._fixtures:
+                return self._fixtures[path]
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as fh:
+            fixture = json.load(fh)
+        response = (fixture["status"], fixture["reason"],
+                    [("Content-Type", fixture["content_type"])], fixture["body"].encode("utf-8"))
+        with self._lock:
+            self._fixtures[path] = response
+        return response
+
+    def _replay(self, service, key, replay_default, method=None, url=None, body=None):
+        with self._rng_lock:
+            delay = self._setting(self.latency, service, LatencyModel()).sample(self._rng)
+            roll = self._rng.random()
+        time.sleep(delay)
+
+        error_rate = self._setting(self.error_rate, service, 0.0)
+        limited_rate = self._setting(self.rate_limit_rate, service, 0.0)
+        json_type = [("Content-Type", "application/json")]
+        if roll < limited_rate:
+            self._count(service, "rate_limited")
+            body = json.dumps({"errors": [{"status": 429, "title": "Too many requests"}]})
+            return 429, "Too Many Requests", json_type + [("Retry-After", "1")], body.encode()
+        if roll < limited_rate + error_rate:
+            self._count(service, "errors")
+            body = json.dumps({"errors": [{"status": 500, "title": "Injected server error"}]})
+            return 500, "Internal Server Error", json_type, body.encode()
+
+        if replay_default is not None:
+            return replay_default
+        if self.mode == "stub":
+            self._count(service, "stubbed")
+            return stubs.respond(service, method, url, body)
+        response = self._load(service, key)
+        if response is None:
+            self._count(service, "missing")
+            if self.strict:
+                raise FixtureMissing(f"No {service} fixture for {key}")
+            print(f"No {service} fixture recorded for {key}")
+            body = json.dumps({"errors": [{"status": 404, "title": "No fixture recorded"}]})
+            return 404, "Not Found", json_type, body.encode()
+        self._count(service, "replayed")
+        return response
+
+    def exchange(self, service, method, url, headers, body, send, replay_default=None):
+        """
+        Run one HTTP exchange for 'service'. send(method, url, headers, body)
+        performs the real call and returns (status, reason, headers, body).
+        'replay_default' marks calls that are never recorded (e.g. OAuth
+        tokens) and supplies the response served for them in replay mode.
+        """
+        incr("external_calls", service=service, mode=self.mode)
+        with span(f"external:{service}"):
+            if self.mode == "live":
+                response = send(method, url, headers, body)
+            else:
+                key = request_key(service, method, url, headers, body)
+                if self.mode in ("replay", "stub"):
+                    response = self._replay(service, key, replay_default, method, url, body)
+                else:
+                    response = send(method, url, headers, body)
+                    if replay_default is None and response[0] < 500:
+                        self._record(service, key, response)
+                        self._count(service, "recorded")
+        if response[0] >= 400:
+            incr("external_errors", service=service, status=response[0])
+        return response
+
+    def openai_http_client(self):
+        """
+        httpx client routing OpenAI calls through this backend, or None in
+        live mode so the SDK keeps its default client.
+        """
+        if self.mode == "live":
+            return None
+        import httpx
+
+        backend = self
+        live = httpx.HTTPTransport()
+
+        class _Transport(httpx.BaseTransport):
+            def handle_request(self, request):
+                def send(method, url, headers, body):
+                    response = live.handle_request(request)
+                    payload = response.read()
+                    return response.status_code, response.reason_phrase, \
+                        list(response.headers.items()), payload
+
+                status, _, headers, payload = backend.exchange(
+                    "openai", request.method, str(request.url),
+                    dict(request.headers), request.read(), send
+                )
+                headers = [(k, v) for k, v in headers if k.lower() not in
+                           ("content-encoding", "content-length", "transfer-encoding")]
+                return httpx.Response(status, headers=headers, content=payload, request=request)
+
+        return httpx.Client(transport=_Transport())
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def configure(**kwargs):
+    """
+    Replace the process-wide backend (benchmarks and offline runs).
+    """
+    global _backend
+    with _backend_lock:
+        _backend = Backend(**kwargs)
+    return _backend
+
+
+def backend_stats():
+    backend = get_backend()
+    with backend._lock:
+        return {service: dict(c) for service, c in backend.stats.items()}
+
+
+register_collector("backend", backend_stats)
+
+
+def get_backend():
+    """
+    The process-wide backend, configured from the environment:
+    TRAVELBOT_BACKEND=live|record|replay|stub, TRAVELBOT_FIXTURES,
+    TRAVELBOT_REPLAY_LATENCY ("amadeus=lognormal:300:0.5,openai=fixed:900"),
+    TRAVELBOT_REPLAY_ERRORS / TRAVELBOT_REPLAY_RATE_LIMITED ("amadeus=0.02"),
+    TRAVELBOT_REPLAY_SEED and TRAVELBOT_REPLAY_STRICT.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                seed = os.getenv("TRAVELBOT_REPLAY_SEED")
+                _backend = Backend(
+                    mode=os.getenv("TRAVELBOT_BACKEND", "live"),
+                    latency=_parse_map(os.getenv("TRAVELBOT_REPLAY_LATENCY"), LatencyModel),
+                    error_rate=_parse_map(os.getenv("TRAVELBOT_REPLAY_ERRORS"), float),
+                    rate_limit_rate=_parse_map(os.getenv("TRAVELBOT_REPLAY_RATE_LIMITED"), float),
+                    seed=int(seed) if seed else None,
+                    strict=os.getenv("TRAVELBOT_REPLAY_STRICT") == "1",
+                )
+    return _backend
@@ -0,0 +1,192 @@
+import re
+import threading
+from datetime import date
+from helpers.airport_index import (
+    get_airport_index, fold, match_country, match_region, COUNTRIES, REGIONS, AMBIGUOUS_CITIES
+)
+from helpers.metrics import incr, register_collector
+
+# ------------------------------------------------
+# Tier metrics
+# ------------------------------------------------
+_tier_lock = threading.Lock()
+_tier_counts = {}
+
+
+def record_tier(kind, tier):
+    """
+    Count which tier ("fast" or "llm") resolved a parse of 'kind'.
+    """
+    with _tier_lock:
+        counts = _tier_counts.setdefault(kind, {"fast": 0, "llm": 0})
+        counts[tier] = counts.get(tier, 0) + 1
+    incr("parse_tier", kind=kind, tier=tier)
+
+
+def tier_stats():
+    """
+    Per-kind tier counts plus the share resolved without the LLM.
+    """
+    with _tier_lock:
+        stats = {kind: dict(c) for kind, c in _tier_counts.items()}
+    for counts in stats.values():
+        total = sum(counts.values())
+        counts["fast_share"] = counts["fast"] / total if total else 0.0
+    return stats
+
+
+register_collector("parse_tier", tier_stats)
+
+
+# ------------------------------------------------
+# Locations
+# ------------------------------------------------
+def fast_parse_location(location_string: str):
+    """
+    Resolve "City", "City, Country", "City, ST" or "City, State, Country"
+    from the bundled gazetteer. Returns the parse_location dict, or None
+    when the input is unknown or ambiguous and should go to the LLM.
+    """
+    parts = [p.strip() for p in (location_string or "").split(",") if p.strip()]
+    if not parts or len(parts) > 3:
+        return None
+
+    if len(parts) == 1 and fold(parts[0]) in AMBIGUOUS_CITIES:
+        return None
+
+    index = get_airport_index()
+    matches = index.exact_matches(parts[0])
+    # "NYC" expands to the city plus airports in Newark, Islip, ...; the city wins
+    matches = [m for m in matches if m["subType"] == "CITY"] or matches
+    candidates = {}
+    for m in matches:
+        addr = m["address"]
+        candidates.setdefault((addr["cityName"], addr["stateCode"], addr["countryCode"]), m)
+    if not candidates:
+        return None
+
+    # Every trailing part must narrow the candidates down; anything we
+    # don't recognise means the LLM should take a look.
+    for part in parts[1:]:
+        narrowed = {}
+        for key in candidates:
+            _, region, country = key
+            if match_country(part) == country or match_region(part, country) == region:
+                narrowed[key] = candidates[key]
+        if not narrowed:
+            return None
+        candidates = narrowed
+
+    if len(candidates) != 1:
+        return None
+
+    city, region, country = next(iter(candidates))
+    return {
+        "city": city,
+        "state": REGIONS.get(country, {}).get(region, "") if region else "",
+        "country": COUNTRIES.get(country, country),
+        "clarifications": "",
+    }
+
+
+# ------------------------------------------------
+# Dates
+# ------------------------------------------------
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "sept": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+_MONTH = (r"\b(january|february|march|april|may|june|july|august|september|october|"
+          r"november|december|jan|feb|mar|apr|jun|jul|aug|sept|sep|oct|nov|dec)\.?")
+_DAY = r"(\d{1,2})(?:st|nd|rd|th)?"
+_YEAR = r"(?:,?\s+(\d{4}))?"
+_SEP = r"\s*(?:-|–|—|to|until|till|through|thru)\s*"
+
+# (regex, handler) pairs; handlers return a list of (year|None, month, day)
+_DATE_PATTERNS = [
+    (re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})"),
+     lambda m: [(int(m[1]), int(m[2]), int(m[3]))]),
+    (re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})"),
+     lambda m: [(int(m[3]), int(m[1]), int(m[2]))]),
+    (re.compile(_MONTH + r"\s+" + _DAY + _SEP + _DAY + _YEAR),
+     lambda m: [(_year(m[4]), MONTHS[m[1][:3]], int(m[2])),
+                (_year(m[4]), MONTHS[m[1][:3]], int(m[3]))]),
+    (re.compile(_DAY + _SEP + _DAY + r"\s+(?:of\s+)?" + _MONTH + _YEAR),
+     lambda m: [(_year(m[4]), MONTHS[m[3][:3]], int(m[1])),
+                (_year(m[4]), MONTHS[m[3][:3]], int(m[2]))]),
+    (re.compile(_MONTH + r"\s+" + _DAY + _YEAR),
+     lambda m: [(_year(m[3]), MONTHS[m[1][:3]], int(m[2]))]),
+    (re.compile(_DAY + r"\s+(?:of\s+)?" + _MONTH + _YEAR),
+     lambda m: [(_year(m[3]), MONTHS[m[2][:3]], int(m[1]))]),
+]
+
+# Words allowed around the dates themselves
+_FILLER = re.compile(
+    r"\b(from|to|until|till|through|thru|and|between|on|leaving|depart(?:ing|ure)?|"
+    r"return(?:ing)?|back|starting|start|ending|end|the)\b|[-–—,.:;]"
+)
+
+
+def _year(text):
+    return int(text) if text else None
+
+
+def _resolve(parts, today):
+    """
+    Fill in missing years: the first date is the next occurrence on or
+    after today; a later date that would land before it rolls a year on.
+    """
+    dates = []
+    for year, month, day in parts:
+        if year is None:
+            year = today.year
+            if date(year, month, day) < today:
+                year += 1
+            if dates and date(year, month, day) < dates[-1]:
+                year += 1
+        dates.append(date(year, month, day))
+    return dates
+
+
+def fast_parse_dates(date_string: str, today=None):
+    """
+    Handle explicit dates and ranges (ISO, M/D/YYYY, "March 6-10 2025",
+    "6 to 10 March"). Returns the parse_dates dict, or None when the text
+    contains anything it can't account for.
+    """
+    today = today or date.today()
+    text = " ".join((date_string or "").lower().split())
+    if not text:
+        return None
+
+    found = []
+    rest = text
+    for pattern, handler in _DATE_PATTERNS:
+        for m in pattern.finditer(rest):
+            found.append((m.start(), handler(m)))
+        rest = pattern.sub(lambda m: " " * len(m[0]), rest)
+    if not found or _FILLER.sub(" ", rest).strip():
+        return None
+
+    parts = [p for _, group in sorted(found) for p in group]
+    if len(parts) > 2:
+        return None
+    try:
+        dates = _resolve(parts, today)
+    except ValueError:
+        return None
+    if len(dates) == 2 and dates[1] < dates[0]:
+        return None
+
+    clarifications = []
+    if any(p[0] is None for p in parts):
+        clarifications.append("Year not given; assumed the next upcoming date.")
+    if "/" in text:
+        clarifications.append("Read as month/day/year.")
+    if len(dates) == 1:
+        clarifications.append("No end date given.")
+    return {
+        "start_date": dates[0].isoformat(),
+        "end_date": dates[1].isoformat() if len(dates) == 2 else "",
+        "clarifications": " ".join(clarifications),
+    }
@@ -0,0 +1,109 @@
+import numpy as np
+from helpers.offers import OfferSet
+
+SORTS = ("price", "duration", "departure", "best")
+
+
+def _hour(timestamp):
+    """
+    "2025-05-12T07:45:00" -> 7; -1 when missing.
+    """
+    try:
+        return int(timestamp[11:13])
+    except (TypeError, ValueError):
+        return -1
+
+
+class FlightTable:
+    """
+    Columnar view of an OfferSet of FlightOffer, built once per search so
+    filtering and re-ranking are array operations rather than loops over
+    offers on every rerun.
+
+    Columns (one row per offer, in OfferSet order): price (NaN if unknown),
+    minutes (total duration), stops (most stops on any itinerary),
+    dep_hour (outbound departure hour, -1 if unknown) and carriers (a
+    boolean matrix over carrier_codes).
+    """
+    __slots__ = ("offers", "ids", "price", "minutes", "stops", "dep_hour",
+                 "carrier_codes", "carriers")
+
+    def __init__(self, offers: OfferSet):
+        n = len(offers)
+        self.offers = offers
+        self.ids = np.array(offers.ids, dtype=object)
+        self.price = np.array(offers.prices, dtype=float)
+        self.minutes = np.fromiter((o.total_minutes for o in offers), dtype=float, count=n)
+        self.stops = np.fromiter((o.stops for o in offers), dtype=np.int16, count=n)
+        self.dep_hour = np.fromiter(
+            (_hour(o.itineraries[0][0].dep_time) if o.itineraries and o.itineraries[0] else -1
+             for o in offers),
+            dtype=np.int8, count=n
+        )
+        self.carrier_codes = tuple(sorted({c for o in offers for c in o.carriers}))
+        column = {code: i for i, code in enumerate(self.carrier_codes)}
+        self.carriers = np.zeros((n, len(self.carrier_codes)), dtype=bool)
+        for row, offer in enumerate(offers):
+            for code in offer.carriers:
+                self.carriers[row, column[code]] = True
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, offer_id):
+        return self.offers[offer_id]
+
+    def price_range(self):
+        known = self.price[~np.isnan(self.price)]
+        return (float(known.min()), float(known.max())) if known.size else (0.0, 0.0)
+
+    def mask(self, max_price=None, max_stops=None, depart_between=None,
+             carriers=None, max_minutes=None):
+        """
+        Rows passing every given filter. 'depart_between' is an inclusive
+        (first_hour, last_hour) window; 'carriers' keeps offers flown only
+        by those carriers.
+        """
+        keep = np.ones(len(self), dtype=bool)
+        if max_price is not None:
+            keep &= self.price <= max_price
+        if max_stops is not None:
+            keep &= self.stops <= max_stops
+        if depart_between is not None:
+            first, last = depart_between
+            keep &= (self.dep_hour >= first) & (self.dep_hour <= last)
+        if carriers:
+            allowed = np.array([c in carriers for c in self.carrier_codes], dtype=bool)
+            keep &= ~(self.carriers & ~allowed).any(axis=1)
+        if max_minutes is not None:
+            keep &= self.minutes <= max_minutes
+        return keep
+
+    def rank(self, sort="price", mask=None, limit=None):
+        """
+        Offer IDs of the rows in 'mask' (default: all), best first.
+
+        price / duration / departure sort on that column with price and
+        duration as tie-breakers; best scores price and duration relative
+        to the median plus a penalty per stop.
+        """
+        rows = np.flatnonzero(mask) if mask is not None else np.arange(len(self))
+        if rows.size == 0:
+            return []
+        price = np.nan_to_num(self.price[rows], nan=np.inf)
+        minutes = np.nan_to_num(self.minutes[rows], nan=np.inf)
+        if sort == "duration":
+            order = np.lexsort((price, minutes))
+        elif sort == "departure":
+            hours = np.where(self.dep_hour[rows] < 0, 99, self.dep_hour[rows])
+            order = np.lexsort((price, hours))
+        elif sort == "best":
+            finite_price = price[np.isfinite(price)]
+            finite_minutes = minutes[np.isfinite(minutes)]
+            p = price / (np.median(finite_price) if finite_price.size else 1.0)
+            m = minutes / (np.median(finite_minutes) if finite_minutes.size else 1.0)
+            order = np.argsort(p + 0.5 * m + 0.25 * self.stops[rows], kind="stable")
+        else:
+            order = np.lexsort((minutes, price))
+        ranked = self.ids[rows[order]]
+        return list(ranked[:limit] if limit else ranked)
@@ -0,0 +1,100 @@
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def geohash_encode(lat, lon, precision=5):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        ch <<= 1
+        if value >= mid:
+            ch |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def geohash_bbox(geohash):
+    """
+    (south, west, north, east) of a geohash cell.
+    """
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for c in geohash:
+        value = _BASE32.index(c)
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if value >> shift & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def _cell_size(precision):
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** (bits - bits // 2)
+
+
+def tile_precision(lat, radius_km, coarsest=4):
+    """
+    Finest geohash precision whose cells around 'lat' span the diameter of
+    a 'radius_km' circle both ways, so the circle touches at most four of
+    them; never coarser than 'coarsest'.
+    """
+    km_per_degree = math.radians(EARTH_RADIUS_KM)
+    for precision in range(12, coarsest, -1):
+        cell_lat, cell_lon = _cell_size(precision)
+        width = cell_lon * km_per_degree * math.cos(math.radians(lat))
+        if min(cell_lat * km_per_degree, width) >= 2 * radius_km:
+            return precision
+    return coarsest
+
+
+def _distance_to_box_km(lat, lon, box):
+    south, west, north, east = box
+    return haversine_km(lat, lon, min(max(lat, south), north), min(max(lon, west), east))
+
+
+def covering_tiles(lat, lon, radius_km, precision=5):
+    """
+    Geohash cells of 'precision' that intersect the circle of 'radius_km'
+    around (lat, lon), nearest first.
+    """
+    cell_lat, cell_lon = _cell_size(precision)
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+
+    tiles = {}
+    steps_lat = int(2 * dlat / cell_lat) + 2
+    steps_lon = int(2 * dlon / cell_lon) + 2
+    for i in range(steps_lat + 1):
+        y = min(max(lat - dlat + i * cell_lat, -90.0), 90.0)
+        for j in range(steps_lon + 1):
+            x = (lon - dlon + j * cell_lon + 180.0) % 360.0 - 180.0
+            tile = geohash_encode(y, x, precision)
+            if tile not in tiles:
+                distance = _distance_to_box_km(lat, lon, geohash_bbox(tile))
+                if distance <= radius_km:
+                    tiles[tile] = distance
+    return sorted(tiles, key=tiles.get)
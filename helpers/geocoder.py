@@ -0,0 +1,119 @@
+import os
+import json
+import threading
+from urllib.parse import urlencode
+import requests
+from requests.adapters import HTTPAdapter
+from helpers.concurrency import SingleFlight
+from helpers.response_cache import get_cache, DAY
+from helpers.backends import get_backend
+from helpers.metrics import traced, register_collector
+from helpers.resilience import call, UpstreamError
+from helpers.scheduler import throttle
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+USER_AGENT = os.getenv("NOMINATIM_USER_AGENT", "YourAppName/1.0 (contact@yourdomain.com)")
+
+# (connect, read) timeouts in seconds
+TIMEOUT = (3.05, 10)
+
+# Places don't move; misses are kept shorter in case the query was a typo
+FOUND_TTL = 30 * DAY
+NOT_FOUND_TTL = 1 * DAY
+
+_session = None
+_session_lock = threading.Lock()
+_flights = SingleFlight()
+
+
+def get_session():
+    """
+    The shared keep-alive session used for every Nominatim request.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers["User-Agent"] = USER_AGENT
+                session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+                _session = session
+    return _session
+
+
+def normalize_query(place_query: str):
+    """
+    "Paris , France" and "paris,  france" -> "paris, france".
+    """
+    parts = [" ".join(p.split()) for p in (place_query or "").lower().split(",")]
+    return ", ".join(p for p in parts if p)
+
+
+def _send(method, url, headers, body):
+    response = get_session().request(method, url, headers=headers, data=body, timeout=TIMEOUT)
+    return response.status_code, response.reason, list(response.headers.items()), response.content
+
+
+def _fetch(query):
+    """
+    One request to Nominatim. Returns the parsed match, None if nothing
+    matched; raises on transport and HTTP errors.
+    """
+    url = f"{NOMINATIM_URL}?{urlencode({'q': query, 'format': 'json', 'limit': 1})}"
+    status, reason, _, body = get_backend().exchange("nominatim", "GET", url, {}, None, _send)
+    if status >= 400:
+        raise UpstreamError(status, f"Nominatim HTTP {status} {reason}")
+    data = json.loads(body)
+    if not data:
+        return None
+
+    top = data[0]
+    return {
+        "latitude": float(top["lat"]),
+        "longitude": float(top["lon"]),
+        "display_name": top.get("display_name", "")
+    }
+
+
+def _lookup(key):
+    cache = get_cache()
+    cached, state = cache.get("geocode", key)
+    if state is not None:
+        return cached["match"]
+
+    try:
+        # Wait for Nominatim's rate (scheduler.RATES) before the deadline
+        # starts; retries inside call() take their own turn
+        throttle("geocode")
+        match = call("geocode", _fetch, key)
+    except Exception as e:
+        print(f"Nominatim request error: {e}")
+        return None
+    cache.set("geocode", key, {"match": match}, FOUND_TTL if match else NOT_FOUND_TTL)
+    return match
+
+
+@traced("geocode_place")
+def geocode_place(place_query: str):
+    """
+    Geocode a free-form query with Nominatim.
+    Return lat/lon from the top match if found, plus the full display_name.
+
+    Results are cached persistently by normalized query, requests are held
+    to Nominatim's rate limit, and identical lookups already in flight
+    (from any session) share a single request.
+    """
+    key = normalize_query(place_query)
+    if not key:
+        return None
+    return _flights.do(key, _lookup, key)
+
+
+def geocoder_stats():
+    return {
+        "coalesced": _flights.coalesced,
+        "in_flight": _flights.in_flight(),
+    }
+
+
+register_collector("geocoder", geocoder_stats)
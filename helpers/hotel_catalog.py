@@ -0,0 +1,269 @@
+import os
+import json
+import math
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from agents.hotel_agent import get_hotels_in_city
+from helpers.airport_index import fold
+from helpers.geo import haversine_km, EARTH_RADIUS_KM
+from helpers.response_cache import DAY
+from helpers.metrics import bind, traced
+from helpers.scheduler import background
+
+CATALOG_PATH = os.getenv("TRAVELBOT_CATALOG_PATH", os.path.join(".cache", "hotels.sqlite3"))
+
+# A city's hotel list is re-fetched in the background once it is this old
+REFRESH_AFTER = float(os.getenv("TRAVELBOT_CATALOG_REFRESH_DAYS", "3")) * DAY
+
+SORTS = {
+    "distance": "distance_km IS NULL, distance_km, name_folded",
+    "name": "name_folded",
+    "rating": "rating IS NULL, rating DESC, distance_km",
+}
+
+_refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-refresh")
+
+
+def _rating(value):
+    """
+    Star rating as a number ("4", 4, "4.5"), or None if missing or not one ("N/A").
+    """
+    try:
+        rating = float(value)
+    except (TypeError, ValueError):
+        return None
+    return rating if math.isfinite(rating) else None
+
+
+def _row(city_code, hotel):
+    geo = hotel.get("geoCode") or {}
+    distance = hotel.get("distance") or {}
+    value = distance.get("value")
+    if value is not None:
+        value = float(value) * (1.609 if distance.get("unit") == "MILE" else 1.0)
+    return (
+        hotel.get("hotelId"), city_code, hotel.get("name", "Unknown Hotel"),
+        fold(hotel.get("name", "")), hotel.get("chainCode") or "",
+        _rating(hotel.get("rating")),
+        geo.get("latitude"), geo.get("longitude"), value, json.dumps(hotel),
+    )
+
+
+class HotelCatalog:
+    """
+    Hotels per city code kept in SQLite, indexed for the Step 5 picker:
+    name/word prefix, chain, rating and distance from a point, paginated.
+    A city is loaded from the hotel list API on first use and refreshed
+    in the background after REFRESH_AFTER.
+    """
+
+    def __init__(self, path=CATALOG_PATH):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        primary_key = [r[1] for r in self._conn.execute("PRAGMA table_info(hotels)") if r[5]]
+        if primary_key == ["hotel_id"]:
+            # Catalogs from before hotels were keyed per city: start over,
+            # cities are reloaded from the API on first use
+            self._conn.executescript("""
+                DROP TABLE hotels;
+                DROP TABLE IF EXISTS hotel_words;
+                DROP TABLE IF EXISTS cities;
+            """)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS hotels (
+                hotel_id TEXT NOT NULL,
+                city_code TEXT NOT NULL,
+                name TEXT NOT NULL,
+                name_folded TEXT NOT NULL,
+                chain_code TEXT NOT NULL,
+                rating INTEGER,
+                lat REAL,
+                lon REAL,
+                distance_km REAL,
+                raw TEXT NOT NULL,
+                PRIMARY KEY (city_code, hotel_id)
+            );
+            CREATE INDEX IF NOT EXISTS hotels_city_name ON hotels(city_code, name_folded);
+            CREATE INDEX IF NOT EXISTS hotels_city_chain ON hotels(city_code, chain_code);
+            CREATE INDEX IF NOT EXISTS hotels_city_rating ON hotels(city_code, rating);
+            CREATE INDEX IF NOT EXISTS hotels_city_lat_lon ON hotels(city_code, lat, lon);
+            CREATE TABLE IF NOT EXISTS hotel_words (
+                city_code TEXT NOT NULL,
+                word TEXT NOT NULL,
+                hotel_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS hotel_words_city_word ON hotel_words(city_code, word);
+            CREATE TABLE IF NOT EXISTS cities (
+                city_code TEXT PRIMARY KEY,
+                refreshed_at REAL NOT NULL,
+                hotel_count INTEGER NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def load(self, city_code, hotels):
+        """
+        Replace the catalog for 'city_code' with the hotel list 'hotels'.
+        A hotel listed twice keeps its last entry, and only that entry's
+        name words.
+        """
+        rows = {h["hotelId"]: _row(city_code, h) for h in hotels if h.get("hotelId")}
+        words = [(city_code, word, hotel_id) for hotel_id, row in rows.items()
+                 for word in set(row[3].split())]
+        with self._lock:
+            self._conn.execute("DELETE FROM hotels WHERE city_code=?", (city_code,))
+            self._conn.execute("DELETE FROM hotel_words WHERE city_code=?", (city_code,))
+            self._conn.executemany("INSERT INTO hotels VALUES (?,?,?,?,?,?,?,?,?,?)", rows.values())
+            self._conn.executemany("INSERT INTO hotel_words VALUES (?,?,?)", words)
+            self._conn.execute("INSERT OR REPLACE INTO cities VALUES (?,?,?)",
+                               (city_code, time.time(), len(rows)))
+            self._conn.commit()
+        return len(rows)
+
+    def _refresh(self, city_code):
+        try:
+            with background():
+                hotels = get_hotels_in_city.uncached(city_code, radius_km=10)
+            if hotels:
+                self.load(city_code, hotels)
+        finally:
+            with self._lock:
+                self._refreshing.discard(city_code)
+
+    @traced("hotel_catalog.ensure")
+    def ensure(self, city_code):
+        """
+        Make sure 'city_code' is loaded; returns its hotel count. A stale
+        city is served as is while a background refresh runs.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT refreshed_at, hotel_count FROM cities WHERE city_code=?", (city_code,)
+            ).fetchone()
+        if row is None:
+            hotels = get_hotels_in_city(city_code, radius_km=10)
+            return self.load(city_code, hotels) if hotels else 0
+        refreshed_at, count = row
+        if time.time() - refreshed_at > REFRESH_AFTER:
+            with self._lock:
+                start = city_code not in self._refreshing
+                self._refreshing.add(city_code)
+            if start:
+                _refresher.submit(bind(self._refresh), city_code)
+        return count
+
+    def chains(self, city_code):
+        with self._lock:
+            return [r[0] for r in self._conn.execute(
+                "SELECT DISTINCT chain_code FROM hotels WHERE city_code=? AND chain_code != '' "
+                "ORDER BY chain_code", (city_code,)
+            )]
+
+    @traced("hotel_catalog.query")
+    def query(self, city_code, prefix="", chain=None, min_rating=None, near=None,
+              sort="distance", limit=20, offset=0):
+        """
+        One page of hotels in 'city_code' and the total number matching.
+
+        prefix: matches the start of the name, or each of its words
+                matches the start of some word in it (accents and case ignored)
+        near:   (lat, lon, radius_km); results keep only hotels inside it
+                and distance_km becomes the distance from that point
+        Returns (list of {"hotel_id", "name", "chain_code", "rating",
+        "distance_km"}, total).
+        """
+        where, params = ["h.city_code = ?"], [city_code]
+        prefix = fold(prefix)
+        if prefix:
+            # "grand par" also finds "Le Grand Hotel Paris": every word typed
+            # must start some word of the name, in any order
+            words = " AND ".join(
+                ["h.hotel_id IN (SELECT hotel_id FROM hotel_words WHERE city_code = ? AND word >= ? AND word < ?)"]
+                * len(prefix.split())
+            )
+            where.append(f"(h.name_folded >= ? AND h.name_folded < ? OR {words})")
+            params += [prefix, prefix + "\uffff"]
+            for word in prefix.split():
+                params += [city_code, word, word + "\uffff"]
+        if chain:
+            where.append("h.chain_code = ?")
+            params.append(chain)
+        if min_rating:
+            where.append("h.rating >= ?")
+            params.append(int(min_rating))
+        if near:
+            lat, lon, radius_km = near
+            dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+            dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+            where.append("h.lat BETWEEN ? AND ? AND h.lon BETWEEN ? AND ?")
+            params += [lat - dlat, lat + dlat, lon - dlon, lon + dlon]
+
+        sql = ("SELECT h.hotel_id, h.name, h.chain_code, h.rating, h.distance_km, h.lat, h.lon "
+               f"FROM hotels h WHERE {' AND '.join(where)}")
+        with self._lock:
+            if near:
+                # The bounding box is narrowed to the circle in Python
+                rows = self._conn.execute(sql, params).fetchall()
+            else:
+                total = self._conn.execute(
+                    f"SELECT COUNT(*) FROM hotels h WHERE {' AND '.join(where)}", params
+                ).fetchone()[0]
+                rows = self._conn.execute(
+                    f"{sql} ORDER BY {SORTS.get(sort, SORTS['distance'])} LIMIT ? OFFSET ?",
+                    params + [limit, offset]
+                ).fetchall()
+
+        hotels = [
+            {"hotel_id": r[0], "name": r[1], "chain_code": r[2], "rating": r[3],
+             "distance_km": r[4], "lat": r[5], "lon": r[6]}
+            for r in rows
+        ]
+        if near:
+            for h in hotels:
+                h["distance_km"] = haversine_km(lat, lon, h["lat"], h["lon"])
+            hotels = [h for h in hotels if h["distance_km"] <= radius_km]
+            if sort == "name":
+                hotels.sort(key=lambda h: fold(h["name"]))
+            elif sort == "rating":
+                hotels.sort(key=lambda h: (h["rating"] is None, -(h["rating"] or 0), h["distance_km"]))
+            else:
+                hotels.sort(key=lambda h: h["distance_km"])
+            total = len(hotels)
+            hotels = hotels[offset:offset + limit]
+        return hotels, total
+
+    def hotels(self, city_code, hotel_ids=None):
+        """
+        Raw hotel-list entries for 'city_code' (all of them, or 'hotel_ids').
+        """
+        with self._lock:
+            if hotel_ids is None:
+                rows = self._conn.execute(
+                    "SELECT raw FROM hotels WHERE city_code=?", (city_code,)
+                ).fetchall()
+            else:
+                marks = ",".join("?" * len(hotel_ids))
+                rows = self._conn.execute(
+                    f"SELECT raw FROM hotels WHERE city_code=? AND hotel_id IN ({marks})",
+                    [city_code] + list(hotel_ids)
+                ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_hotel_catalog():
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = HotelCatalog()
+    return _catalog
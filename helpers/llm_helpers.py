@@ -1,148 +1,370 @@
 import os
+import re
 import json
+import hashlib
+import threading
+from datetime import date, timedelta
 from langchain.chat_models import ChatOpenAI
 from langchain.chains import ConversationChain
-from langchain.memory import ConversationBufferMemory
-from langchain.output_parsers import ResponseSchema, StructuredOutputParser
-from amadeus import Client, ResponseError
-import requests
+from langchain.memory import ConversationTokenBufferMemory
+from langchain.schema import HumanMessage
+from langchain.callbacks.base import BaseCallbackHandler
+from helpers.fast_parse import fast_parse_location, fast_parse_dates, record_tier
+from helpers.airport_index import get_airport_index
+# Re-exported: geocoding lives in helpers.geocoder
+from helpers.geocoder import geocode_place
+from helpers.backends import get_backend
+from helpers.concurrency import TokenBucket
+from helpers.metrics import traced, incr, span
+from helpers.response_cache import get_cache, make_key, DAY
 
-def get_conversation_chain():
+# Token cap for the conversational memory; older turns are dropped past it
+MEMORY_TOKEN_LIMIT = int(os.getenv("TRAVELBOT_MEMORY_TOKENS", "2000"))
+
+# Process-wide cap on structured-extraction calls per second
+OPENAI_RATE = float(os.getenv("OPENAI_RATE", "5"))
+_extract_bucket = TokenBucket(rate=OPENAI_RATE, capacity=OPENAI_RATE)
+
+# Extraction results are kept this long in the shared response cache
+EXTRACTION_TTL = 30 * DAY
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """
+    Count prompt/completion tokens reported by OpenAI for every LLM call.
+    """
+
+    def on_llm_end(self, response, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        incr("llm_calls")
+        incr("llm_prompt_tokens", usage.get("prompt_tokens", 0))
+        incr("llm_completion_tokens", usage.get("completion_tokens", 0))
+
+
+_chat_model = None
+_chat_model_lock = threading.Lock()
+
+
+def get_chat_model():
+    """
+    The process-wide GPT-4o chat model used for both conversation and
+    extraction; every session shares it and its HTTP connection pool.
+    In record/replay backend modes its HTTP calls go through the backend.
+    """
+    global _chat_model
+    if _chat_model is None:
+        with _chat_model_lock:
+            if _chat_model is None:
+                extra = {}
+                http_client = get_backend().openai_http_client()
+                if http_client is not None:
+                    # ChatOpenAI would also hand this sync client to its async
+                    # OpenAI client, which rejects it; only sync calls are routed
+                    import openai
+                    extra["client"] = openai.OpenAI(
+                        api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client
+                    ).chat.completions
+                _chat_model = ChatOpenAI(
+                    openai_api_key=os.getenv("OPENAI_API_KEY"),
+                    temperature=0.3,
+                    model_name="gpt-4o",
+                    callbacks=[TokenUsageCallback()],
+                    **extra
+                )
+    return _chat_model
+
+
+def get_conversation_chain(max_token_limit=MEMORY_TOKEN_LIMIT):
    """
-   Returns a ConversationChain with buffer memory, so it retains
-   conversation context across multiple user inputs.
+   Returns a ConversationChain whose memory keeps only the most recent
+   turns that fit in max_token_limit tokens. Structured extraction does
+   not go through this memory (see extract_structured). The memory is per
+   chain; the model underneath is shared (get_chat_model).
    """
-   openai_api_key = os.getenv("OPENAI_API_KEY")
-   llm = ChatOpenAI(
-       openai_api_key=openai_api_key,
-       temperature=0.3,
-       model_name="gpt-4o"
+   llm = get_chat_model()
+   memory = ConversationTokenBufferMemory(
+       llm=llm,
+       max_token_limit=max_token_limit,
+       return_messages=True
    )
-   memory = ConversationBufferMemory(return_messages=True)
    chain = ConversationChain(llm=llm, memory=memory, verbose=False)
    return chain
 
 
-def parse_location(conversation_chain, location_string):
+def memory_usage(conversation_chain):
     """
-    Parse the user's location using a structured output parser,
-    but specifically instruct the LLM to guess missing fields if possible.
+    Report how much conversational memory this session is holding.
+    """
+    memory = conversation_chain.memory
+    messages = memory.chat_memory.messages
+    return {
+        "messages": len(messages),
+        "tokens": memory.llm.get_num_tokens_from_messages(messages) if messages else 0,
+        "token_limit": memory.max_token_limit,
+    }
+
+
+def _response_format(schema_name, properties):
     """
-    
-    schemas = [
-        ResponseSchema(name="city", description="City name, or best guess if not explicit"),
-        ResponseSchema(name="state", description="State/Province name if applicable. Otherwise null or empty"),
-        ResponseSchema(name="country", description="Country name or best guess"),
-        ResponseSchema(name="clarifications", description="Any extra info or ambiguities")
-    ]
+    OpenAI structured-outputs format for an object of string fields, in
+    the order given (the model emits them in that order).
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": schema_name,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    name: {"type": "string", "description": description}
+                    for name, description in properties.items()
+                },
+                "required": list(properties),
+                "additionalProperties": False,
+            },
+        },
+    }
+
 
-    parser = StructuredOutputParser.from_response_schemas(schemas)
-    format_instructions = parser.get_format_instructions()
+def extract_structured(llm, prompt_text, schema_name, properties):
+    """
+    One history-free call that asks the model for JSON matching a strict
+    schema (OpenAI structured outputs). 'properties' maps each field to
+    its description; every field is a string.
+    Returns the parsed dict, or raises ValueError on malformed output.
+    """
+    _extract_bucket.acquire()
+    message = llm.invoke([HumanMessage(content=prompt_text)],
+                         response_format=_response_format(schema_name, properties))
+    try:
+        return json.loads(message.content)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Could not parse: {message.content}") from e
 
-    prompt_text = f"""
+
+LOCATION_FIELDS = {
+    "city": "City name, or best guess if not explicit",
+    "state": "State/Province name if applicable, otherwise empty",
+    "country": "Country name or best guess",
+    "clarifications": "Any extra info or ambiguities, otherwise empty",
+}
+
+DATE_FIELDS = {
+    "start_date": "ISO date for start (e.g. 2024-03-06), empty if unknown",
+    "end_date": "ISO date for end (e.g. 2024-03-10), empty if unknown",
+    "clarifications": "Any notes or ambiguities. If none, empty string.",
+}
+
+LOCATION_PROMPT = """
 You are a helpful travel assistant. The user provided the following location:
-"{location_string}"
+"{location}"
 
 1. If the user location is ambiguous or missing a piece (e.g. 'Barcelona' has no state in Spain),
-   try to guess or clarify from context. 
-2. If there's no state or province concept, set state to null (or an empty string).
-3. Return the final result in JSON with the keys: city, state, country, clarifications.
-
-{format_instructions}
+   try to guess or clarify from context.
+2. If there's no state or province concept, set state to an empty string.
 """
 
-    llm_output = conversation_chain.run(prompt_text)
-    parsed = parser.parse(llm_output)
-    return dict(parsed)
-
-
-def parse_dates(conversation_chain, date_string):
-
-    #Define the schema we want
-    date_schemas = [
-        ResponseSchema(
-            name="start_date",
-            description="ISO date for start (e.g. 2024-03-06), empty if unknown"
-        ),
-        ResponseSchema(
-            name="end_date",
-            description="ISO date for end (e.g. 2024-03-10), empty if unknown"
-        ),
-        ResponseSchema(
-            name="clarifications",
-            description="Any notes or ambiguities. If none, empty string."
-        )
-    ]
-
-    #Create a parser from the schemas
-    parser = StructuredOutputParser.from_response_schemas(date_schemas)
-    format_instructions = parser.get_format_instructions()
-
-    # 3) Build the prompt, including the format instructions
-    #    so the LLM knows exactly how to format its JSON.
-    prompt_text = f"""
-You are a travel assistant. The user provided the following date information:
-"{date_string}"
-
-Your task: parse it into valid JSON with keys:
-- start_date
-- end_date
-- clarifications
+DATES_PROMPT = """
+You are a travel assistant. Today is {today}. The user provided the following date information:
+"{dates}"
 
 Each date should be in ISO format (YYYY-MM-DD) if possible.
+Resolve relative dates ("next weekend", "in two weeks") against today's date.
 If ambiguous or invalid, mention that in 'clarifications'.
-
-{format_instructions}
 """
 
-    # 4) Run the chain
-    llm_output = conversation_chain.run(prompt_text)
 
-    # 5) Let the structured parser handle the output
+def _extraction_key(llm, template, schema_name, properties, values):
+    version = hashlib.sha1(json.dumps(
+        [template, schema_name, properties, getattr(llm, "model_name", "")]
+    ).encode("utf-8")).hexdigest()[:12]
+    return make_key({"version": version, **values})
+
+
+def cached_extract(llm, namespace, template, schema_name, properties, **values):
+    """
+    extract_structured() behind the shared persistent cache.
+
+    The key is the normalized prompt inputs plus a version hash of the
+    template, schema and model, so editing a prompt or switching models
+    starts a fresh set of entries. Failed extractions are not cached.
+    """
+    key = _extraction_key(llm, template, schema_name, properties, values)
+    cache = get_cache()
+    result, state = cache.get(namespace, key)
+    if state is not None:
+        return result
+    result = extract_structured(llm, template.format(**values), schema_name, properties)
+    cache.set(namespace, key, result, EXTRACTION_TTL)
+    return result
+
+
+@traced("parse_location")
+def parse_location(conversation_chain, location_string):
+    """
+    Parse the user's location with a structured-output LLM call,
+    but specifically instruct the LLM to guess missing fields if possible.
+    Plain inputs like "Paris, France" are answered from the local gazetteer
+    without calling the LLM.
+    """
+    fast = fast_parse_location(location_string)
+    if fast is not None:
+        record_tier("location", "fast")
+        return fast
+    record_tier("location", "llm")
+
     try:
-        parsed_data = parser.parse(llm_output)
-        return dict(parsed_data)
-    except Exception as e:
+        return cached_extract(conversation_chain.llm, "llm_location", LOCATION_PROMPT,
+                              "location", LOCATION_FIELDS, location=location_string)
+    except ValueError as e:
+        return {
+            "city": "",
+            "state": "",
+            "country": "",
+            "clarifications": str(e)
+        }
+
+
+@traced("parse_dates")
+def parse_dates(conversation_chain, date_string, today=None):
+    """
+    Parse free-form travel dates into ISO start/end dates. Explicit dates
+    and ranges are handled locally; anything fuzzier goes to the LLM.
+    Relative dates are resolved against 'today' (default: the current
+    date), which is also part of the cache key.
+    """
+    today = today or date.today()
+    fast = fast_parse_dates(date_string, today=today)
+    if fast is not None:
+        record_tier("dates", "fast")
+        return fast
+    record_tier("dates", "llm")
+
+    try:
+        return cached_extract(conversation_chain.llm, "llm_dates", DATES_PROMPT, "travel_dates",
+                              DATE_FIELDS, dates=date_string, today=today.isoformat())
+    except ValueError as e:
         # fallback if for some reason the LLM still didn't follow instructions
         return {
             "start_date": "",
             "end_date": "",
-            "clarifications": f"Could not parse: {llm_output}\nError: {str(e)}"
+            "clarifications": f"{e}"
         }
 
 
-def geocode_place(place_query: str):
+# Destination first: it is what the next steps wait for
+TRIP_FIELDS = {
+    "city": "Destination city, or best guess if not explicit",
+    "state": "State/Province of the destination if applicable, otherwise empty",
+    "country": "Destination country name or best guess",
+    "airport_codes": "Comma-separated IATA city or airport codes serving the destination, best first",
+    "start_date": "ISO departure date (e.g. 2024-03-06), empty if unknown",
+    "end_date": "ISO return date (e.g. 2024-03-10), empty if unknown",
+    "nights": "Number of nights as digits if stated, otherwise empty",
+    "adults": "Number of travellers as digits if stated, otherwise empty",
+    "budget": "Total budget as a plain number (e.g. 2000), otherwise empty",
+    "currency": "ISO currency code of the budget (e.g. USD), otherwise empty",
+    "clarifications": "Any extra info or ambiguities, otherwise empty",
+}
+
+TRIP_PROMPT = """
+You are a travel assistant. Today is {today}. The user described their trip:
+"{request}"
+
+Extract the destination, the IATA codes of the city or airports serving it,
+the travel dates, the number of travellers and the total budget.
+Resolve relative or vague dates ("mid-May", "next weekend") against today's date;
+if only a length of stay is given, pick a start date and add the nights.
+Leave a field empty rather than inventing it, and note guesses in 'clarifications'.
+"""
+
+# A finished "field": "value" pair in a partial JSON object of string fields
+_FIELD = re.compile(r'"(\w+)"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def _number(text):
     """
-    Make a GET request to Nominatim with the free-form query.
-    Return lat/lon from the top match if found, plus the full display_name.
+    "2000" / "$2,000" / "2k" -> 2000.0; None if there is no number.
     """
-    base_url = "https://nominatim.openstreetmap.org/search"
-    #print(place_query)
-    params = {
-        "q": place_query,
-        "format": "json",
-        "limit": 1
-    }
-    headers = {
-        "User-Agent": "YourAppName/1.0 (contact@yourdomain.com)"
-    }
-    try:
-        #resp = requests.get(base_url, params=params, timeout=10)
-        response = requests.get(base_url, headers=headers, params=params)
-        data = response.json()
-    except Exception as e:
-        print(f"Nominatim request error: {e}")
+    match = re.search(r"(\d+(?:\.\d+)?)\s*(k\b)?", (text or "").replace(",", "").lower())
+    if not match:
         return None
+    return float(match.group(1)) * (1000 if match.group(2) else 1)
 
-    if not data:
-        return None
 
-    top = data[0]
-    lat = float(top["lat"])
-    lon = float(top["lon"])
-    display_name = top.get("display_name", "")
-    return {
-        "latitude": lat,
-        "longitude": lon,
-        "display_name": display_name
-    }
+def _finish_trip_intent(fields, today):
+    """
+    Typed, checked version of the raw extracted fields:
+    airport_codes becomes a list (codes the local index knows first, or the
+    index's own guess if the model gave none), adults an int (default 1),
+    nights / budget numbers or None, and a missing end_date is derived from
+    start_date + nights.
+    """
+    intent = {name: fields.get(name, "") or "" for name in TRIP_FIELDS}
+    index = get_airport_index()
+    codes = []
+    for code in re.split(r"[\s,/]+", intent["airport_codes"].upper()):
+        if re.fullmatch(r"[A-Z]{3}", code) and code not in codes:
+            codes.append(code)
+    codes.sort(key=lambda c: not index.has_code(c))
+    if not codes and intent["city"]:
+        guess = index.guess_code(intent["city"])
+        codes = [guess] if guess else []
+    intent["airport_codes"] = codes
+
+    for name in ("start_date", "end_date"):
+        try:
+            date.fromisoformat(intent[name])
+        except ValueError:
+            intent[name] = ""
+    nights = _number(intent["nights"])
+    intent["nights"] = int(nights) if nights else None
+    if intent["start_date"] and not intent["end_date"] and intent["nights"]:
+        start = date.fromisoformat(intent["start_date"])
+        intent["end_date"] = (start + timedelta(days=intent["nights"])).isoformat()
+    if intent["start_date"] and intent["start_date"] < today.isoformat():
+        intent["clarifications"] = (intent["clarifications"] + " Start date is in the past.").strip()
+
+    adults = _number(intent["adults"])
+    intent["adults"] = max(1, int(adults)) if adults else 1
+    intent["budget"] = _number(intent["budget"])
+    intent["currency"] = intent["currency"].upper() or "USD"
+    return intent
+
+
+def stream_trip_intent(llm, request, today=None):
+    """
+    Destination, airport codes, dates, travellers and budget from one
+    free-text request ("4 nights in Lisbon mid-May, 2 adults, under $2k")
+    in a single streamed structured-output call.
+
+    Yields the raw fields decoded so far (a growing dict of strings) as the
+    response streams in, so the UI can show each one as soon as it is
+    complete; the last item is the finished intent (_finish_trip_intent).
+    Results are kept in the shared cache like the other extractions.
+    Raises ValueError if the model's output is not valid JSON.
+    """
+    today = today or date.today()
+    values = {"request": " ".join(request.split()), "today": today.isoformat()}
+    key = _extraction_key(llm, TRIP_PROMPT, "trip_intent", TRIP_FIELDS, values)
+    cache = get_cache()
+    with span("stream_trip_intent"):
+        fields, state = cache.get("llm_trip", key)
+        if state is None:
+            _extract_bucket.acquire()
+            text, fields = "", {}
+            for chunk in llm.stream([HumanMessage(content=TRIP_PROMPT.format(**values))],
+                                    response_format=_response_format("trip_intent", TRIP_FIELDS)):
+                text += chunk.content or ""
+                found = {name: json.loads(f'"{value}"') for name, value in _FIELD.findall(text)}
+                if len(found) > len(fields):
+                    fields = found
+                    yield dict(fields)
+            try:
+                fields = json.loads(text)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Could not parse: {text}") from e
+            cache.set("llm_trip", key, fields, EXTRACTION_TTL)
+    yield _finish_trip_intent(fields, today)
+
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import bisect
+import functools
+import threading
+import contextvars
+from collections import deque
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+MAX_TRACES = int(os.getenv("TRAVELBOT_MAX_TRACES", "10000"))
+
+_step = contextvars.ContextVar("travelbot_step", default="")
+_session = contextvars.ContextVar("travelbot_session", default="")
+
+_lock = threading.Lock()
+_histograms = {}   # (name, step) -> [count per bucket..., overflow count, sum]
+_counters = {}     # (name, sorted label items) -> value
+_traces = deque(maxlen=MAX_TRACES)
+_collectors = {}
+
+
+def set_context(step=None, session=None):
+    """
+    Tag everything recorded from this thread (and work bound with bind())
+    with the current Streamlit step and session.
+    """
+    if step is not None:
+        _step.set(str(step))
+    if session is not None:
+        _session.set(str(session))
+
+
+def current_step():
+    return _step.get()
+
+
+def bind(fn):
+    """
+    Wrap 'fn' so it runs with the caller's step/session tags, e.g. when
+    handing work to a thread pool.
+    """
+    ctx = contextvars.copy_context()
+    return functools.partial(ctx.run, fn)
+
+
+def incr(name, value=1, **labels):
+    """
+    Add to a counter. The current step is always one of its labels.
+    """
+    labels.setdefault("step", _step.get())
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, error=False, **tags):
+    """
+    Record one finished span.
+    """
+    step = _step.get()
+    with _lock:
+        hist = _histograms.get((name, step))
+        if hist is None:
+            hist = _histograms[(name, step)] = [0] * (len(BUCKETS) + 1) + [0.0]
+        hist[bisect.bisect_left(BUCKETS, seconds)] += 1
+        hist[-1] += seconds
+        _traces.append({
+            "name": name,
+            "step": step,
+            "session": _session.get(),
+            "end": time.time(),
+            "duration_ms": round(seconds * 1000, 3),
+            "error": error,
+            **tags,
+        })
+    if error:
+        incr("errors", op=name)
+
+
+class span:
+    """
+    Time a block: `with span("find_flights"):`. Exceptions are recorded
+    as errors and re-raised.
+    """
+
+    def __init__(self, name, **tags):
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.start, error=exc_type is not None, **self.tags)
+        return False
+
+
+def traced(name):
+    """
+    Decorator form of span().
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def register_collector(prefix, fn):
+    """
+    Expose a module's own stats dict (e.g. amadeus_stats) as gauges named
+    travelbot_<prefix>_<key>. Nested dicts become labelled series.
+    """
+    _collectors[prefix] = fn
+
+
+# ------------------------------------------------
+# Reading / export
+# ------------------------------------------------
+def span_summary():
+    """
+    Per (span, step): count, mean and p50/p95/p99 in ms from recent traces.
+    """
+    with _lock:
+        traces = list(_traces)
+    grouped = {}
+    for t in traces:
+        grouped.setdefault((t["name"], t["step"]), []).append(t["duration_ms"])
+    rows = []
+    for (name, step), values in sorted(grouped.items()):
+        values.sort()
+        pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+        rows.append({
+            "span": name, "step": step, "count": len(values),
+            "mean_ms": round(sum(values) / len(values), 2),
+            "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+        })
+    return rows
+
+
+def counters():
+    with _lock:
+        return [{"name": name, **dict(labels), "value": value}
+                for (name, labels), value in sorted(_counters.items())]
+
+
+def _label_str(labels):
+    if not labels:
+        return ""
+    body = ",".join(f'{k}="{str(v)}"' for k, v in labels)
+    return "{" + body + "}"
+
+
+def _flatten(prefix, value, labels=()):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            if isinstance(v, dict):
+                yield from _flatten(prefix, v, labels + (("key", k),))
+            else:
+                yield from _flatten(f"{prefix}_{k}", v, labels)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, labels, value
+
+
+def export_prometheus(path=None):
+    """
+    Everything in Prometheus text exposition format. If 'path' is given the
+    text is also written there atomically (node_exporter textfile style).
+    """
+    lines = []
+    with _lock:
+        hists = {k: list(v) for k, v in _histograms.items()}
+        counts = dict(_counters)
+
+    lines.append("# TYPE travelbot_span_seconds histogram")
+    for (name, step), hist in sorted(hists.items()):
+        base = (("span", name), ("step", step))
+        cumulative = 0
+        for bound, n in zip(BUCKETS + (float("inf"),), hist[:-1]):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"travelbot_span_seconds_bucket{_label_str(base + (('le', le),))} {cumulative}")
+        lines.append(f"travelbot_span_seconds_count{_label_str(base)} {cumulative}")
+        lines.append(f"travelbot_span_seconds_sum{_label_str(base)} {hist[-1]}")
+
+    seen_types = set()
+    for (name, labels), value in sorted(counts.items()):
+        metric = f"travelbot_{name}_total"
+        if metric not in seen_types:
+            lines.append(f"# TYPE {metric} counter")
+            seen_types.add(metric)
+        lines.append(f"{metric}{_label_str(labels)} {value}")
+
+    for prefix, fn in sorted(_collectors.items()):
+        try:
+            stats = fn()
+        except Exception as e:
+            print(f"Metrics collector '{prefix}' failed: {e}")
+            continue
+        for metric, labels, value in _flatten(f"travelbot_{prefix}", stats):
+            lines.append(f"{metric}{_label_str(labels)} {value}")
+
+    text = "\n".join(lines) + "\n"
+    if path:
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        os.replace(tmp, path)
+    return text
+
+
+def export_traces(path=None):
+    """
+    Recent spans as a JSON array (optionally written to 'path').
+    """
+    with _lock:
+        text = json.dumps(list(_traces))
+    if path:
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(text)
+    return text
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _traces.clear()
@@ -0,0 +1,234 @@
+import re
+from array import array
+from typing import NamedTuple
+
+_DURATION = re.compile(r"PT(?:(\d+)H)?(?:(\d+)M)?")
+
+
+def duration_minutes(iso_duration):
+    """
+    "PT7H35M" -> 455; None for anything unparseable.
+    """
+    m = _DURATION.fullmatch(iso_duration or "")
+    if not m or not (m[1] or m[2]):
+        return None
+    return int(m[1] or 0) * 60 + int(m[2] or 0)
+
+
+def _price(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Segment:
+    __slots__ = ("dep_iata", "dep_time", "arr_iata", "arr_time",
+                 "duration", "minutes", "carrier", "number")
+
+    def __init__(self, raw):
+        dep = raw.get("departure", {})
+        arr = raw.get("arrival", {})
+        self.dep_iata = dep.get("iataCode", "")
+        self.dep_time = dep.get("at", "")
+        self.arr_iata = arr.get("iataCode", "")
+        self.arr_time = arr.get("at", "")
+        self.duration = raw.get("duration", "??")
+        self.minutes = duration_minutes(self.duration)
+        self.carrier = raw.get("carrierCode", "")
+        self.number = raw.get("number", "")
+
+    def label(self, idx):
+        return (
+            f"  - Segment {idx}: {self.dep_iata} ({self.dep_time}) → "
+            f"{self.arr_iata} ({self.arr_time}), {self.duration}, "
+            f"Airline {self.carrier}, Flight {self.number}"
+        )
+
+
+class FlightOffer:
+    """
+    One flight offer; 'itineraries' is a tuple (outbound, return) of
+    segment tuples.
+    """
+    __slots__ = ("id", "price", "currency", "itineraries", "itinerary_minutes")
+
+    def __init__(self, raw):
+        price = raw.get("price", {})
+        self.id = str(raw.get("id", "UnknownID"))
+        self.price = _price(price.get("grandTotal"))
+        self.currency = price.get("currency", "USD")
+        self.itineraries = tuple(
+            tuple(Segment(seg) for seg in itin.get("segments", []))
+            for itin in raw.get("itineraries", [])
+        )
+        self.itinerary_minutes = tuple(
+            duration_minutes(itin.get("duration")) for itin in raw.get("itineraries", [])
+        )
+
+    @property
+    def stops(self):
+        """
+        Most stops on any one itinerary.
+        """
+        return max((len(segs) - 1 for segs in self.itineraries), default=0)
+
+    @property
+    def total_minutes(self):
+        if all(m is not None for m in self.itinerary_minutes) and self.itinerary_minutes:
+            return sum(self.itinerary_minutes)
+        return sum(seg.minutes or 0 for segs in self.itineraries for seg in segs)
+
+    @property
+    def carriers(self):
+        return tuple(sorted({seg.carrier for segs in self.itineraries for seg in segs}))
+
+    def signature(self):
+        """
+        Identity of the actual journey and fare; Amadeus numbers offers per
+        response, so the same flight can come back under different IDs.
+        """
+        return (self.price, tuple(
+            (seg.carrier, seg.number, seg.dep_time)
+            for segs in self.itineraries for seg in segs
+        ))
+
+    def label(self):
+        """
+        Multi-line Markdown summary shown in the flight picker.
+        """
+        price = f"{self.price:.2f}" if self.price is not None else "??"
+        lines = [f"**Flight {self.id}** - **${price}**"]
+        for idx_it, segments in enumerate(self.itineraries, start=1):
+            lines.append(f"_Itinerary {idx_it}_:")
+            for idx_seg, seg in enumerate(segments, start=1):
+                lines.append(seg.label(idx_seg))
+        return "\n".join(lines)
+
+    def summary(self):
+        """
+        One-line version of label(), e.g. "Flight 60: DTW→LIS 2026-11-16 12:30
+        (nonstop, DL), LIS→DTW 2026-11-20 10:45 (1 stop, AA) - $337.77".
+        """
+        price = f"{self.price:.2f}" if self.price is not None else "??"
+        legs = []
+        for segments in self.itineraries:
+            if not segments:
+                continue
+            stops = len(segments) - 1
+            legs.append(
+                f"{segments[0].dep_iata}→{segments[-1].arr_iata} "
+                f"{segments[0].dep_time.replace('T', ' ')[:16]} "
+                f"({'nonstop' if not stops else f'{stops} stop' + 's' * (stops > 1)}, "
+                f"{'/'.join(sorted({seg.carrier for seg in segments}))})"
+            )
+        return f"Flight {self.id}: {', '.join(legs)} - ${price}"
+
+
+class HotelOffer:
+    __slots__ = ("id", "hotel_id", "hotel_name", "price", "currency", "distance_km")
+
+    def __init__(self, offer, hotel_id, hotel_name, distance_km=None):
+        price = offer.get("price", {})
+        self.id = str(offer.get("id", "N/A"))
+        self.hotel_id = hotel_id
+        self.hotel_name = hotel_name
+        self.price = _price(price.get("total"))
+        self.currency = price.get("currency", "USD")
+        self.distance_km = float("inf") if distance_km is None else distance_km
+
+    def label(self):
+        price = f"{self.price:.2f}" if self.price is not None else "??"
+        text = f"{self.hotel_name} - Offer ID: {self.id} - Price: ${price}"
+        if self.distance_km != float("inf"):
+            text += f" ({self.distance_km:.1f} km)"
+        return text
+
+
+class Activity:
+    __slots__ = ("id", "name", "price", "currency", "latitude", "longitude")
+
+    def __init__(self, raw):
+        price = raw.get("price") or {}
+        geo = raw.get("geoCode") or {}
+        self.id = str(raw.get("id", ""))
+        self.name = raw.get("name", "Unknown Activity")
+        self.price = _price(price.get("amount"))
+        self.currency = price.get("currencyCode", "USD")
+        self.latitude = _price(geo.get("latitude"))
+        self.longitude = _price(geo.get("longitude"))
+
+    def label(self):
+        price = f"{self.price:.2f}" if self.price is not None else "??"
+        return f"{self.name} (${price})"
+
+
+class Pick(NamedTuple):
+    """
+    A chosen offer as kept in session state and trip snapshots: enough to
+    show and total it without the offer set it came from.
+    """
+    id: str
+    price: float
+    currency: str
+    label: str
+
+    @classmethod
+    def of(cls, offer, label=None):
+        return cls(offer.id, offer.price, offer.currency, label or offer.label())
+
+
+class OfferSet:
+    """
+    Parsed offers addressable by stable ID, with prices held in one array.
+    Iterates in the order the API returned them.
+    """
+    __slots__ = ("ids", "prices", "_by_id")
+
+    def __init__(self, items):
+        self._by_id = {}
+        for item in items:
+            # Duplicate IDs keep their first occurrence
+            self._by_id.setdefault(item.id, item)
+        self.ids = tuple(self._by_id)
+        self.prices = array("d", (
+            self._by_id[i].price if self._by_id[i].price is not None else float("nan")
+            for i in self.ids
+        ))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return (self._by_id[i] for i in self.ids)
+
+    def __getitem__(self, offer_id):
+        return self._by_id[offer_id]
+
+    def get(self, offer_id, default=None):
+        return self._by_id.get(offer_id, default)
+
+
+def parse_flight_offers(data):
+    return OfferSet(FlightOffer(raw) for raw in data or [])
+
+
+def parse_hotel_offers(data, hotels_by_id=None, distance=None):
+    """
+    Flatten Hotel Search results (one item per hotel, each with 'offers')
+    into an OfferSet of HotelOffer. 'distance(hotel_id)' may supply km.
+    """
+    items = []
+    for item in data or []:
+        hotel = item.get("hotel", {})
+        hid = hotel.get("hotelId", "")
+        listed = (hotels_by_id or {}).get(hid, {})
+        name = hotel.get("name") or listed.get("name", "Unknown Hotel")
+        km = distance(hid) if distance else None
+        for offer in item.get("offers", []):
+            items.append(HotelOffer(offer, hid, name, km))
+    return OfferSet(items)
+
+
+def parse_activities(data):
+    return OfferSet(Activity(raw) for raw in data or [])
@@ -0,0 +1,176 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from agents.flight_agent import find_flights, find_nearby_flights
+from agents.activities_agent import find_activities
+from helpers.geocoder import geocode_place
+from helpers.hotel_catalog import get_hotel_catalog
+from helpers.offers import parse_flight_offers, parse_activities
+from helpers.flight_ranking import FlightTable
+from helpers.metrics import bind
+from helpers.scheduler import Job, background, promote
+from helpers.session_store import get_payload_store
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TRAVELBOT_PREFETCH_WORKERS", "8")),
+    thread_name_prefix="prefetch"
+)
+
+
+# Jobs hand back parsed models, so the UI never re-walks raw payloads
+def _flights(origin_code, destination_code, depart_date, return_date, nearby_km):
+    if nearby_km:
+        # Every airport within nearby_km of either end, merged into one table
+        return FlightTable(find_nearby_flights(origin_code, destination_code, depart_date,
+                                               return_date or None, radius_km=nearby_km))
+    return FlightTable(parse_flight_offers(
+        find_flights(origin_code, destination_code, depart_date, return_date or None)
+    ))
+
+
+def _hotels(destination_code):
+    # Loads the city into the local hotel catalog; Step 5 queries it by page
+    return get_hotel_catalog().ensure(destination_code)
+
+
+def _activities(coordinate_search):
+    geo = geocode_place(coordinate_search)
+    if not geo:
+        return {"geo": None, "activities": parse_activities([])}
+    acts = find_activities(geo["latitude"], geo["longitude"], radius_km=5)
+    return {"geo": geo, "activities": parse_activities(acts)}
+
+
+# name -> (required inputs, optional inputs, job, seconds a step will wait
+# for a running job, value on timeout or failure)
+JOBS = {
+    "flights": (("origin_code", "destination_code", "depart_date"), ("return_date", "nearby_km"),
+                _flights, 30, FlightTable(parse_flight_offers([]))),
+    "hotels": (("destination_code",), (), _hotels, 20, 0),
+    "activities": (("coordinate_search",), (), _activities, 25,
+                   {"geo": None, "activities": parse_activities([])}),
+}
+
+
+_MISSING = object()
+
+
+class Slot:
+    """
+    One prefetched lookup: the inputs it was started with, its future, the
+    scheduler job its calls queue as, and when it began running (None
+    while still waiting for a worker).
+    """
+    __slots__ = ("key", "future", "job", "started")
+
+    def __init__(self, name, key):
+        self.key = key
+        self.job = Job()
+        self.started = None
+        self.future = _executor.submit(bind(_in_background), name, key, self)
+
+
+def _inputs_key(name, inputs):
+    required, optional, _, _, _ = JOBS[name]
+    if not all(inputs.get(field) for field in required):
+        return None
+    return tuple(inputs.get(field) or "" for field in required + optional)
+
+
+def start_prefetch(slots: dict, inputs: dict):
+    """
+    Launch every job whose inputs are now known, in the background.
+
+    'slots' is a per-session dict (kept in the session registry). A job
+    whose inputs changed since it was started is cancelled and restarted;
+    jobs with unchanged inputs, or whose result some session already put
+    in the payload store, are left alone.
+    """
+    store = get_payload_store()
+    for name in JOBS:
+        key = _inputs_key(name, inputs)
+        slot = slots.get(name)
+        if slot is not None and slot.key == key:
+            continue
+        if slot is not None:
+            # Not-yet-started work is dropped; running work finishes but is ignored
+            slot.future.cancel()
+            del slots[name]
+        if key is not None and (name,) + key not in store:
+            slots[name] = Slot(name, key)
+
+
+def _build(name, key):
+    """
+    Run job 'name' and put its result in the payload store. The future
+    only signals completion, so sessions don't each hold a copy.
+    """
+    get_payload_store().put((name,) + key, JOBS[name][2](*key))
+
+
+def _in_background(name, key, slot):
+    slot.started = time.monotonic()
+    with background(slot.job):
+        _build(name, key)
+
+
+def cancel_prefetch(slots: dict):
+    for slot in slots.values():
+        slot.future.cancel()
+    slots.clear()
+
+
+def _in_foreground(name, key, on_failure):
+    try:
+        _build(name, key)
+    except Exception as e:
+        print(f"Lookup '{name}' failed for {key}: {e}")
+        return on_failure
+    return get_payload_store().get((name,) + key, on_failure)
+
+
+def prefetched(slots: dict, name, inputs: dict):
+    """
+    Result of job 'name' for these inputs, from the payload store or the
+    background job when it matches. A job still waiting for a worker is
+    taken back and run now; a running one is promoted to interactive
+    priority and waited on for at most the job's budget, counted from when
+    it began running. Otherwise, or if the background job failed, the
+    lookup runs here. Returns the job's empty value if the budget runs
+    out or the lookup fails.
+    """
+    key = _inputs_key(name, inputs)
+    _, _, _, budget, on_timeout = JOBS[name]
+    if key is None:
+        return on_timeout
+
+    store = get_payload_store()
+    payload = store.get((name,) + key, _MISSING)
+    if payload is not _MISSING:
+        slots.pop(name, None)
+        return payload
+
+    slot = slots.pop(name, None)
+    if slot is not None and slot.key != key:
+        slot.future.cancel()
+        slot = None
+    if slot is None or slot.future.cancel():
+        # Nothing started yet: don't queue behind other sessions' prefetches
+        return _in_foreground(name, key, on_timeout)
+
+    promote(slot.job)
+    started = slot.started or time.monotonic()
+    try:
+        slot.future.result(timeout=max(budget - (time.monotonic() - started), 0))
+    except FutureTimeout:
+        print(f"Prefetch '{name}' exceeded its {budget}s budget for {key}")
+        slot.future.cancel()
+        return on_timeout
+    except Exception as e:
+        print(f"Prefetch '{name}' failed for {key}: {e}; looking it up again")
+        return _in_foreground(name, key, on_timeout)
+    payload = store.get((name,) + key, _MISSING)
+    if payload is _MISSING:
+        # Already pushed out of the store by other sessions' payloads
+        return _in_foreground(name, key, on_timeout)
+    return payload
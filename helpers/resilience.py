@@ -0,0 +1,254 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from amadeus import NetworkError, ServerError
+from helpers.metrics import incr, bind, register_collector
+from helpers.scheduler import throttle
+
+# endpoint -> (deadline in seconds, retries after the first attempt, hedge?)
+# Hedging is only for idempotent reference-data lookups; searches are
+# expensive and count against quota, Nominatim allows one request a second.
+POLICIES = {
+    "airport_code": (6, 2, True),
+    "hotel_list": (10, 2, True),
+    "flight_offers": (25, 1, False),
+    "hotel_offers": (20, 1, False),
+    "activities": (12, 2, False),
+    "geocode": (12, 1, False),
+}
+DEFAULT_POLICY = (15, 1, False)
+
+BACKOFF_BASE = 0.2
+BACKOFF_CAP = 4.0
+
+# Circuit breaker: open after this many consecutive transient failures,
+# let one trial call through after the cool-down
+BREAKER_THRESHOLD = int(os.getenv("TRAVELBOT_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("TRAVELBOT_BREAKER_COOLDOWN", "30"))
+
+# Hedge delay is the endpoint's recent p95; this is used until enough samples exist
+HEDGE_DEFAULT_DELAY = 1.0
+HEDGE_MIN_SAMPLES = 20
+
+# Attempts run here so the caller can stop waiting at its deadline even if
+# the socket underneath is still stuck
+_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TRAVELBOT_RESILIENCE_WORKERS", "32")),
+    thread_name_prefix="upstream"
+)
+
+
+class ResilienceError(Exception):
+    pass
+
+
+class DeadlineExceeded(ResilienceError):
+    pass
+
+
+class CircuitOpen(ResilienceError):
+    pass
+
+
+class UpstreamError(Exception):
+    """
+    HTTP error from a service called without an SDK (e.g. Nominatim).
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def is_transient(exc):
+    """
+    Worth retrying: timeouts, dropped connections, 429 and 5xx responses.
+    """
+    if isinstance(exc, (DeadlineExceeded, NetworkError, ServerError)):
+        return True
+    status = getattr(exc, "status", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status:
+        return status == 429 or status >= 500
+    return isinstance(exc, (OSError, TimeoutError))
+
+
+class CircuitBreaker:
+    """
+    closed -> open after 'threshold' consecutive transient failures;
+    open -> half-open after 'cooldown' seconds, where one trial call decides
+    whether to close again or re-open.
+    """
+
+    def __init__(self, name, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+                self._trial = False
+            if self.state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self.state = "closed"
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    incr("breaker_opened", endpoint=self.name)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """
+        A half-open trial ended without a verdict (e.g. a client error).
+        """
+        with self._lock:
+            if self.state == "half_open":
+                self._trial = False
+
+
+class _Endpoint:
+    def __init__(self, name):
+        self.name = name
+        self.breaker = CircuitBreaker(name)
+        self.latencies = deque(maxlen=200)
+        self.lock = threading.Lock()
+
+    def hedge_delay(self):
+        with self.lock:
+            samples = sorted(self.latencies)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return samples[int(0.95 * (len(samples) - 1))]
+
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+def _endpoint(name):
+    with _endpoints_lock:
+        if name not in _endpoints:
+            _endpoints[name] = _Endpoint(name)
+        return _endpoints[name]
+
+
+def _timed(endpoint, fn, args, kwargs):
+    start = time.monotonic()
+    result = fn(*args, **kwargs)
+    with endpoint.lock:
+        endpoint.latencies.append(time.monotonic() - start)
+    return result
+
+
+def _attempt(endpoint, fn, args, kwargs, remaining, hedge):
+    """
+    One logical attempt: the call, plus a duplicate after the endpoint's
+    p95 if hedging, the first is still running and the endpoint's rate
+    allows it. First success wins.
+    """
+    futures = [_pool.submit(bind(_timed), endpoint, fn, args, kwargs)]
+    deadline = time.monotonic() + remaining
+    if hedge:
+        delay = endpoint.hedge_delay()
+        done, _ = wait(futures, timeout=min(delay, remaining))
+        if not done and throttle(endpoint.name, block=False):
+            incr("hedged_requests", endpoint=endpoint.name)
+            futures.append(_pool.submit(bind(_timed), endpoint, fn, args, kwargs))
+
+    pending = set(futures)
+    error = None
+    while pending:
+        done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0),
+                             return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                if future is not futures[0]:
+                    incr("hedge_wins", endpoint=endpoint.name)
+                return future.result()
+            error = future.exception()
+    if error is not None and not pending:
+        raise error
+    raise DeadlineExceeded(f"{endpoint.name}: no response within {remaining:.1f}s")
+
+
+def call(name, fn, *args, **kwargs):
+    """
+    Run fn(*args, **kwargs) against upstream 'name' under its policy in
+    POLICIES: an overall deadline, jittered exponential retries on
+    transient errors only, optional hedging, and a circuit breaker that
+    raises CircuitOpen straight away while the upstream is failing.
+    Non-transient errors (e.g. a 400) are raised on the first attempt.
+    Retries and hedges are held to the endpoint's rate (scheduler.RATES);
+    time spent waiting for it is not charged to the deadline.
+    """
+    deadline_s, retries, hedge = POLICIES.get(name, DEFAULT_POLICY)
+    endpoint = _endpoint(name)
+    if not endpoint.breaker.allow():
+        incr("breaker_rejected", endpoint=name)
+        raise CircuitOpen(f"{name}: circuit open, upstream unhealthy")
+
+    deadline = time.monotonic() + deadline_s
+    for attempt in range(retries + 1):
+        try:
+            result = _attempt(endpoint, fn, args, kwargs, deadline - time.monotonic(), hedge)
+        except Exception as e:
+            if not is_transient(e):
+                endpoint.breaker.release()
+                raise
+            endpoint.breaker.record(ok=False)
+            remaining = deadline - time.monotonic()
+            backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+            if attempt == retries or backoff >= remaining or not endpoint.breaker.allow():
+                incr("upstream_failures", endpoint=name, error=type(e).__name__)
+                raise
+            incr("retries", endpoint=name)
+            time.sleep(backoff)
+            # Only the first attempt was admitted by @scheduled. Waiting for
+            # the endpoint's rate is backpressure, not upstream slowness, so
+            # the deadline is pushed back by however long the turn took
+            queued = time.monotonic()
+            throttle(name)
+            deadline += time.monotonic() - queued
+            continue
+        endpoint.breaker.record(ok=True)
+        return result
+
+
+def breaker_stats():
+    with _endpoints_lock:
+        endpoints = list(_endpoints.values())
+    return {
+        e.name: {
+            "open": int(e.breaker.state == "open"),
+            "consecutive_failures": e.breaker.failures,
+            "hedge_delay_s": e.hedge_delay(),
+        }
+        for e in endpoints
+    }
+
+
+register_collector("upstream", breaker_stats)
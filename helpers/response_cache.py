@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import sqlite3
+import inspect
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from helpers.metrics import incr, bind, register_collector
+from helpers.scheduler import background
+
+CACHE_PATH = os.getenv("TRAVELBOT_CACHE_PATH", os.path.join(".cache", "travelbot.sqlite3"))
+MAX_ENTRIES = int(os.getenv("TRAVELBOT_CACHE_MAX_ENTRIES", "20000"))
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# namespace -> (fresh ttl, extra stale-while-revalidate window), in seconds.
+# Reference data barely moves; offers are only good for a few minutes.
+TTLS = {
+    "airport_code": (7 * DAY, 7 * DAY),
+    "hotel_list": (3 * DAY, 4 * DAY),
+    "activity_tile": (1 * DAY, 2 * DAY),
+    "flight_offers": (10 * MINUTE, 5 * MINUTE),
+    "hotel_offers": (10 * MINUTE, 5 * MINUTE),
+}
+
+
+def normalize_value(value):
+    """
+    Canonical form of one request parameter so that trivially different
+    spellings ("Paris ", "paris") and orderings map onto the same key.
+    """
+    if isinstance(value, str):
+        return " ".join(value.split()).lower()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (list, tuple, set)):
+        items = [normalize_value(v) for v in value]
+        if all(isinstance(v, str) for v in items):
+            items = sorted(items)
+        return items
+    if isinstance(value, dict):
+        return {str(k): normalize_value(v) for k, v in sorted(value.items())}
+    return value
+
+
+def make_key(params: dict):
+    return json.dumps(normalize_value(params), sort_keys=True, separators=(",", ":"))
+
+
+class ResponseCache:
+    """
+    SQLite-backed cache shared by every session in the process and kept
+    across restarts. Entries carry a fresh deadline and a stale deadline;
+    the table is trimmed least-recently-used first once it grows past
+    max_entries.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                fresh_until REAL NOT NULL,
+                stale_until REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)"
+        )
+        self._conn.commit()
+        self._writes = 0
+        self.stats = {}
+
+    def _bump(self, namespace, counter, n=1):
+        ns = self.stats.setdefault(namespace, {
+            "hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "evictions": 0
+        })
+        ns[counter] += n
+
+    def get(self, namespace, key):
+        """
+        Return (value, state) where state is "fresh", "stale" or None (miss).
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, fresh_until, stale_until FROM responses "
+                "WHERE namespace=? AND key=?", (namespace, key)
+            ).fetchone()
+            if row is None or row[2] < now:
+                self._bump(namespace, "misses")
+                incr("cache_lookups", namespace=namespace, result="miss")
+                return None, None
+            self._conn.execute(
+                "UPDATE responses SET last_access=? WHERE namespace=? AND key=?",
+                (now, namespace, key)
+            )
+            self._conn.commit()
+            state = "fresh" if row[1] >= now else "stale"
+            self._bump(namespace, "hits" if state == "fresh" else "stale_hits")
+        incr("cache_lookups", namespace=namespace, result=state)
+        return json.loads(row[0]), state
+
+    def set(self, namespace, key, value, ttl, stale_ttl=0):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), now + ttl, now + ttl + stale_ttl, now)
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        now = time.time()
+        self._conn.execute("DELETE FROM responses WHERE stale_until < ?", (now,))
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE rowid IN ("
+                "SELECT rowid FROM responses ORDER BY last_access LIMIT ?)", (overflow,)
+            )
+            self._bump("_all", "evictions", overflow)
+
+    def clear(self, namespace=None):
+        with self._lock:
+            if namespace:
+                self._conn.execute("DELETE FROM responses WHERE namespace=?", (namespace,))
+            else:
+                self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def cache_stats():
+    """
+    Hit/miss counters per namespace, plus an overall hit rate.
+    """
+    cache = get_cache()
+    with cache._lock:
+        stats = {ns: dict(c) for ns, c in cache.stats.items()}
+    hits = sum(c["hits"] + c["stale_hits"] for c in stats.values())
+    lookups = hits + sum(c["misses"] for c in stats.values())
+    stats["hit_rate"] = hits / lookups if lookups else 0.0
+    return stats
+
+
+register_collector("cache", cache_stats)
+
+
+def _refresh(namespace, key, func, args, kwargs, ttl, stale_ttl):
+    try:
+        with background():
+            value = func(*args, **kwargs)
+        if value:
+            get_cache().set(namespace, key, value, ttl, stale_ttl)
+            with get_cache()._lock:
+                get_cache()._bump(namespace, "refreshes")
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard((namespace, key))
+
+
+def cached(namespace, ttl=None, stale_ttl=None):
+    """
+    Decorator putting the persistent cache in front of an agent function.
+
+    The key is the normalized set of bound arguments. Stale entries are
+    served immediately while a background refresh runs. Empty results are
+    never stored, since the agents also return [] / None on API errors.
+    """
+    default_ttl, default_stale = TTLS.get(namespace, (10 * MINUTE, 0))
+    ttl = default_ttl if ttl is None else ttl
+    stale_ttl = default_stale if stale_ttl is None else stale_ttl
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = make_key(bound.arguments)
+            cache = get_cache()
+
+            value, state = cache.get(namespace, key)
+            if state == "fresh":
+                return value
+            if state == "stale":
+                with _refreshing_lock:
+                    start = (namespace, key) not in _refreshing
+                    _refreshing.add((namespace, key))
+                if start:
+                    _refresher.submit(bind(_refresh), namespace, key, func, args, kwargs, ttl, stale_ttl)
+                return value
+
+            value = func(*args, **kwargs)
+            if value:
+                cache.set(namespace, key, value, ttl, stale_ttl)
+            return value
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
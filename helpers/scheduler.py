@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import heapq
+import itertools
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from helpers.concurrency import TokenBucket, SingleFlight
+from helpers.metrics import observe, register_collector
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# endpoint -> live calls per second admitted for it, across every session.
+# The transport's AMADEUS_RATE still caps the sum of all Amadeus endpoints;
+# Nominatim's usage policy allows one request per second per application.
+RATES = {
+    "airport_code": float(os.getenv("AMADEUS_LOCATIONS_RATE", "10")),
+    "flight_offers": float(os.getenv("AMADEUS_FLIGHT_SEARCH_RATE", "10")),
+    "hotel_list": float(os.getenv("AMADEUS_HOTEL_LIST_RATE", "10")),
+    "hotel_offers": float(os.getenv("AMADEUS_HOTEL_SEARCH_RATE", "10")),
+    "activities": float(os.getenv("AMADEUS_ACTIVITIES_RATE", "10")),
+    "geocode": float(os.getenv("NOMINATIM_RATE", "1")),
+}
+
+_job = contextvars.ContextVar("travelbot_job", default=None)
+_seq = itertools.count()
+
+
+class Job:
+    """
+    The priority of a piece of work. Calls made while it runs queue at its
+    priority, which is the highest of its own and that of every job
+    waiting on its result (callers sharing one coalesced request);
+    promote() raises it, moving calls already queued.
+    """
+
+    def __init__(self, priority=BACKGROUND):
+        self._priority = priority
+        self.waiters = []
+
+    @property
+    def priority(self):
+        return min([self._priority] + [_priority_of(job) for job in self.waiters])
+
+
+def _priority_of(job):
+    # No job: a user is waiting on this call
+    return INTERACTIVE if job is None else job.priority
+
+
+@contextmanager
+def background(job=None):
+    """
+    Calls made inside this block (and in work bound from it with
+    metrics.bind) queue behind interactive calls, as 'job' if given.
+    """
+    token = _job.set(job or Job(BACKGROUND))
+    try:
+        yield
+    finally:
+        _job.reset(token)
+
+
+def promote(job):
+    """
+    Someone is now waiting on 'job': queue its calls, including those
+    already waiting and those of requests it shares, as interactive.
+    """
+    job._priority = INTERACTIVE
+    with _lanes_lock:
+        lanes = list(_lanes.values())
+    for lane in lanes:
+        lane.reprioritize()
+
+
+class _Lane:
+    """
+    Admission for one endpoint: a priority queue in front of its token
+    bucket, plus coalescing of identical calls already queued or running.
+    """
+
+    def __init__(self, name, rate):
+        self.name = name
+        self.bucket = TokenBucket(rate=rate, capacity=max(rate, 1)) if rate else None
+        self.flights = SingleFlight()
+        self.cond = threading.Condition()
+        self.waiting = []      # heap of [priority, seq, key, job]
+        self.jobs = {}         # call key -> Job shared by the callers of that call
+        self.admitted = 0
+
+    def reprioritize(self):
+        """
+        Re-read the priority of every queued call, e.g. after a promotion
+        or an interactive caller joining a queued background call.
+        """
+        with self.cond:
+            changed = False
+            for entry in self.waiting:
+                priority = _priority_of(entry[3])
+                if priority != entry[0]:
+                    entry[0] = priority
+                    changed = True
+            if changed:
+                heapq.heapify(self.waiting)
+                self.cond.notify_all()
+
+    def admit(self, key, job):
+        start = time.monotonic()
+        with self.cond:
+            entry = [_priority_of(job), next(_seq), key, job]
+            heapq.heappush(self.waiting, entry)
+            while True:
+                wait = None
+                if self.waiting[0] is entry:
+                    wait = self.bucket.try_acquire() if self.bucket else 0.0
+                    if wait == 0.0:
+                        heapq.heappop(self.waiting)
+                        self.admitted += 1
+                        self.cond.notify_all()
+                        break
+                self.cond.wait(wait)
+        observe(f"queue:{self.name}", time.monotonic() - start,
+                priority="background" if entry[0] else "interactive")
+
+
+_lanes = {}
+_lanes_lock = threading.Lock()
+
+
+def _lane(endpoint):
+    with _lanes_lock:
+        if endpoint not in _lanes:
+            _lanes[endpoint] = _Lane(endpoint, RATES.get(endpoint))
+        return _lanes[endpoint]
+
+
+def _call_key(args, kwargs):
+    return json.dumps([args, kwargs], sort_keys=True, default=str)
+
+
+def _admitted(lane, key, job, func, args, kwargs):
+    # Retries and hedges made by func queue as the shared job too
+    token = _job.set(job)
+    try:
+        lane.admit(key, job)
+        return func(*args, **kwargs)
+    finally:
+        _job.reset(token)
+
+
+def scheduled(endpoint):
+    """
+    Decorator routing an agent call through the process-wide scheduler:
+    identical calls in flight from any session share one upstream request,
+    interactive calls are admitted before background ones, and each
+    endpoint is held to its rate in RATES. A shared request queues at the
+    highest priority of the callers waiting on it. Place it under @cached
+    so cache hits never queue.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            lane = _lane(endpoint)
+            key = _call_key(args, kwargs)
+            caller = _job.get()
+            with lane.cond:
+                job = lane.jobs.get(key)
+                if job is None:
+                    job = lane.jobs[key] = Job(BACKGROUND)
+                job.waiters.append(caller)
+                joined = len(job.waiters) > 1
+            if joined:
+                # The request may now be waited on at a higher priority
+                lane.reprioritize()
+            try:
+                return lane.flights.do(key, _admitted, lane, key, job, func, args, kwargs)
+            finally:
+                with lane.cond:
+                    job.waiters.remove(caller)
+                    if not job.waiters and lane.jobs.get(key) is job:
+                        del lane.jobs[key]
+        return wrapper
+    return decorator
+
+
+def throttle(endpoint, block=True):
+    """
+    Take one of 'endpoint''s tokens for an upstream request that doesn't
+    come through scheduled() (a retry, a hedged duplicate, a geocoder
+    lookup), queued at the current priority. With block=False, returns
+    False instead of waiting when no token is free or other calls are
+    queued ahead.
+    """
+    if not RATES.get(endpoint):
+        return True
+    lane = _lane(endpoint)
+    if not block:
+        with lane.cond:
+            return not lane.waiting and lane.bucket.try_acquire() == 0.0
+    lane.admit(("throttle", next(_seq)), _job.get())
+    return True
+
+
+def scheduler_stats():
+    with _lanes_lock:
+        lanes = list(_lanes.values())
+    stats = {}
+    for lane in lanes:
+        with lane.cond:
+            depth = len(lane.waiting)
+            background_depth = sum(1 for e in lane.waiting if e[0] != INTERACTIVE)
+        stats[lane.name] = {
+            "queue_depth": depth,
+            "background_queue_depth": background_depth,
+            "in_flight": lane.flights.in_flight(),
+            "coalesced": lane.flights.coalesced,
+            "admitted": lane.admitted,
+        }
+    return stats
+
+
+register_collector("scheduler", scheduler_stats)
@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import zlib
+import base64
+import pickle
+import threading
+from datetime import date
+from collections import OrderedDict
+from helpers.metrics import incr, register_collector
+from helpers.offers import Pick
+
+# st.session_state keeps only compact references (inputs, keys, chosen
+# offers as Pick records). Large rebuildable results (flight tables, hotel
+# offer sets, fare grids) are held once per process in a shared store, and
+# per-session server objects (prefetch futures, the LLM chain) live in a
+# registry that forgets sessions left idle.
+MAX_BYTES = int(float(os.getenv("TRAVELBOT_PAYLOAD_STORE_MB", "256")) * 2 ** 20)
+IDLE_SECONDS = float(os.getenv("TRAVELBOT_SESSION_IDLE_MINUTES", "30")) * 60
+
+# kind (first element of the key) -> seconds a payload may be handed out.
+# Shared payloads outlive the session that built them, so offers expire
+# with their response-cache window; reference data keeps for longer.
+TTLS = {
+    "flights": 15 * 60,
+    "bulk_offers": 15 * 60,
+    "hotel_offers": 15 * 60,
+    "fare_matrix": 15 * 60,
+    "hotels": 24 * 3600,
+    "activities": 24 * 3600,
+}
+DEFAULT_TTL = 15 * 60
+
+
+class PayloadStore:
+    """
+    Size-bounded LRU of payloads keyed by (kind, *inputs), shared by every
+    session. Sizes are the pickled size of a payload, measured once when it
+    is stored; payloads also expire after their kind's TTL. Evicted or
+    expired payloads are rebuilt by whoever asks for them next, mostly from
+    the response cache.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._items = OrderedDict()   # key -> (payload, bytes, expires)
+        self.stats = {"entries": 0, "bytes": 0, "hits": 0, "misses": 0, "puts": 0, "evictions": 0}
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[2] < time.monotonic():
+                self._drop(key)
+                item = None
+            if item is None:
+                self.stats["misses"] += 1
+                return default
+            self._items.move_to_end(key)
+            self.stats["hits"] += 1
+            return item[0]
+
+    def __contains__(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            return item is not None and item[2] >= time.monotonic()
+
+    def _drop(self, key):
+        self.stats["bytes"] -= self._items.pop(key)[1]
+        self.stats["entries"] = len(self._items)
+
+    def put(self, key, payload):
+        size = len(pickle.dumps(payload, pickle.HIGHEST_PROTOCOL))
+        expires = time.monotonic() + TTLS.get(key[0], DEFAULT_TTL)
+        evicted = 0
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+            self._items[key] = (payload, size, expires)
+            self.stats["bytes"] += size
+            self.stats["puts"] += 1
+            # The newest payload always stays, even if it alone is over the bound
+            while self.stats["bytes"] > self.max_bytes and len(self._items) > 1:
+                self._drop(next(iter(self._items)))
+                evicted += 1
+            self.stats["evictions"] += evicted
+            self.stats["entries"] = len(self._items)
+        if evicted:
+            incr("payload_evictions", evicted)
+        return payload
+
+
+class SessionRegistry:
+    """
+    Server-side objects of one browser session, keyed by session ID: things
+    st.session_state should not hold (futures, the LLM chain). Sessions not
+    seen for 'idle_seconds' are dropped on a later sweep; if the user comes
+    back, their objects are rebuilt on demand.
+    """
+
+    def __init__(self, idle_seconds=IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._sessions = {}   # session_id -> [last seen, objects dict]
+        self._next_sweep = 0.0
+        self.stats = {"active": 0, "created": 0, "evicted": 0}
+
+    def get(self, session_id):
+        """
+        The objects dict of 'session_id', marking the session as active.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = self._sessions[session_id] = [now, {}]
+                self.stats["created"] += 1
+            entry[0] = now
+            if now >= self._next_sweep:
+                self._sweep(now)
+            self.stats["active"] = len(self._sessions)
+            return entry[1]
+
+    def _sweep(self, now):
+        idle = [sid for sid, (seen, _) in self._sessions.items() if now - seen > self.idle_seconds]
+        for sid in idle:
+            objects = self._sessions.pop(sid)[1]
+            # Background lookups nobody will read any more
+            for slot in objects.get("prefetch", {}).values():
+                slot.future.cancel()
+        self.stats["evicted"] += len(idle)
+        if idle:
+            incr("sessions_evicted", len(idle))
+        self._next_sweep = now + min(self.idle_seconds, 60)
+
+
+# ------------------------------------------------
+# Trip plan snapshots
+# ------------------------------------------------
+# Everything needed to pick a trip back up at the same step; payloads are
+# left out and rebuilt from these inputs
+STEPS = range(8)
+PLAN_KEYS = (
+    "step", "location_raw", "location_parsed", "city", "coordinate_search", "trip_intent",
+    "origin_raw", "origin_code", "destination_code", "depart_date", "return_date", "nearby_km",
+    "flight_choice", "hotel_choice", "activity_choices", "price_at_steps",
+)
+
+
+def snapshot_plan(state):
+    """
+    The trip plan in 'state' (st.session_state or a dict) as a short
+    URL-safe token.
+    """
+    plan = {key: state[key] for key in PLAN_KEYS if key in state}
+    raw = json.dumps(plan, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(zlib.compress(raw, 9)).decode("ascii").rstrip("=")
+
+
+def _pick(value):
+    if not isinstance(value, (list, tuple)) or len(value) != len(Pick._fields):
+        raise ValueError(f"bad offer record {value!r}")
+    offer_id, price, currency, label = value
+    if not isinstance(price, (int, float, type(None))):
+        raise ValueError(f"bad offer price {price!r}")
+    return Pick(str(offer_id), price, str(currency), str(label))
+
+
+def _is_str(value):
+    return isinstance(value, str)
+
+
+def _is_number(value, nullable=True):
+    return (value is None and nullable) or (isinstance(value, (int, float)) and not isinstance(value, bool))
+
+
+def _iso_date(value):
+    if value:
+        date.fromisoformat(value)
+    return value
+
+
+def _fields(value, name, kinds):
+    """
+    'value' checked against kinds ({field: check}); every field must be
+    present and pass its check.
+    """
+    if not isinstance(value, dict):
+        raise ValueError(f"bad {name}")
+    for field, check in kinds.items():
+        if field not in value or not check(value[field]):
+            raise ValueError(f"bad {name}.{field}")
+    return value
+
+
+# Shape of the parsed location and of a finished trip intent
+# (llm_helpers._finish_trip_intent), as the app reads them
+LOCATION_FIELDS = {"city": _is_str, "state": _is_str, "country": _is_str}
+INTENT_FIELDS = {
+    "city": _is_str, "state": _is_str, "country": _is_str, "clarifications": _is_str,
+    "currency": _is_str, "start_date": _is_str, "end_date": _is_str,
+    "airport_codes": lambda v: isinstance(v, list) and all(isinstance(c, str) for c in v),
+    "adults": lambda v: _is_number(v, nullable=False) and v >= 1 and v == int(v),
+    "nights": _is_number,
+    "budget": _is_number,
+}
+
+
+def resume_plan(token):
+    """
+    The plan keys stored in a snapshot_plan() token, or None if it can't be
+    read. Tokens come from URLs, so every value is checked before use.
+    """
+    try:
+        raw = zlib.decompress(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        plan = json.loads(raw)
+        if not isinstance(plan, dict):
+            raise ValueError("not an object")
+        plan = {key: value for key, value in plan.items() if key in PLAN_KEYS}
+        step = plan.get("step", 0)
+        if isinstance(step, bool) or not isinstance(step, int) or step not in STEPS:
+            raise ValueError(f"bad step {step!r}")
+        for key in ("location_raw", "city", "coordinate_search", "origin_raw",
+                    "origin_code", "destination_code", "depart_date", "return_date"):
+            if key in plan and not isinstance(plan[key], str):
+                raise ValueError(f"bad {key}")
+        # Every step past 0 shows the parsed location
+        if step and not all(key in plan for key in ("location_raw", "location_parsed", "city")):
+            raise ValueError(f"step {step} without a location")
+        if step or plan.get("location_parsed") is not None:
+            _fields(plan["location_parsed"], "location_parsed", LOCATION_FIELDS)
+        if plan.get("trip_intent") is not None:
+            intent = _fields(plan["trip_intent"], "trip_intent", INTENT_FIELDS)
+            intent["adults"] = int(intent["adults"])
+            _iso_date(intent["start_date"])
+            _iso_date(intent["end_date"])
+        _iso_date(plan.get("depart_date"))
+        _iso_date(plan.get("return_date"))
+        if isinstance(plan.get("nearby_km", 0), bool) or not isinstance(plan.get("nearby_km", 0), int):
+            raise ValueError("bad nearby_km")
+        for key in ("flight_choice", "hotel_choice"):
+            if plan.get(key):
+                plan[key] = _pick(plan[key])
+        choices = plan.get("activity_choices") or []
+        if not isinstance(choices, list):
+            raise ValueError("bad activity_choices")
+        plan["activity_choices"] = [_pick(a) for a in choices]
+        if "price_at_steps" in plan:
+            prices = plan["price_at_steps"]
+            if not isinstance(prices, dict):
+                raise ValueError("bad price_at_steps")
+            plan["price_at_steps"] = {int(s): float(p) for s, p in prices.items()}
+            if set(plan["price_at_steps"]) != set(STEPS):
+                raise ValueError("bad price_at_steps")
+    except (ValueError, TypeError, KeyError, OverflowError, zlib.error) as e:
+        print(f"Ignoring unreadable trip snapshot: {e}")
+        return None
+    return plan
+
+
+_payload_store = None
+_payload_store_lock = threading.Lock()
+_session_registry = None
+_session_registry_lock = threading.Lock()
+
+
+def get_payload_store():
+    global _payload_store
+    if _payload_store is None:
+        with _payload_store_lock:
+            if _payload_store is None:
+                _payload_store = PayloadStore()
+    return _payload_store
+
+
+def get_session_registry():
+    global _session_registry
+    if _session_registry is None:
+        with _session_registry_lock:
+            if _session_registry is None:
+                _session_registry = SessionRegistry()
+    return _session_registry
+
+
+def session_store_stats():
+    return {
+        "payloads": dict(get_payload_store().stats),
+        "sessions": dict(get_session_registry().stats),
+    }
+
+
+register_collector("session_store", session_store_stats)
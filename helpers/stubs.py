@@ -0,0 +1,247 @@
+import re
+import json
+import random
+import hashlib
+from datetime import date, timedelta
+from urllib.parse import urlsplit, parse_qsl
+
+# Synthetic answers for the "stub" backend mode: every OpenAI, Amadeus and
+# Nominatim request gets a plausible, deterministic response built from the
+# request itself, so the whole flow runs offline without recorded fixtures.
+
+JSON = [("Content-Type", "application/json")]
+AMADEUS_JSON = [("Content-Type", "application/vnd.amadeus+json")]
+CARRIERS = ("AA", "DL", "UA", "AF", "BA", "LH", "KL", "IB")
+CHAINS = ("HI", "MC", "HY", "AC", "BW", "RT", "")
+
+
+def _rng(*parts):
+    digest = hashlib.sha1(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+    return random.Random(int(digest[:12], 16))
+
+
+def _place(query):
+    """
+    A stable point for 'query' between 60S and 60N.
+    """
+    rng = _rng("place", (query or "").lower())
+    return round(rng.uniform(-60, 60), 5), round(rng.uniform(-180, 180), 5)
+
+
+def _code(text):
+    letters = re.sub(r"[^A-Za-z]", "", text or "").upper()
+    return (letters + "XXX")[:3]
+
+
+def _ok(payload, headers=JSON):
+    return 200, "OK", headers, json.dumps(payload).encode("utf-8")
+
+
+# ------------------------------------------------
+# OpenAI
+# ------------------------------------------------
+def _extraction(schema_name, properties, prompt):
+    quoted = re.findall(r'"([^"]*)"', prompt)
+    text = quoted[0] if quoted else ""
+    if schema_name == "location":
+        parts = [p.strip() for p in text.split(",") if p.strip()] or [""]
+        return {"city": parts[0].title(), "state": parts[1].title() if len(parts) > 2 else "",
+                "country": parts[-1].title() if len(parts) > 1 else "", "clarifications": ""}
+    if schema_name == "trip_intent":
+        city = re.search(r"\b(?:in|to|visit)\s+([A-Z][\w'-]*(?:\s+[A-Z][\w'-]*)*)", text)
+        city = city.group(1) if city else text.split(",")[0].strip().title()
+        adults = re.search(r"(\d+)\s*(?:adults|people|travell?ers|of us)", text)
+        budget = re.search(r"\$\s*(\d+(?:\.\d+)?)\s*(k)?", text, re.I)
+        nights = re.search(r"(\d+)\s*nights", text)
+        start = date.today() + timedelta(days=30)
+        return {
+            "city": city, "state": "", "country": "", "airport_codes": _code(city),
+            "start_date": start.isoformat(),
+            "end_date": "" if nights else (start + timedelta(days=4)).isoformat(),
+            "nights": nights.group(1) if nights else "",
+            "adults": adults.group(1) if adults else "",
+            "budget": str(float(budget.group(1)) * (1000 if budget.group(2) else 1)) if budget else "",
+            "currency": "USD" if budget else "", "clarifications": "",
+        }
+    if schema_name == "travel_dates":
+        start = date.today() + timedelta(days=30)
+        return {"start_date": start.isoformat(), "end_date": (start + timedelta(days=4)).isoformat(),
+                "clarifications": ""}
+    return {name: "" for name in properties}
+
+
+def _sse(request, content, size=8):
+    """
+    'content' as a chat.completion.chunk event stream, 'size' characters a chunk.
+    """
+    events = []
+    for start in range(0, len(content), size):
+        events.append({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0,
+                       "model": request.get("model", "gpt-4o"),
+                       "choices": [{"index": 0, "finish_reason": None,
+                                    "delta": {"content": content[start:start + size]}}]})
+    events.append({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0,
+                   "model": request.get("model", "gpt-4o"),
+                   "choices": [{"index": 0, "finish_reason": "stop", "delta": {}}]})
+    lines = [f"data: {json.dumps(event)}\n\n" for event in events] + ["data: [DONE]\n\n"]
+    return "".join(lines).encode("utf-8")
+
+
+def _openai(body):
+    request = json.loads(body or b"{}")
+    prompt = " ".join(str(m.get("content", "")) for m in request.get("messages", []))
+    schema = ((request.get("response_format") or {}).get("json_schema") or {})
+    if schema:
+        content = json.dumps(_extraction(schema.get("name"),
+                                         schema.get("schema", {}).get("properties", {}), prompt))
+    else:
+        content = "Happy to help plan your trip."
+    prompt_tokens = max(1, len(prompt) // 4)
+    completion_tokens = max(1, len(content) // 4)
+    if request.get("stream"):
+        return 200, "OK", [("Content-Type", "text/event-stream")], _sse(request, content)
+    return _ok({
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": 0,
+        "model": request.get("model", "gpt-4o"),
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    })
+
+
+# ------------------------------------------------
+# Amadeus
+# ------------------------------------------------
+def _locations(q):
+    keyword = q.get("keyword", "")
+    return [{"type": "location", "subType": "CITY", "name": keyword.split(",")[0].upper(),
+             "iataCode": _code(keyword)}]
+
+
+def _segments(rng, origin, destination, day):
+    stops = rng.choice((0, 0, 1, 1, 2))
+    airports = [origin] + rng.sample(("ORD", "ATL", "JFK", "CDG", "FRA", "AMS", "LHR", "MAD"), stops) \
+        + [destination]
+    hour, total = rng.randint(5, 21), 0
+    segments = []
+    for dep, arr in zip(airports, airports[1:]):
+        minutes = rng.randint(60, 600)
+        segments.append({
+            "departure": {"iataCode": dep, "at": f"{day}T{hour % 24:02d}:{rng.choice((0, 15, 30, 45)):02d}:00"},
+            "arrival": {"iataCode": arr, "at": f"{day}T{(hour + minutes // 60) % 24:02d}:00:00"},
+            "carrierCode": rng.choice(CARRIERS),
+            "number": str(rng.randint(10, 9999)),
+            "duration": f"PT{minutes // 60}H{minutes % 60}M",
+        })
+        hour += minutes // 60 + 1
+        total += minutes + 60
+    total -= 60
+    return {"duration": f"PT{total // 60}H{total % 60}M", "segments": segments}
+
+
+def _flight_offers(q):
+    rng = _rng("flights", sorted(q.items()))
+    origin, destination = q.get("originLocationCode", "XXX"), q.get("destinationLocationCode", "XXX")
+    count = min(int(q.get("max", 50)), rng.randint(20, 120))
+    offers = []
+    for i in range(1, count + 1):
+        itineraries = [_segments(rng, origin, destination, q.get("departureDate", ""))]
+        if q.get("returnDate"):
+            itineraries.append(_segments(rng, destination, origin, q["returnDate"]))
+        price = round(rng.uniform(120, 1400) * len(itineraries) ** 0.5, 2)
+        offers.append({"type": "flight-offer", "id": str(i), "itineraries": itineraries,
+                       "price": {"currency": "USD", "total": f"{price:.2f}", "grandTotal": f"{price:.2f}"}})
+    return offers
+
+
+def _hotel_list(q):
+    city = q.get("cityCode", "XXX")
+    rng = _rng("hotels", city)
+    lat, lon = _place(city)
+    hotels = []
+    for i in range(rng.randint(80, 400)):
+        km = round(rng.uniform(0.1, float(q.get("radius", 10))), 2)
+        hotels.append({
+            "hotelId": f"{CHAINS[i % len(CHAINS)] or 'IN'}{city}{i:03d}",
+            "name": f"{rng.choice(('Grand', 'Central', 'Park', 'Harbor', 'Old Town', 'Royal'))} "
+                    f"{rng.choice(('Hotel', 'Inn', 'Suites', 'Residence'))} {i}",
+            "chainCode": CHAINS[i % len(CHAINS)],
+            "rating": str(rng.randint(1, 5)),
+            "geoCode": {"latitude": lat + rng.uniform(-0.08, 0.08), "longitude": lon + rng.uniform(-0.08, 0.08)},
+            "distance": {"value": km, "unit": "KM"},
+        })
+    return hotels
+
+
+def _hotel_offers(q):
+    data = []
+    for hotel_id in filter(None, q.get("hotelIds", "").split(",")):
+        rng = _rng("hotel_offers", hotel_id, q.get("checkInDate"), q.get("checkOutDate"))
+        if rng.random() < 0.3:
+            continue
+        data.append({
+            "type": "hotel-offers",
+            "hotel": {"hotelId": hotel_id, "name": f"Hotel {hotel_id}"},
+            "offers": [{"id": f"{hotel_id}{n}", "price": {"currency": "USD",
+                                                         "total": f"{rng.uniform(90, 900):.2f}"}}
+                       for n in range(rng.randint(1, 3))],
+        })
+    return data
+
+
+def _activities(q):
+    south, west = float(q.get("south", 0)), float(q.get("west", 0))
+    north, east = float(q.get("north", 0)), float(q.get("east", 0))
+    rng = _rng("activities", round(south, 4), round(west, 4))
+    return [{
+        "type": "activity",
+        "id": f"{rng.randint(100000, 999999)}",
+        "name": f"{rng.choice(('Walking tour', 'Museum pass', 'Food tasting', 'Boat trip', 'Bike tour'))}"
+                f" {n}",
+        "geoCode": {"latitude": rng.uniform(south, north), "longitude": rng.uniform(west, east)},
+        "price": {"amount": f"{rng.uniform(10, 150):.2f}", "currencyCode": rng.choice(("EUR", "USD"))},
+    } for n in range(rng.randint(0, 6))]
+
+
+AMADEUS_ROUTES = [
+    ("/v1/reference-data/locations/hotels/by-city", _hotel_list),
+    ("/v1/reference-data/locations", _locations),
+    ("/v2/shopping/flight-offers", _flight_offers),
+    ("/v3/shopping/hotel-offers", _hotel_offers),
+    ("/v1/shopping/activities/by-square", _activities),
+]
+
+
+def _amadeus(url):
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    for path, handler in AMADEUS_ROUTES:
+        if parts.path == path:
+            return _ok({"data": handler(query), "meta": {}}, AMADEUS_JSON)
+    body = {"errors": [{"status": 404, "title": f"No stub for {parts.path}"}]}
+    return 404, "Not Found", AMADEUS_JSON, json.dumps(body).encode("utf-8")
+
+
+# ------------------------------------------------
+# Nominatim
+# ------------------------------------------------
+def _nominatim(url):
+    q = dict(parse_qsl(urlsplit(url).query)).get("q", "")
+    lat, lon = _place(q)
+    return _ok([{"lat": str(lat), "lon": str(lon), "display_name": q}])
+
+
+def respond(service, method, url, body):
+    """
+    Synthetic (status, reason, headers, body) for one request to 'service'.
+    """
+    if service == "openai":
+        return _openai(body)
+    if service == "amadeus":
+        return _amadeus(url)
+    if service == "nominatim":
+        return _nominatim(url)
+    return 404, "Not Found", JSON, b'{"errors": [{"status": 404, "title": "Unknown service"}]}'
@@ -0,0 +1,191 @@
+import os
+import heapq
+import math
+import numpy as np
+from helpers.metrics import traced
+
+# Rough USD value of one unit of each currency, used only to compare offers
+# quoted in different currencies; override with e.g. "EUR=1.09,GBP=1.28"
+FX_TO_USD = {
+    "USD": 1.0, "EUR": 1.08, "GBP": 1.27, "CAD": 0.73, "AUD": 0.66, "JPY": 0.0067,
+    "CHF": 1.12, "MXN": 0.055, "CNY": 0.14, "INR": 0.012, "SEK": 0.095, "NOK": 0.093,
+    "DKK": 0.145, "NZD": 0.61, "SGD": 0.74, "HKD": 0.128, "BRL": 0.18, "ZAR": 0.054,
+    "TRY": 0.03, "THB": 0.028, "AED": 0.27, "PLN": 0.25, "CZK": 0.043, "HUF": 0.0027,
+}
+for _pair in filter(None, os.getenv("TRAVELBOT_FX_RATES", "").split(",")):
+    _code, _, _rate = _pair.partition("=")
+    FX_TO_USD[_code.strip().upper()] = float(_rate)
+
+WEIGHTS = {
+    "price": 1.0,       # per budget spent
+    "duration": 0.5,    # per median flight duration
+    "stops": 0.25,      # per stop
+    "distance": 0.2,    # per median hotel distance from the centre
+    "activity": 0.3,    # per activity included
+}
+
+
+def to_usd(amount, currency="USD"):
+    """
+    'amount' in 'currency' converted with FX_TO_USD; None if either is unknown.
+    """
+    rate = FX_TO_USD.get((currency or "USD").upper())
+    if amount is None or rate is None or math.isnan(amount):
+        return None
+    return amount * rate
+
+
+def _priced(items, scale):
+    """
+    The items with a known price, and their costs in USD times 'scale'.
+    """
+    kept, costs = [], []
+    for item in items:
+        usd = to_usd(item.price, item.currency)
+        if usd is not None:
+            kept.append(item)
+            costs.append(usd * scale)
+    return kept, np.array(costs, dtype=float)
+
+
+def _relative(values):
+    """
+    'values' divided by their median; missing (inf/NaN) values count as twice the median.
+    """
+    values = np.asarray(values, dtype=float)
+    finite = values[np.isfinite(values)]
+    median = float(np.median(finite)) if finite.size and np.median(finite) > 0 else 1.0
+    return np.where(np.isfinite(values), values / median, 2.0)
+
+
+def _prune(costs, scores, k):
+    """
+    Indices of the items that can appear in a top-k combination: an item
+    beaten on both cost and score by k others never can, since swapping it
+    for any of them gives k combinations at least as good.
+    """
+    order = np.lexsort((-scores, costs))
+    best = []  # min-heap of the k best scores among cheaper items
+    keep = []
+    for i in order:
+        if len(best) < k or scores[i] > best[0]:
+            keep.append(i)
+        if len(best) < k:
+            heapq.heappush(best, scores[i])
+        elif scores[i] > best[0]:
+            heapq.heapreplace(best, scores[i])
+    return np.array(sorted(keep), dtype=int)
+
+
+def _knapsack(costs, values, capacity):
+    """
+    0/1 knapsack over whole units: best[c] is the best total value of a
+    subset costing at most c units, and take[i, c] records whether item i
+    is in that subset (used by _subset). Items of non-positive value are
+    never worth taking and are skipped.
+    """
+    best = np.zeros(capacity + 1)
+    take = np.zeros((len(costs), capacity + 1), dtype=bool)
+    for i, (cost, value) in enumerate(zip(costs, values)):
+        if value <= 0 or cost > capacity:
+            continue
+        candidate = best[:capacity + 1 - cost] + value
+        better = candidate > best[cost:]
+        take[i, cost:] = better
+        best[cost:] = np.where(better, candidate, best[cost:])
+    return best, take
+
+
+def _subset(take, costs, capacity):
+    chosen = []
+    for i in range(len(costs) - 1, -1, -1):
+        if take[i, capacity]:
+            chosen.append(i)
+            capacity -= costs[i]
+    return chosen[::-1]
+
+
+@traced("optimize_trip")
+def optimize_trip(flights, hotel_offers, activities, budget, k=5, travellers=1,
+                  rooms=None, weights=None, resolution=None):
+    """
+    The k best trips (one flight, one hotel offer and any set of
+    activities) whose total cost fits 'budget' (USD, whole party).
+
+    Prices are converted to USD and scaled to the party: flight offers are
+    searched per adult, hotel offers per room (one room per two travellers
+    unless 'rooms' is given), activities per person. A trip's score is
+
+        - price * cost / budget - duration * flight time - stops * stops
+        - distance * hotel distance + activity * number of activities
+
+    with flight time and hotel distance relative to their medians and
+    'weights' overriding WEIGHTS. Each flight and hotel pair gets the best
+    activity set for the budget it leaves, found with a knapsack over
+    'resolution' dollars (default budget / 2000; costs are rounded up, so
+    no returned trip is over budget). Flights and hotels that cannot be in
+    the top k are pruned before the pairs are scored.
+
+    Returns a list of {"score", "total", "per_traveller", "flight",
+    "hotel", "activities"}, best first; "hotel" is None when no hotel
+    offers are given.
+    """
+    if budget <= 0:
+        return []
+    w = {**WEIGHTS, **(weights or {})}
+    rooms = rooms or math.ceil(travellers / 2)
+    resolution = resolution or max(budget / 2000, 1.0)
+    capacity = int(budget // resolution)
+
+    flights, flight_cost = _priced(flights, travellers)
+    if not flights:
+        return []
+    flight_score = -(
+        w["duration"] * _relative([f.total_minutes or np.inf for f in flights])
+        + w["stops"] * np.array([f.stops for f in flights], dtype=float)
+    ) - w["price"] * flight_cost / budget
+
+    hotels, hotel_cost = _priced(hotel_offers or [], rooms)
+    if hotels:
+        hotel_score = -w["distance"] * _relative([h.distance_km for h in hotels]) \
+            - w["price"] * hotel_cost / budget
+    else:
+        hotels, hotel_cost, hotel_score = [None], np.zeros(1), np.zeros(1)
+
+    acts, act_cost = _priced(activities or [], travellers)
+    act_units = np.ceil(act_cost / resolution).astype(int)
+    act_value = w["activity"] - w["price"] * act_cost / budget
+    best_acts, take = _knapsack(act_units, act_value, capacity)
+
+    f_keep = _prune(flight_cost, flight_score, k)
+    h_keep = _prune(hotel_cost, hotel_score, k)
+
+    # Every remaining flight x hotel pair at once
+    base_cost = flight_cost[f_keep][:, None] + hotel_cost[h_keep][None, :]
+    left = np.floor((budget - base_cost) / resolution).astype(int)
+    feasible = base_cost <= budget
+    score = flight_score[f_keep][:, None] + hotel_score[h_keep][None, :] \
+        + best_acts[np.clip(left, 0, capacity)]
+    score = np.where(feasible, score, -np.inf).ravel()
+
+    top = min(k, int(feasible.sum()))
+    if top == 0:
+        return []
+    cells = np.argpartition(-score, top - 1)[:top]
+    cells = cells[np.argsort(-score[cells], kind="stable")]
+
+    trips = []
+    for cell in cells:
+        fi, hi = divmod(int(cell), len(h_keep))
+        f, h = f_keep[fi], h_keep[hi]
+        chosen = _subset(take, act_units, int(np.clip(left[fi, hi], 0, capacity)))
+        total = float(base_cost[fi, hi] + act_cost[chosen].sum())
+        trips.append({
+            "score": round(float(score[cell]), 4),
+            "total": round(total, 2),
+            "per_traveller": round(total / travellers, 2),
+            "flight": flights[f],
+            "hotel": hotels[h],
+            "activities": [acts[i] for i in chosen],
+        })
+    return trips
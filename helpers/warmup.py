@@ -0,0 +1,65 @@
+import time
+import threading
+
+# Importing this module is cheap on purpose: everything heavy is imported
+# inside warm_up(), so the app can start it without paying for it up front.
+
+
+def warm_up():
+    """
+    Import the heavy dependencies and build the process-wide resources
+    (LLM client, Amadeus client and connection pool, Nominatim session,
+    airport index, caches) before the first session needs them. No
+    external requests are made. Returns seconds spent per stage.
+    """
+    timings = {}
+
+    def stage(name, fn):
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            print(f"Warmup stage '{name}' failed: {e}")
+        timings[name] = round(time.perf_counter() - start, 3)
+
+    def imports():
+        import helpers.llm_helpers  # langchain, openai
+        import helpers.prefetch  # amadeus, requests, all agents
+        import helpers.flight_ranking  # numpy
+
+    def llm():
+        from helpers.llm_helpers import get_chat_model
+        get_chat_model()
+
+    def amadeus():
+        from helpers.amadeus_pool import get_amadeus
+        get_amadeus()
+
+    def nominatim():
+        from helpers.geocoder import get_session
+        get_session()
+
+    def airport_index():
+        from helpers.airport_index import get_airport_index
+        get_airport_index().search("paris")
+
+    def caches():
+        from helpers.response_cache import get_cache
+        from helpers.hotel_catalog import get_hotel_catalog
+        get_cache()
+        get_hotel_catalog()
+
+    for name, fn in (("imports", imports), ("llm", llm), ("amadeus", amadeus),
+                     ("nominatim", nominatim), ("airport_index", airport_index),
+                     ("caches", caches)):
+        stage(name, fn)
+    return timings
+
+
+def warm_up_in_background():
+    """
+    Run warm_up() on a daemon thread; returns the thread.
+    """
+    thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+    thread.start()
+    return thread
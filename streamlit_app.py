@@ -1,39 +1,91 @@
 import streamlit as st
 import os
+import uuid
+from datetime import date
 from dotenv import load_dotenv
-from agents.flight_agent import guess_airport_code, find_flights
-from agents.activities_agent import find_activities
-from agents.hotel_agent import get_hotel_offers, get_hotels_in_city
+from helpers import metrics
+from helpers.offers import Pick
+from helpers.session_store import get_payload_store, get_session_registry, snapshot_plan, resume_plan
 
-from helpers.llm_helpers import (
-    get_conversation_chain,
-    parse_location,
-    parse_dates,
-    geocode_place
-)
+# LangChain, OpenAI, Amadeus, requests and numpy are imported inside the
+# steps that use them, so the first page renders without loading them
 
 # Load environment variables (OpenAI keys, etc.)
 load_dotenv()
 
+# Once per server process: build the shared LLM/HTTP clients, indexes and
+# caches in the background while the first page is already being served
+@st.cache_resource
+def start_warmup():
+    from helpers.warmup import warm_up_in_background
+    return warm_up_in_background()
+
+if os.getenv("TRAVELBOT_WARMUP", "1") == "1":
+    start_warmup()
+
 st.title("TravelBot")
 
 # ------------------------------------------------
 # Session State Initialization
 # ------------------------------------------------
+# A trip link (?trip=...) picks a saved plan back up in a fresh session
+if "step" not in st.session_state and st.query_params.get("trip"):
+    plan = resume_plan(st.query_params["trip"])
+    if plan:
+        st.session_state.update(plan, resumed=True)
+
 if "step" not in st.session_state:
     st.session_state.step = 0
 
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex[:12]
+
+# Tag every span/counter recorded during this run with the step it ran in
+metrics.set_context(step=st.session_state.step, session=st.session_state.session_id)
+
 #initialize dictinary for the price at each step
 if "price_at_steps" not in st.session_state:
     st.session_state.price_at_steps = {step: 0 for step in range(8)}
 
-# Create a single LLM conversation chain
-if "conversation_chain" not in st.session_state:
-    st.session_state.conversation_chain = get_conversation_chain()
+# Session state holds only inputs, keys and chosen offers. Objects that
+# can't or shouldn't live there (prefetch futures, the LLM chain) are kept
+# server-side per session and dropped once the session goes idle; large
+# results (flight tables, hotel offers, fare grids) sit once in a shared,
+# size-bounded store under the inputs that produced them
+session_objects = get_session_registry().get(st.session_state.session_id)
+payloads = get_payload_store()
+
+# A single LLM conversation chain per session, created on first use
+def conversation_chain():
+    if "conversation_chain" not in session_objects:
+        from helpers.llm_helpers import get_conversation_chain
+        session_objects["conversation_chain"] = get_conversation_chain()
+    return session_objects["conversation_chain"]
+
+if "conversation_chain" in session_objects:
+    from helpers.llm_helpers import memory_usage
+    memory = memory_usage(session_objects["conversation_chain"])
+    st.sidebar.caption(
+        f"LLM memory: {memory['messages']} messages, "
+        f"{memory['tokens']}/{memory['token_limit']} tokens"
+    )
+
+# Debug panel: TRAVELBOT_DEBUG=1 or ?debug=1
+if os.getenv("TRAVELBOT_DEBUG") == "1" or st.query_params.get("debug") == "1":
+    with st.sidebar.expander("Performance"):
+        st.dataframe(metrics.span_summary(), hide_index=True)
+        st.dataframe(metrics.counters(), hide_index=True)
+        st.download_button("Prometheus metrics", metrics.export_prometheus(),
+                           file_name="travelbot.prom")
+        st.download_button("Traces (JSON)", metrics.export_traces(),
+                           file_name="travelbot_traces.json")
 
 # Data containers
+# Origin used until the user picks another one (any city or IATA code)
+DEFAULT_ORIGIN = os.getenv("TRAVELBOT_DEFAULT_ORIGIN", "DTW")
+
 if "origin_raw" not in st.session_state:
-    st.session_state.origin_raw = ""          # we won't ask for this, but let's keep it
+    st.session_state.origin_raw = ""
 if "destination_raw" not in st.session_state:
     st.session_state.destination_raw = ""
 if "origin_code" not in st.session_state:
@@ -57,9 +109,133 @@ if "depart_date" not in st.session_state:
 if "return_date" not in st.session_state:
     st.session_state.return_date = ""
 
+# 0: search only origin_code -> destination_code; otherwise also every
+# airport within this many km of either end
+if "nearby_km" not in st.session_state:
+    st.session_state.nearby_km = 0
+
+# Background lookups started as soon as their inputs are known
+if "prefetch" not in session_objects:
+    session_objects["prefetch"] = {}
+
+def prefetch_inputs():
+    return {
+        "origin_code": st.session_state.origin_code,
+        "destination_code": st.session_state.destination_code,
+        "depart_date": st.session_state.depart_date,
+        "return_date": st.session_state.return_date,
+        "nearby_km": st.session_state.nearby_km,
+        "coordinate_search": st.session_state.get("coordinate_search", ""),
+    }
+
+# Start (or restart, if inputs changed) whatever can be fetched ahead of time
+def kick_prefetch():
+    from helpers.prefetch import start_prefetch
+    start_prefetch(session_objects["prefetch"], prefetch_inputs())
+
+def prefetched_result(name):
+    from helpers.prefetch import prefetched
+    return prefetched(session_objects["prefetch"], name, prefetch_inputs())
+
+if st.session_state.pop("resumed", False):
+    kick_prefetch()
+
+# The page URL carries the current plan, so reloading or sharing it resumes
+# the trip even after this session is gone
+def save_plan():
+    st.query_params["trip"] = snapshot_plan(st.session_state)
+
+# ------------------------------------------------
+# Step transitions
+# ------------------------------------------------
+# External lookups run when the flow moves into a step, not on every rerun.
+# Each result is stored with the inputs that produced it and only recomputed
+# when those inputs change, so widget interactions make no external calls.
+if "loaded" not in st.session_state:
+    st.session_state.loaded = {}
+
+def load(name, fn, *inputs):
+    stored = st.session_state.loaded.get(name)
+    if stored is None or stored[0] != inputs:
+        stored = st.session_state.loaded[name] = (inputs, fn(*inputs))
+    return stored[1]
+
+def _parse_location(location_raw):
+    from helpers.llm_helpers import parse_location
+    return parse_location(conversation_chain(), location_raw)
+
+def _guess_airport(city):
+    from agents.flight_agent import guess_airport_code
+    return guess_airport_code(city)
+
+def enter_location():
+    loc_parsed = load("location", _parse_location, st.session_state.location_raw)
+    st.session_state.location_parsed = loc_parsed
+    city = loc_parsed.get("city", "") or ""
+    state = loc_parsed.get("state", "") or ""
+    country = loc_parsed.get("country", "") or ""
+    st.session_state.coordinate_search = f'{city } {state}, {country}'
+    st.session_state.city = city
+    st.session_state.origin_code = load("origin_guess", _guess_airport,
+                                        st.session_state.origin_raw or DEFAULT_ORIGIN) or ""
+
+def enter_airports():
+    load("destination_guess", _guess_airport, st.session_state.city)
+
+ON_ENTER = {1: enter_location, 2: enter_airports}
+
+# A full trip request ("4 nights in Lisbon mid-May, 2 adults, under $2k") is
+# read with one streamed LLM call; each field appears as soon as it is decoded
+INTENT_LABELS = {
+    "city": "City", "country": "Country", "airport_codes": "Airports",
+    "start_date": "Departure", "end_date": "Return", "adults": "Travellers", "budget": "Budget",
+}
+
+def read_trip_intent(request):
+    from helpers.llm_helpers import stream_trip_intent
+    slots = {name: st.empty() for name in INTENT_LABELS}
+    intent = {}
+    try:
+        for intent in stream_trip_intent(conversation_chain().llm, request):
+            for name, slot in slots.items():
+                value = intent.get(name)
+                if value not in (None, "", []):
+                    shown = ", ".join(value) if isinstance(value, list) else value
+                    slot.write(f"**{INTENT_LABELS[name]}**: {shown}")
+    except ValueError as e:
+        st.warning(f"Could not read your request: {e}")
+        return None
+    if not intent.get("city"):
+        return None
+
+    # Seed the step results with what the request already answered, so
+    # Steps 1-3 only confirm and the searches can start right away
+    codes = intent["airport_codes"]
+    st.session_state.trip_intent = intent
+    st.session_state.loaded["location"] = ((request,), {
+        name: intent[name] for name in ("city", "state", "country", "clarifications")
+    })
+    st.session_state.loaded["destination_guess"] = ((intent["city"],), codes[0] if codes else None)
+    if codes:
+        st.session_state.destination_code = codes[0]
+    if intent["start_date"]:
+        st.session_state.depart_date = intent["start_date"]
+        st.session_state.return_date = intent["end_date"]
+    return intent
+
+def go_to(step):
+    if step in ON_ENTER:
+        ON_ENTER[step]()
+    # Jobs only start once their inputs are known, so this is a no-op until then
+    kick_prefetch()
+    st.session_state.step = step
+    save_plan()
+    st.rerun()
+
 # Helper to go back
 def go_back(step):
     st.session_state.step = step
+    save_plan()
 
 # Quick summary function
 def show_summary():
@@ -73,27 +249,236 @@ def show_summary():
     if st.session_state.return_date:
         st.write(f"Return: {st.session_state.return_date}")
     if st.session_state.flight_choice:
-        st.write(f"Chosen Flight: {st.session_state.flight_choice}")
+        st.write(f"Chosen Flight: {st.session_state.flight_choice.label}")
     if st.session_state.hotel_choice:
-        st.write(f"Chosen Hotel Offer: {st.session_state.hotel_choice}")
+        st.write(f"Chosen Hotel Offer: {st.session_state.hotel_choice.label}")
     if st.session_state.activity_choices:
         st.write("Chosen Activities:")
         for a in st.session_state.activity_choices:
-            st.write(f" - {a}")
+            st.write(f" - {a.label}")
 
     current_step = st.session_state.step
     current_step_price = st.session_state.price_at_steps.get(current_step, 0)
     st.write(f"**Total Price:** ${current_step_price}")
 
 # ------------------------------------------------
-# STEP 0: Destination Only (Assume origin = DTW)
+# Fragments: parts of a step that rerun on their own when their widgets change
+# ------------------------------------------------
+@st.fragment
+def flight_picker(flights_data):
+    # flights_data is a FlightTable built once in the background;
+    # filters and sorting below are array operations, no new searches
+    low, high = flights_data.price_range()
+    stops_col, price_col = st.columns(2)
+    max_stops = stops_col.selectbox(
+        "Stops", [None, 0, 1, 2],
+        format_func=lambda s: {None: "Any", 0: "Nonstop only"}.get(s, f"Up to {s}"),
+        key="flight_max_stops"
+    )
+    max_price = price_col.slider("Max price ($)", int(low), int(high) + 1, int(high) + 1,
+                                 key="flight_max_price")
+    hours_col, sort_col = st.columns(2)
+    depart_between = hours_col.slider("Departure time (hour)", 0, 23, (0, 23),
+                                      key="flight_depart_hours")
+    sort = sort_col.selectbox("Sort by", ["price", "duration", "departure", "best"],
+                              key="flight_sort")
+    carriers = st.multiselect("Airlines", flights_data.carrier_codes, key="flight_carriers")
+
+    mask = flights_data.mask(
+        max_price=max_price,
+        max_stops=max_stops,
+        depart_between=None if depart_between == (0, 23) else depart_between,
+        carriers=carriers
+    )
+    ranked = flights_data.rank(sort, mask, limit=20)
+    st.caption(f"{int(mask.sum())} of {len(flights_data)} flights match")
+
+    # The radio works on stable offer IDs rather than label strings
+    chosen_id = st.radio(
+        "Choose a flight:",
+        ranked,
+        format_func=lambda fid: flights_data[fid].label(),
+        key="flight_options"
+    ) if ranked else None
+
+    if chosen_id and st.button("Confirm Flight", key="confirm_flight_step4"):
+        chosen = flights_data[chosen_id]
+        st.session_state.price_at_steps[5] = st.session_state.price_at_steps[4] + (chosen.price or 0)
+        st.session_state.flight_choice = Pick.of(chosen, chosen.summary())
+        go_to(5)
+
+@st.fragment
+def hotel_search(hotel_count):
+    from agents.hotel_agent import get_hotel_offers, get_hotel_offers_bulk
+    from helpers.offers import parse_hotel_offers
+    from helpers.hotel_catalog import get_hotel_catalog
+    catalog = get_hotel_catalog()
+
+    if st.radio(
+        "How do you want to search?",
+        ["Cheapest offers across the city", "Pick a hotel"],
+        key="hotel_search_mode"
+    ) == "Cheapest offers across the city":
+        bulk_key = ("bulk_offers", st.session_state.destination_code,
+                    st.session_state.depart_date, st.session_state.return_date)
+        bulk_offers = payloads.get(bulk_key)
+        if bulk_offers is None:
+            if st.button(f"Search all {hotel_count} hotels", key="bulk_offers_button"):
+                progress = st.progress(0.0)
+                payloads.put(bulk_key, get_hotel_offers_bulk(
+                    catalog.hotels(st.session_state.destination_code),
+                    check_in=st.session_state.depart_date,
+                    check_out=st.session_state.return_date or None,
+                    on_progress=lambda done, total: progress.progress(done / total)
+                ))
+                st.rerun()
+        elif not bulk_offers:
+            st.write("No offers available in this city for your dates.")
+        else:
+            chosen_id = st.radio(
+                "Cheapest offers:",
+                bulk_offers.ids[:20],
+                format_func=lambda oid: bulk_offers[oid].label(),
+                key="bulk_offers_radio"
+            )
+            if st.button("Confirm Hotel Offer", key="confirm_bulk_offer"):
+                chosen = bulk_offers[chosen_id]
+                st.session_state.price_at_steps[6] = st.session_state.price_at_steps[5] + chosen.price
+                st.session_state.hotel_choice = Pick.of(chosen)
+                go_to(6)
+    else:
+        # One page of the local catalog at a time instead of every hotel
+        city_code = st.session_state.destination_code
+        search_col, chain_col, rating_col, sort_col = st.columns([3, 1, 1, 1])
+        prefix = search_col.text_input("Search hotels by name", key="hotel_search")
+        chain = chain_col.selectbox("Chain", [""] + catalog.chains(city_code),
+                                    format_func=lambda c: c or "Any", key="hotel_chain")
+        min_rating = rating_col.selectbox("Min. stars", [0, 2, 3, 4, 5],
+                                          format_func=lambda r: "Any" if not r else f"{r}+",
+                                          key="hotel_min_rating")
+        sort = sort_col.selectbox("Sort by", ["distance", "name", "rating"], key="hotel_sort")
+
+        page_size = 20
+        _, total = catalog.query(city_code, prefix, chain, min_rating, limit=0)
+        pages = max(1, -(-total // page_size))
+        # Back to the first page whenever the filters change
+        filters = (city_code, prefix, chain, min_rating, sort)
+        if st.session_state.get("hotel_filters") != filters:
+            st.session_state.hotel_filters = filters
+            st.session_state.hotel_page = 1
+        elif st.session_state.get("hotel_page", 1) > pages:
+            # The city's hotel list was refreshed with fewer hotels
+            st.session_state.hotel_page = pages
+        # The page lives in session state (key), so no default value here
+        page = st.number_input(f"Page (of {pages})", 1, pages, key="hotel_page")
+        page_hotels, total = catalog.query(city_code, prefix, chain, min_rating, sort=sort,
+                                           limit=page_size, offset=(page - 1) * page_size)
+        hotels_by_id = {h["hotel_id"]: h for h in page_hotels}
+        if not hotels_by_id:
+            st.write("No hotels match your search.")
+            chosen_hotel = None
+        else:
+            chosen_hotel = st.selectbox(
+                f"Pick a Hotel to see offers ({total} matching):",
+                list(hotels_by_id),
+                format_func=lambda hid: f"{hotels_by_id[hid]['name']} ({hid})",
+                key="hotel_selectbox"
+            )
+
+        if chosen_hotel and st.button("See Offers for Hotel", key="see_offers_button"):
+            offers = get_hotel_offers(
+                [chosen_hotel],
+                check_in=st.session_state.depart_date,
+                check_out=st.session_state.return_date or None
+            )
+            # Parsed once per search and kept across reruns
+            st.session_state.hotel_offers_key = ("hotel_offers", chosen_hotel,
+                                                 st.session_state.depart_date,
+                                                 st.session_state.return_date)
+            if not payloads.put(st.session_state.hotel_offers_key, parse_hotel_offers(
+                offers, {h["hotelId"]: h for h in catalog.hotels(city_code, [chosen_hotel])}
+            )):
+                st.write("No offers for that hotel or error.")
+
+        hotel_offers = payloads.get(st.session_state.get("hotel_offers_key"))
+        if hotel_offers:
+            chosen_id = st.radio(
+                "Choose a hotel offer:",
+                hotel_offers.ids,
+                format_func=lambda oid: hotel_offers[oid].label(),
+                key="hotel_offers_radio"
+            )
+            if st.button("Confirm Hotel Offer", key="confirm_hotel_offer"):
+                chosen = hotel_offers[chosen_id]
+                st.session_state.price_at_steps[6] = st.session_state.price_at_steps[5] + (chosen.price or 0)
+                st.session_state.hotel_choice = Pick.of(chosen)
+                go_to(6)
+
+@st.fragment
+def activity_picker(acts_data):
+    chosen_ids = [
+        act.id for act in acts_data
+        if st.checkbox(act.label(), key=f"act_{act.id}_step6")
+    ]
+
+    if st.button("Confirm Activities", key="confirm_activities_step6"):
+        st.session_state.activity_choices = [Pick.of(acts_data[aid]) for aid in chosen_ids]
+        from helpers.trip_optimizer import to_usd
+        activities_price = sum(to_usd(acts_data[aid].price, acts_data[aid].currency) or 0
+                               for aid in chosen_ids)
+        st.session_state.price_at_steps[7] = st.session_state.price_at_steps[6] + activities_price
+        go_to(7)
+
+@st.fragment
+def budget_planner():
+    # Works only on offers already fetched: flights and activities from the
+    # background lookups, hotel offers from the Step 5 searches
+    from helpers.trip_optimizer import optimize_trip, to_usd
+    bulk_key = ("bulk_offers", st.session_state.destination_code,
+                st.session_state.depart_date, st.session_state.return_date)
+    hotel_offers = list(payloads.get(st.session_state.get("hotel_offers_key")) or [])
+    hotel_offers += list(payloads.get(bulk_key) or [])
+    budget_col, travellers_col = st.columns(2)
+    intent = st.session_state.get("trip_intent") or {}
+    stated = intent.get("budget") and to_usd(intent["budget"], intent["currency"])
+    budget = budget_col.number_input("Total budget ($)", 100, 100000,
+                                     min(max(int(stated or 3000), 100), 100000), step=100,
+                                     key="planner_budget")
+    travellers = travellers_col.number_input("Travellers", 1, 9, min(intent.get("adults", 1), 9),
+                                             key="planner_travellers")
+    price_col, time_col, activity_col = st.columns(3)
+    weights = {
+        "price": price_col.slider("Saving money", 0.0, 2.0, 1.0, key="planner_w_price"),
+        "duration": time_col.slider("Short flights", 0.0, 2.0, 0.5, key="planner_w_duration"),
+        "activity": activity_col.slider("More activities", 0.0, 2.0, 0.3, key="planner_w_activity"),
+    }
+    trips = optimize_trip(
+        prefetched_result("flights").offers,
+        hotel_offers,
+        prefetched_result("activities")["activities"],
+        budget, k=5, travellers=travellers, weights=weights
+    )
+    if not trips:
+        st.write("No combination of the offers found so far fits this budget.")
+    for rank, trip in enumerate(trips, start=1):
+        st.markdown(f"**Option {rank}: ${trip['total']:.2f}** (${trip['per_traveller']:.2f} per traveller)")
+        st.markdown(trip["flight"].label())
+        if trip["hotel"]:
+            st.write(trip["hotel"].label())
+        for activity in trip["activities"]:
+            st.write(f" - {activity.label()}")
+
+# ------------------------------------------------
+# STEP 0: Destination and origin
 # ------------------------------------------------
 if st.session_state.step == 0:
     st.subheader("Step 1: Destination")
-    st.write("Origin is assumed to be **DTW** (Detroit).")
-    st.session_state.origin_code = "DTW"  # Hardcode
 
-    loc_input = st.text_input("Where do you want to go?")
+    loc_input = st.text_input("Where do you want to go?",
+                              placeholder="Lisbon, Portugal - or: 4 nights in Lisbon mid-May, 2 adults, under $2k")
+    origin_input = st.text_input("Flying from (city or airport code)",
+                                 value=st.session_state.origin_raw or DEFAULT_ORIGIN,
+                                 key="origin_input")
 
 
     if st.button("Submit Location", key="submit_location_step0"):
@@ -101,9 +486,15 @@ if st.session_state.step == 0:
             st.warning("Please enter a location.")
         else:
             st.session_state.location_raw = loc_input.strip()
-            st.session_state.step = 1
-            #Reruns webpage
-            st.rerun()
+            st.session_state.origin_raw = origin_input.strip()
+            st.session_state.trip_intent = None
+            # A plain place name is parsed locally in Step 1; anything more
+            # is read in one go, dates and travellers included
+            from helpers.fast_parse import fast_parse_location
+            if fast_parse_location(st.session_state.location_raw) is None:
+                read_trip_intent(st.session_state.location_raw)
+            #Parses the location, then reruns webpage
+            go_to(1)
 
     show_summary()
 
@@ -115,25 +506,27 @@ elif st.session_state.step == 1:
     st.subheader("Step 1: Confirm your location")
     st.write("We’ll use the LLM to parse the location string you provided.")
 
-    loc_parsed = parse_location(st.session_state.conversation_chain, st.session_state.location_raw)
-    st.session_state.location_parsed = loc_parsed
+    # Parsed on the way into this step (enter_location)
+    loc_parsed = st.session_state.location_parsed
 
     city = loc_parsed.get("city", "") or ""
     state = loc_parsed.get("state", "") or ""
     country = loc_parsed.get("country", "") or ""
     clarifications = loc_parsed.get("clarifications", "")
-    st.session_state.coordinate_search = f'{city } {state}, {country}'
-    st.session_state.city = city
 
     st.write(f"**City**: {city}")
     st.write(f"**State/Province**: {state}")
     st.write(f"**Country**: {country}")
+    intent = st.session_state.get("trip_intent")
+    if intent:
+        st.write(f"**Travellers**: {intent['adults']}")
+        if intent["budget"]:
+            st.write(f"**Budget**: {intent['budget']:,.0f} {intent['currency']}")
     if clarifications:
         st.warning(f"Clarifications: {clarifications}")
 
     if st.button("Confirm Location", key="confirm_location_step1"):
-        st.session_state.step = 2
-        st.rerun()
+        go_to(2)
     if st.button("Back", key="back_step1"):
         go_back(0)
 
@@ -144,16 +537,44 @@ elif st.session_state.step == 1:
 # ------------------------------------------------
 elif st.session_state.step == 2:
     st.subheader("Step 2: Confirm Airport Codes")
-    dest_guess = guess_airport_code(st.session_state.city)
-
-    st.write(f"Origin (hard-coded): DTW")
-    st.write(f"Guessed destination: {dest_guess}")
-
-    if st.button("Confirm these codes", key="confirm_codes_step2"):
-        st.session_state.origin_code = "DTW"
+    dest_guess = load("destination_guess", _guess_airport, st.session_state.city)
+    intent = st.session_state.get("trip_intent")
+    candidates = intent["airport_codes"] if intent and intent["city"] == st.session_state.city else []
+
+    from helpers.airport_index import get_airport_index
+    index = get_airport_index()
+    origin_text = st.text_input("Origin airport (code or city)", value=st.session_state.origin_code,
+                                key="origin_code_step2").strip()
+    # A known code is taken as typed; anything else is resolved like the Step 0 origin
+    if len(origin_text) == 3 and index.has_code(origin_text):
+        origin = origin_text.upper()
+    else:
+        origin = (load("origin_step2", _guess_airport, origin_text) or "") if origin_text else ""
+    if not origin:
+        st.warning(f"No airport found for '{origin_text or st.session_state.origin_raw or DEFAULT_ORIGIN}'; "
+                   "enter an IATA code or a city.")
+    elif origin != origin_text.upper():
+        st.caption(f"Origin airport: {origin}")
+    if len(candidates) > 1:
+        dest_guess = st.selectbox("Destination airport", candidates, key="dest_candidates")
+    else:
+        st.write(f"Guessed destination: {dest_guess}")
+
+    # Fan-out: every route between airports near either end, searched at once
+    nearby = st.checkbox("Also search nearby airports", value=bool(st.session_state.nearby_km),
+                         key="nearby_step2")
+    radius = st.slider("Within (km)", 25, 300, st.session_state.nearby_km or 100, step=25,
+                       key="nearby_km_step2", disabled=not nearby)
+    if nearby and origin and dest_guess:
+        from agents.flight_agent import NEARBY_AIRPORTS
+        st.caption(f"Searches {', '.join(index.nearby_airports(origin, radius, NEARBY_AIRPORTS))} → "
+                   f"{', '.join(index.nearby_airports(dest_guess, radius, NEARBY_AIRPORTS))}")
+
+    if st.button("Confirm these codes", key="confirm_codes_step2", disabled=not origin):
+        st.session_state.origin_code = origin
         st.session_state.destination_code = dest_guess or ""
-        st.session_state.step = 3
-        st.rerun()
+        st.session_state.nearby_km = radius if nearby else 0
+        go_to(3)
 
     if st.button("Back", key="back_step2"):
         go_back(1)
@@ -166,8 +587,13 @@ elif st.session_state.step == 2:
 elif st.session_state.step == 3:
     st.subheader("Step 3: Travel Dates")
 
-    dep = st.date_input("Departure Date", key="dep_date")
-    ret = st.date_input("Return Date", key="ret_date")
+    # Pre-filled when the trip request already named the dates
+    dep = st.date_input("Departure Date", key="dep_date",
+                        value=date.fromisoformat(st.session_state.depart_date)
+                        if st.session_state.depart_date else "today")
+    ret = st.date_input("Return Date", key="ret_date",
+                        value=date.fromisoformat(st.session_state.return_date)
+                        if st.session_state.return_date else "today")
 
     if st.button("Next", key="next_dates_step3"):
         # Convert the date objects to strings
@@ -178,8 +604,7 @@ elif st.session_state.step == 3:
         else:
             st.session_state.return_date = ""
 
-        st.session_state.step = 4
-        st.rerun()
+        go_to(4)
 
     if st.button("Back", key="back_step3"):
         go_back(2)
@@ -194,61 +619,45 @@ elif st.session_state.step == 4:
     if not st.session_state.origin_code or not st.session_state.destination_code:
         st.error("Missing airport codes. Go back and fix.")
     else:
-        flights_data = find_flights(
-            st.session_state.origin_code,
-            st.session_state.destination_code,
-            st.session_state.depart_date,
-            st.session_state.return_date or None
-        )
-        if not flights_data:
+        flights_data = prefetched_result("flights")
+        if not len(flights_data):
             st.write("No flights found or an error occurred.")
         else:
-            flight_summaries = []  # we'll store user-friendly labels here
-            flight_prices = []
-            for f in flights_data:
-                flight_id = f.get("id", "UnknownID")
-                price = f.get("price", {}).get("grandTotal", "??")
-                flight_prices.append(float(price))
-                # Build a summary string:
-                # 1. Show flight ID, total price
-                summary_lines = [f"**Flight {flight_id}** - **${price}**"]
-
-                # 2. For each itinerary, show segment details
-                itineraries = f.get("itineraries", [])
-                for idx_it, itin in enumerate(itineraries, start=1):
-                    segments = itin.get("segments", [])
-                    summary_lines.append(f"_Itinerary {idx_it}_:")
-
-
-                    for idx_seg, seg in enumerate(segments, start=1):
-                        dep_iata = seg.get("departure", {}).get("iataCode", "")
-                        dep_time = seg.get("departure", {}).get("at", "")
-                        arr_iata = seg.get("arrival", {}).get("iataCode", "")
-                        arr_time = seg.get("arrival", {}).get("at", "")
-                        dur = seg.get("duration", "??")
-                        carrier = seg.get("carrierCode", "")
-                        flight_num = seg.get("number", "")
-
-                        segment_line = (
-                            f"  - Segment {idx_seg}: {dep_iata} ({dep_time}) → "
-                            f"{arr_iata} ({arr_time}), {dur}, Airline {carrier}, Flight {flight_num}"
-                        )
-                        summary_lines.append(segment_line)
-
-                # Join lines into a single multi-line string. 
-                # We can use Markdown formatting or just plain text.
-                flight_summary = "\n".join(summary_lines)
-                flight_summaries.append(flight_summary)
-
-            # Now present them in a radio:
-            chosen_summary = st.radio("Choose a flight:", flight_summaries, key="flight_options")
-
-            if st.button("Confirm Flight", key="confirm_flight_step4"):
-                chosen_index = flight_summaries.index(chosen_summary)
-                st.session_state.price_at_steps[5] = st.session_state.price_at_steps[4] + flight_prices[chosen_index]
-                st.session_state.flight_choice = chosen_summary
-                st.session_state.step = 5
-                st.rerun()
+            flight_picker(flights_data)
+
+        with st.expander("Flexible dates: cheapest fares within ±3 days"):
+            flex_key = ("fare_matrix", st.session_state.origin_code,
+                        st.session_state.destination_code,
+                        st.session_state.depart_date, st.session_state.return_date)
+            if st.button("Search nearby dates", key="flex_search_step4"):
+                from agents.flight_agent import find_flexible_flights
+                with st.spinner("Searching the date grid..."):
+                    payloads.put(flex_key, find_flexible_flights(
+                        st.session_state.origin_code,
+                        st.session_state.destination_code,
+                        st.session_state.depart_date,
+                        st.session_state.return_date or None
+                    ))
+
+            matrix = payloads.get(flex_key)
+            if matrix:
+                st.table([
+                    {"Depart": dep, **{
+                        (ret or "One-way"): (f"${price:.0f}" if price is not None else "-")
+                        for ret, price in zip(matrix["return_dates"], row)
+                    }}
+                    for dep, row in zip(matrix["departure_dates"], matrix["prices"])
+                ])
+                if matrix["cheapest"]:
+                    dep, ret = matrix["cheapest"]
+                    cheapest = matrix["best"][matrix["cheapest"]]
+                    st.write(f"Cheapest: depart {dep}" + (f", return {ret}" if ret else "")
+                             + f" for ${cheapest.price:.2f}")
+                    if st.button("Use these dates", key="flex_use_step4"):
+                        st.session_state.depart_date = dep
+                        st.session_state.return_date = ret or ""
+                        kick_prefetch()
+                        st.rerun()
 
     if st.button("Back", key="back_step4"):
         go_back(3)
@@ -265,67 +674,12 @@ elif st.session_state.step == 5:
         st.error("No destination code. Go back.")
     else:
         st.write("Searching hotels by city code:", st.session_state.destination_code)
-        hotels_data = get_hotels_in_city(st.session_state.destination_code, radius_km=10)
-        
-        if not hotels_data:
+        hotel_count = prefetched_result("hotels")
+
+        if not hotel_count:
             st.write("No hotels found or error.")
         else:
-            hotel_names = []
-            hotel_ids = []
-            for h in hotels_data:
-                hname = h.get("name", "Unknown Hotel")
-                hid = h.get("hotelId", "")
-                label = f"{hname} ({hid})"
-                hotel_names.append(label)
-                hotel_ids.append(hid)
-	
-            chosen_hotel = st.selectbox("Pick a Hotel to see offers:", hotel_names, key="hotel_selectbox")
-            offer_summaries = []
-            offer_prices = []
-            
-            if st.button("See Offers for Hotel", key="see_offers_button"):
-                idx = hotel_names.index(chosen_hotel)
-                selected_id = hotel_ids[idx]
-                offers = get_hotel_offers(
-                    [selected_id],
-                    check_in=st.session_state.depart_date,
-                    check_out=st.session_state.return_date or None
-                )
-                if not offers:
-                    st.write("No offers for that hotel or error.")
-                else:
-                    st.session_state.offers = offers  # Persist offers
-                    # Process offers into summaries and prices
-                    offer_summaries = []
-                    offer_prices = []
-                    for item in offers:
-                        if "offers" in item:
-                            for o in item["offers"]:
-                                oid = o.get("id", "N/A")
-                                price = o.get("price", {}).get("total", "??")
-                                summary = f"Offer ID: {oid} - Price: ${price}"
-                                offer_summaries.append(summary)
-                                try:
-                                    offer_prices.append(float(price))
-                                except:
-                                    offer_prices.append(0)
-                    st.session_state.offer_summaries = offer_summaries
-                    st.session_state.offer_prices = offer_prices
-                    if "offer_summaries" in st.session_state and st.session_state.offer_summaries:
-                        chosen_offer_summary = st.radio(
-                            "Choose a hotel offer:",
-                            st.session_state.offer_summaries,
-                            key="hotel_offers_radio"
-                        )
-                        if st.button("Confirm Hotel Offer", key="confirm_hotel_offer"):
-                            chosen_index = st.session_state.offer_summaries.index(chosen_offer_summary)
-                            st.session_state.price_at_steps[5] = st.session_state.price_at_steps[4] + st.session_state.offer_prices[chosen_index]
-                            confirmed_summary = f"Confirmed Hotel Offer: {chosen_offer_summary}"
-                            st.session_state.hotel_choice = confirmed_summary
-                            st.session_state.step = 6
-                            st.rerun()
-                    else:
-                        st.write("No offers available for selection.")
+            hotel_search(hotel_count)
 
     if st.button("Back", key="back_step5"):
         go_back(4)
@@ -337,31 +691,18 @@ elif st.session_state.step == 5:
 # ------------------------------------------------
 elif st.session_state.step == 6:
     st.subheader("Step 6: Activities")
-    # We use Nominatim (via geocode_place) on the raw DESTINATION
-    geo = geocode_place(st.session_state.coordinate_search)
+    # Nominatim (via geocode_place) on the raw DESTINATION, then activities
+    # around it; usually already fetched in the background since Step 1
+    nearby = prefetched_result("activities")
+    geo = nearby["geo"]
     if not geo:
         st.write("Could not geocode your destination. Try again or skip activities.")
     else:
-        lat, lon = geo["latitude"], geo["longitude"]
-        acts_data = find_activities(lat, lon, radius_km=5)
+        acts_data = nearby["activities"]
         if not acts_data:
             st.write("No activities found or error.")
         else:
-            chosen_acts = []
-            for i, act in enumerate(acts_data):
-                #print(act)
-                aname = act.get("name", "Unknown Activity")
-                price = act.get("price", {}).get("amount", "??")
-                act_label = f"{aname} (${price})"
-                if st.checkbox(act_label, key=f"act_{i}_step6"):
-                    chosen_acts.append(act_label)
-
-            if st.button("Confirm Activities", key="confirm_activities_step6"):
-                st.session_state.activity_choices = chosen_acts
-                #TODO: add in price of activities
-                st.session_state.price_at_steps[7] = st.session_state.price_at_steps[6]
-                st.session_state.step = 7
-                st.rerun()
+            activity_picker(acts_data)
 
     if st.button("Back"):
         go_back(5)
@@ -375,6 +716,8 @@ elif st.session_state.step == 7:
     st.subheader("Final Step: Review Your Trip")
     show_summary()
     st.success("All steps complete!")
+    with st.expander("Best trips within a budget"):
+        budget_planner()
     st.write("If you need to change something, go back to a previous step.")
     for s in range(0, 7):
         if st.button(f"Back to Step {s}", key=f"back_to_step_{s}"):
@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Tests never reach OpenAI, Amadeus or Nominatim: the stub backend answers
+# with synthetic data, and the on-disk caches live in a throwaway directory.
+# Set before any helpers module reads its settings at import time.
+_cache_dir = tempfile.mkdtemp(prefix="travelbot-tests-")
+os.environ.update(
+    TRAVELBOT_BACKEND="stub",
+    TRAVELBOT_WARMUP="0",
+    TRAVELBOT_CACHE_PATH=os.path.join(_cache_dir, "cache.sqlite3"),
+    TRAVELBOT_CATALOG_PATH=os.path.join(_cache_dir, "hotels.sqlite3"),
+    OPENAI_API_KEY="test",
+    AMADEUS_API_KEY="test",
+    AMADEUS_API_SECRET="test",
+)
+
+APP = os.path.join(ROOT, "streamlit_app.py")
+
+
+@pytest.fixture
+def app():
+    """
+    A fresh run of streamlit_app.py under Streamlit's AppTest.
+    """
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_file(APP, default_timeout=60)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """
+    An empty in-memory response cache standing in for the shared one.
+    """
+    from helpers import response_cache
+    fresh = response_cache.ResponseCache(":memory:")
+    monkeypatch.setattr(response_cache, "_cache", fresh)
+    return fresh
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """
+    A log of the (service, method, url) of every exchange sent through the
+    backend, i.e. every call that would have reached a real service.
+    """
+    from helpers.backends import get_backend
+    backend = get_backend()
+    exchange = backend.exchange
+    sent = []
+
+    def recording(service, method, url, *args, **kwargs):
+        sent.append((service, method, url))
+        return exchange(service, method, url, *args, **kwargs)
+
+    monkeypatch.setattr(backend, "exchange", recording)
+    return sent
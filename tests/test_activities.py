@@ -0,0 +1,47 @@
+import pytest
+from agents import activities_agent
+from helpers import resilience
+from helpers.geo import covering_tiles, haversine_km, tile_precision
+
+PARIS = (48.8566, 2.3522)
+
+
+@pytest.fixture
+def searches(monkeypatch, cache, upstream):
+    """
+    Fresh breakers plus the activity searches sent to Amadeus.
+    """
+    monkeypatch.setattr(resilience, "_endpoints", {})
+    return upstream
+
+
+def sent(upstream):
+    return [url for _, _, url in upstream if "/shopping/activities" in url]
+
+
+def test_tiles_span_the_search_diameter():
+    assert tile_precision(PARIS[0], 5) == 4
+    assert tile_precision(PARIS[0], 0.5) == 5
+    for lat, lon in (PARIS, (35.68, 139.76), (-33.92, 18.42), (39.74, -104.99)):
+        assert len(covering_tiles(lat, lon, 5, tile_precision(lat, 5))) <= 4
+
+
+def test_cold_search_makes_a_call_per_tile_and_warm_search_none(searches):
+    tiles = covering_tiles(*PARIS, 5, tile_precision(PARIS[0], 5))
+    cold = activities_agent.find_activities(*PARIS, radius_km=5)
+    assert len(sent(searches)) == len(tiles) <= 4
+
+    warm = activities_agent.find_activities(*PARIS, radius_km=5)
+    assert warm == cold
+    assert len(sent(searches)) == len(tiles)
+
+
+def test_nearby_search_reuses_cached_tiles(searches):
+    activities_agent.find_activities(*PARIS, radius_km=5)
+    cold_calls = len(sent(searches))
+    # 1 km east: same tile size, overlapping circle
+    nearby = activities_agent.find_activities(PARIS[0], PARIS[1] + 0.0137, radius_km=5)
+    assert len(sent(searches)) - cold_calls < cold_calls
+    for activity in nearby:
+        geo = activity["geoCode"]
+        assert haversine_km(PARIS[0], PARIS[1] + 0.0137, geo["latitude"], geo["longitude"]) <= 5
@@ -0,0 +1,62 @@
+import pytest
+from agents.flight_agent import guess_airport_code
+from helpers.airport_index import get_airport_index, CONFIDENT_SCORE, AMBIGUOUS_SCORE
+
+
+@pytest.fixture
+def index():
+    return get_airport_index()
+
+
+def codes(matches):
+    return [m["iataCode"] for m in matches]
+
+
+@pytest.mark.parametrize("query, code", [
+    ("Paris", "PAR"),
+    ("paris, france", "PAR"),
+    ("PAR", "PAR"),
+    ("CDG", "CDG"),
+    ("Lisboa", "LIS"),
+    ("zurich", "ZRH"),
+    ("Zürich", "ZRH"),
+    ("São Paulo", "SAO"),
+    ("New York", "NYC"),
+    ("Portland, Oregon", "PDX"),
+    ("Barcelna", "BCN"),
+])
+def test_confident_matches_are_answered_locally(index, query, code):
+    assert index.guess_code(query) == code
+
+
+def test_city_comes_with_its_airports(index):
+    matches = index.search("Paris")
+    assert matches[0]["subType"] == "CITY"
+    assert {"CDG", "ORY"} <= set(codes(matches))
+    assert matches[0]["address"]["countryCode"] == "FR"
+
+
+@pytest.mark.parametrize("query", ["Portland", "Paris, Texas"])
+def test_ambiguous_matches_stay_below_the_confident_score(index, query):
+    matches = index.search(query)
+    assert matches and max(m["score"] for m in matches) <= AMBIGUOUS_SCORE < CONFIDENT_SCORE
+    assert index.guess_code(query) is None
+
+
+def test_unknown_places_have_no_match(index):
+    assert index.search("Smallville") == []
+    assert index.search("  ") == []
+
+
+def test_nearby_airports(index):
+    assert set(index.nearby_airports("NYC")) <= {"JFK", "LGA", "EWR", "HPN", "ISP"}
+    assert len(index.nearby_airports("NYC", limit=2)) == 2
+    assert index.nearby_airports("ZZZ") == ["ZZZ"]
+    assert index.has_code("lis") and not index.has_code("ZZZ")
+
+
+def test_only_unknown_places_reach_amadeus(cache, upstream):
+    assert guess_airport_code("Lisbon, Portugal") == "LIS"
+    assert upstream == []
+    assert guess_airport_code("Smallville") is not None
+    assert [url for _, _, url in upstream if "/reference-data/locations" in url]
@@ -0,0 +1,63 @@
+import socket
+import threading
+import urllib.error
+import pytest
+from helpers.amadeus_pool import PooledTransport
+
+RESPONSES = {
+    "bad status line": b"HELLO\r\n\r\n",
+    "truncated body": b"HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\n{\"data\": [",
+    "no response": b"",
+}
+
+
+@pytest.fixture
+def server():
+    """
+    A local server answering each connection with 'reply' and hanging up.
+    Yields a function taking the reply and returning the server's URL.
+    """
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    reply = []
+
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            with conn:
+                conn.recv(65536)
+                conn.sendall(reply[0])
+
+    threading.Thread(target=serve, daemon=True).start()
+
+    def answering(data):
+        reply[:] = [data]
+        return f"http://127.0.0.1:{listener.getsockname()[1]}/v1/shopping/activities"
+
+    yield answering
+    listener.close()
+
+
+@pytest.mark.parametrize("data", RESPONSES.values(), ids=RESPONSES.keys())
+def test_broken_responses_surface_as_url_errors(server, data):
+    transport = PooledTransport(timeout=5)
+    with pytest.raises(urllib.error.URLError):
+        transport.send("GET", server(data), {})
+
+
+def test_refused_connections_surface_as_url_errors():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    with pytest.raises(urllib.error.URLError):
+        PooledTransport(timeout=5).send("GET", f"http://127.0.0.1:{port}/", {})
+
+
+def test_well_formed_responses_are_returned(server):
+    url = server(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: close\r\n\r\n{}")
+    status, _, _, body = PooledTransport(timeout=5).send("GET", url, {})
+    assert (status, body) == (200, b"{}")
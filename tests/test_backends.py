@@ -0,0 +1,87 @@
+import json
+import random
+import pytest
+from helpers.backends import Backend, FixtureMissing, LatencyModel, request_key, _parse_map
+
+URL = "https://test.api.amadeus.com/v1/reference-data/locations?keyword=LISBON&subType=CITY"
+
+
+class Upstream:
+    """
+    A fake live service: records the requests it gets and answers 200.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, method, url, headers, body):
+        self.calls.append(url)
+        return 200, "OK", [("Content-Type", "application/json")], b'{"data": [{"iataCode": "LIS"}]}'
+
+
+def test_request_key_ignores_headers_query_order_and_json_layout():
+    key = request_key("amadeus", "get", URL, {"Authorization": "Bearer a"}, None)
+    reordered = URL.replace("keyword=LISBON&subType=CITY", "subType=CITY&keyword=LISBON")
+    assert request_key("amadeus", "GET", reordered, {"Authorization": "Bearer b"}, None) == key
+    assert request_key("openai", "POST", URL, {}, b'{"b": 1, "a": 2}') == \
+        request_key("openai", "POST", URL, {}, '{"a": 2,  "b": 1}')
+
+
+def test_recorded_responses_replay_without_the_network(tmp_path):
+    upstream = Upstream()
+    recorded = Backend("record", fixtures_dir=str(tmp_path)).exchange("amadeus", "GET", URL, {}, None, upstream)
+    assert len(upstream.calls) == 1
+    [fixture] = (tmp_path / "amadeus").iterdir()
+    assert json.loads(fixture.read_text())["status"] == 200
+
+    replayed = Backend("replay", fixtures_dir=str(tmp_path)).exchange("amadeus", "GET", URL, {}, None, upstream)
+    assert replayed[0] == 200 and replayed[3] == recorded[3]
+    assert len(upstream.calls) == 1
+
+
+def test_missing_fixtures(tmp_path):
+    replay = Backend("replay", fixtures_dir=str(tmp_path))
+    assert replay.exchange("amadeus", "GET", URL, {}, None, Upstream())[0] == 404
+    strict = Backend("replay", fixtures_dir=str(tmp_path), strict=True)
+    with pytest.raises(FixtureMissing):
+        strict.exchange("amadeus", "GET", URL, {}, None, Upstream())
+
+
+def test_token_exchanges_are_never_recorded(tmp_path):
+    default = (200, "OK", [], b'{"access_token": "replay-token"}')
+    Backend("record", fixtures_dir=str(tmp_path)).exchange(
+        "amadeus", "POST", URL, {}, b"grant_type=x", Upstream(), replay_default=default)
+    assert not (tmp_path / "amadeus").exists()
+    replay = Backend("replay", fixtures_dir=str(tmp_path), strict=True)
+    assert replay.exchange("amadeus", "POST", URL, {}, b"", Upstream(), replay_default=default) == default
+
+
+def test_injected_errors_and_rate_limits():
+    failing = Backend("stub", error_rate={"amadeus": 1.0})
+    assert failing.exchange("amadeus", "GET", URL, {}, None, Upstream())[0] == 500
+    limited = Backend("stub", rate_limit_rate={"*": 1.0})
+    status, _, headers, _ = limited.exchange("nominatim", "GET", URL, {}, None, Upstream())
+    assert status == 429 and ("Retry-After", "1") in headers
+    assert limited.stats["nominatim"]["rate_limited"] == 1
+
+
+def test_stub_answers_every_service_offline():
+    stub = Backend("stub")
+    upstream = Upstream()
+    status, _, _, body = stub.exchange("amadeus", "GET", URL, {}, None, upstream)
+    assert status == 200 and json.loads(body)["data"]
+    status, _, _, body = stub.exchange(
+        "nominatim", "GET", "https://nominatim.openstreetmap.org/search?q=lisbon&format=json", {}, None, upstream)
+    assert status == 200 and json.loads(body)[0]["lat"]
+    assert upstream.calls == []
+
+
+def test_latency_models():
+    rng = random.Random(1)
+    assert LatencyModel("fixed:120").sample(rng) == 0.12
+    assert all(0.05 <= LatencyModel("uniform:50:400").sample(rng) <= 0.4 for _ in range(50))
+    assert LatencyModel("lognormal:300:0").sample(rng) == pytest.approx(0.3)
+    with pytest.raises(ValueError):
+        LatencyModel("gamma:1")
+    latency = _parse_map("amadeus=fixed:10,fixed:5", LatencyModel)
+    assert set(latency) == {"amadeus", "*"}
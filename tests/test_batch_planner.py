@@ -0,0 +1,52 @@
+import json
+import pytest
+import batch_planner
+from helpers import resilience
+
+TRIPS = [
+    {"id": "t1", "destination": "Lisbon, Portugal", "depart_date": "2026-12-12", "return_date": "2026-12-16"},
+    {"id": "t2", "destination": "Porto, Portugal", "dates": "December 3-6", "origin": "Detroit"},
+    {"id": "t3", "destination": "Lisbon, Portugal"},
+]
+
+
+@pytest.fixture
+def trips(tmp_path, monkeypatch, cache):
+    """
+    An input file of TRIPS (plus a garbled line) and where to write the plans.
+    """
+    monkeypatch.setattr(resilience, "_endpoints", {})
+    path = tmp_path / "trips.jsonl"
+    lines = [json.dumps(trip) for trip in TRIPS]
+    path.write_text("\n".join(lines[:2] + ["not json", ""] + lines[2:]) + "\n")
+    return path, tmp_path / "plans.jsonl"
+
+
+def plans(path):
+    return {r["id"]: r for r in map(json.loads, path.read_text().splitlines())}
+
+
+def test_every_trip_gets_one_result(trips):
+    source, output = trips
+    summary = batch_planner.run(str(source), str(output), workers=2, top=3)
+    assert (summary["ok"], summary["error"], summary["skipped"]) == (2, 1, 0)
+
+    results = plans(output)
+    assert set(results) == {"t1", "t2", "t3"}
+    lisbon = results["t1"]
+    assert (lisbon["origin_code"], lisbon["destination_code"]) == ("DTW", "LIS")
+    assert lisbon["depart_date"] == "2026-12-12"
+    assert 0 < len(lisbon["flights"]) <= 3 and 0 < len(lisbon["hotels"]) <= 3
+    assert results["t2"]["destination_code"] == "OPO"
+    assert results["t2"]["depart_date"] == "2026-12-03"
+    assert results["t3"] == {**results["t3"], "status": "error", "error": "ValueError: no departure date"}
+
+
+def test_rerun_only_retries_unfinished_trips(trips):
+    source, output = trips
+    output.write_text(json.dumps({"id": "t1", "status": "ok"}) + "\n" + '{"id": "t2", "sta')
+    summary = batch_planner.run(str(source), str(output), workers=2)
+    assert (summary["ok"], summary["error"], summary["skipped"]) == (1, 1, 1)
+    assert batch_planner.planned_ids(str(output)) == {"t1", "t2"}
+    # New results start on their own line after the half-written one
+    assert output.read_text().splitlines()[1] == '{"id": "t2", "sta'
@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+import pytest
+from agents.flight_agent import find_flexible_flights
+from helpers import resilience
+
+
+@pytest.fixture
+def searches(monkeypatch, cache, upstream):
+    """
+    Fresh breakers plus a count of the flight searches sent to Amadeus.
+    """
+    monkeypatch.setattr(resilience, "_endpoints", {})
+    return lambda: sum(1 for _, _, url in upstream if "/shopping/flight-offers" in url)
+
+
+def day(offset):
+    return (date.today() + timedelta(days=offset)).isoformat()
+
+
+def test_grid_has_the_cheapest_fare_per_date_pair(searches):
+    grid = find_flexible_flights("DTW", "LIS", day(30), day(34), days=1)
+    assert grid["departure_dates"] == [day(29), day(30), day(31)]
+    assert grid["return_dates"] == [day(33), day(34), day(35)]
+    assert searches() == 9
+
+    prices = [p for row in grid["prices"] for p in row if p is not None]
+    assert prices
+    cheapest = grid["cheapest"]
+    assert grid["best"][cheapest].price == min(prices)
+    for (dep, ret), offer in grid["best"].items():
+        row, column = grid["departure_dates"].index(dep), grid["return_dates"].index(ret)
+        assert grid["prices"][row][column] == offer.price
+
+
+def test_repeated_grid_is_served_from_the_cache(searches):
+    first = find_flexible_flights("DTW", "OPO", day(40), day(44), days=1)
+    calls = searches()
+    second = find_flexible_flights("DTW", "OPO", day(40), day(44), days=1)
+    assert searches() == calls
+    assert second["prices"] == first["prices"]
+
+
+def test_past_departures_and_returns_before_departure_are_skipped(searches):
+    grid = find_flexible_flights("DTW", "MAD", day(1), day(2), days=2)
+    assert grid["departure_dates"] == [day(0), day(1), day(2), day(3)]
+    # Only return dates after the departure are searched
+    expected = sum(1 for dep in grid["departure_dates"] for ret in grid["return_dates"] if ret > dep)
+    assert searches() == expected
+    for dep, ret in grid["best"]:
+        assert ret > dep
+
+
+def test_one_way_grid(searches):
+    grid = find_flexible_flights("DTW", "BCN", day(20), days=1)
+    assert grid["return_dates"] == [None]
+    assert len(grid["prices"]) == 3 and all(len(row) == 1 for row in grid["prices"])
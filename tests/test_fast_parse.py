@@ -0,0 +1,67 @@
+from datetime import date
+import pytest
+from helpers import fast_parse
+from helpers.fast_parse import fast_parse_location, fast_parse_dates
+from helpers.llm_helpers import get_conversation_chain, parse_location, parse_dates
+
+TODAY = date(2026, 3, 1)
+
+
+@pytest.mark.parametrize("text, city, state, country", [
+    ("Paris", "Paris", "", "France"),
+    ("Paris, France", "Paris", "", "France"),
+    ("Tokyo, Japan", "Tokyo", "", "Japan"),
+    ("Denver, Colorado", "Denver", "Colorado", "United States"),
+    ("Portland, OR", "Portland", "Oregon", "United States"),
+])
+def test_known_places_are_parsed_locally(text, city, state, country):
+    assert fast_parse_location(text) == {"city": city, "state": state, "country": country,
+                                         "clarifications": ""}
+
+
+@pytest.mark.parametrize("text", [
+    "Portland", "Springfield", "Paris, TX", "Paris, Germany", "somewhere warm", "", "a, b, c, d",
+])
+def test_ambiguous_or_unknown_places_are_left_to_the_llm(text):
+    assert fast_parse_location(text) is None
+
+
+@pytest.mark.parametrize("text, start, end", [
+    ("2026-05-12 to 2026-05-20", "2026-05-12", "2026-05-20"),
+    ("March 6-10", "2026-03-06", "2026-03-10"),
+    ("6 to 10 March 2027", "2027-03-06", "2027-03-10"),
+    ("from the 3rd of June until the 9th of June", "2026-06-03", "2026-06-09"),
+    ("5/12/2026", "2026-05-12", ""),
+    ("Jan 3 - Feb 2", "2027-01-03", "2027-02-02"),
+    ("Dec 28 to Jan 4", "2026-12-28", "2027-01-04"),
+])
+def test_explicit_dates_are_parsed_locally(text, start, end):
+    parsed = fast_parse_dates(text, today=TODAY)
+    assert (parsed["start_date"], parsed["end_date"]) == (start, end)
+
+
+@pytest.mark.parametrize("text", [
+    "next weekend", "in two weeks", "Feb 30", "May 20 to May 10 2026", "March 6, 8 and 10", "",
+])
+def test_fuzzy_or_invalid_dates_are_left_to_the_llm(text):
+    assert fast_parse_dates(text, today=TODAY) is None
+
+
+def test_clarifications_say_what_was_assumed():
+    assert "Year not given" in fast_parse_dates("March 6-10", today=TODAY)["clarifications"]
+    assert "month/day/year" in fast_parse_dates("5/12/2026", today=TODAY)["clarifications"]
+
+
+def test_only_the_llm_tier_calls_openai(cache, upstream, monkeypatch):
+    monkeypatch.setattr(fast_parse, "_tier_counts", {})
+    chain = get_conversation_chain()
+    parse_location(chain, "Lisbon, Portugal")
+    parse_dates(chain, "March 6-10", today=TODAY)
+    assert upstream == []
+
+    parse_location(chain, "the capital of Hungary")
+    parse_dates(chain, "next weekend", today=TODAY)
+    assert [service for service, _, _ in upstream] == ["openai", "openai"]
+    stats = fast_parse.tier_stats()
+    assert stats["location"] == {"fast": 1, "llm": 1, "fast_share": 0.5}
+    assert stats["dates"] == {"fast": 1, "llm": 1, "fast_share": 0.5}
@@ -0,0 +1,70 @@
+import math
+import pytest
+from agents.flight_agent import find_flights
+from helpers import resilience
+from helpers.flight_ranking import FlightTable
+from helpers.offers import parse_flight_offers
+
+
+def offer(offer_id, price, hours, stops=0, carrier="TP", departs="09:00"):
+    segments = [{"departure": {"iataCode": "DTW", "at": f"2026-05-12T{departs}:00"},
+                 "arrival": {"iataCode": "LIS", "at": "2026-05-12T23:00:00"},
+                 "carrierCode": carrier if n == 0 else "DL", "number": str(n), "duration": "PT1H"}
+                for n in range(stops + 1)]
+    return {"id": offer_id, "price": {"grandTotal": price, "currency": "USD"},
+            "itineraries": [{"duration": f"PT{hours}H", "segments": segments}]}
+
+
+@pytest.fixture
+def table():
+    return FlightTable(parse_flight_offers([
+        offer("cheap", "300", 14, stops=2, departs="06:00"),
+        offer("fast", "600", 7, carrier="DL", departs="18:30"),
+        offer("middle", "400", 9, stops=1, departs="11:00"),
+        offer("unpriced", "n/a", 8),
+    ]))
+
+
+def test_columns(table):
+    assert len(table) == 4 and table["fast"].price == 600
+    assert list(table.stops) == [2, 0, 1, 0]
+    assert list(table.dep_hour) == [6, 18, 11, 9]
+    assert table.carrier_codes == ("DL", "TP")
+    assert table.price_range() == (300.0, 600.0)
+    assert math.isnan(table.price[3])
+
+
+@pytest.mark.parametrize("sort, expected", [
+    ("price", ["cheap", "middle", "fast", "unpriced"]),
+    ("duration", ["fast", "unpriced", "middle", "cheap"]),
+    ("departure", ["cheap", "unpriced", "middle", "fast"]),
+])
+def test_sorts(table, sort, expected):
+    assert table.rank(sort) == expected
+
+
+def test_filters(table):
+    assert table.rank(mask=table.mask(max_stops=0)) == ["fast", "unpriced"]
+    assert table.rank(mask=table.mask(max_price=450)) == ["cheap", "middle"]
+    assert table.rank(mask=table.mask(depart_between=(8, 12))) == ["middle", "unpriced"]
+    # Offers with any leg on another airline are dropped
+    assert table.rank(mask=table.mask(carriers={"TP"})) == ["unpriced"]
+    assert table.rank(mask=table.mask(carriers={"DL"})) == ["fast"]
+    assert table.rank(mask=table.mask(max_price=100)) == []
+    assert table.rank(limit=2) == ["cheap", "middle"]
+
+
+def test_ranking_stub_search_matches_a_plain_sort(monkeypatch, cache):
+    monkeypatch.setattr(resilience, "_endpoints", {})
+    offers = parse_flight_offers(find_flights("DTW", "LIS", "2026-12-12", "2026-12-16"))
+    table = FlightTable(offers)
+    assert len(table) == len(offers) > 1
+
+    cap = sorted(o.price for o in offers)[len(offers) // 2]
+    expected = sorted((o for o in offers if o.price <= cap and o.stops <= 1),
+                      key=lambda o: (o.price, o.total_minutes))
+    ranked = table.rank("price", table.mask(max_price=cap, max_stops=1))
+    assert [offers[i].price for i in ranked] == [o.price for o in expected]
+    assert set(ranked) == {o.id for o in expected}
+    best = table.rank("best")
+    assert sorted(best) == sorted(offers.ids)
@@ -0,0 +1,46 @@
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from helpers import geocoder, resilience, scheduler
+
+
+@pytest.fixture
+def nominatim(monkeypatch, cache):
+    """
+    Fresh breaker and geocode lane (10 requests/s) plus a log of the
+    queries actually sent upstream.
+    """
+    monkeypatch.setattr(resilience, "_endpoints", {})
+    monkeypatch.setitem(scheduler.RATES, "geocode", 10.0)
+    monkeypatch.setitem(scheduler._lanes, "geocode", scheduler._Lane("geocode", 10.0))
+    sent = []
+    fetch = geocoder._fetch
+    monkeypatch.setattr(geocoder, "_fetch", lambda query: sent.append((query, time.monotonic())) or fetch(query))
+    return sent
+
+
+def test_lookups_are_normalized_and_cached(nominatim):
+    first = geocoder.geocode_place("Paris ,  France")
+    assert set(first) == {"latitude", "longitude", "display_name"}
+    assert geocoder.geocode_place("paris, france") == first
+    assert [q for q, _ in nominatim] == ["paris, france"]
+
+
+def test_requests_are_held_to_the_rate(nominatim):
+    for i in range(15):
+        geocoder.geocode_place(f"town {i}")
+    times = [t for _, t in nominatim]
+    # A burst of 10, then one request every 0.1 s
+    assert times[-1] - times[0] >= 0.4
+
+
+def test_queueing_for_the_rate_does_not_use_up_the_deadline(nominatim, monkeypatch):
+    # 12 distinct lookups at 10/s queue for over a second; the deadline is
+    # a fraction of that but only starts once a lookup has its turn
+    monkeypatch.setitem(resilience.POLICIES, "geocode", (0.3, 1, False))
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        results = list(pool.map(geocoder.geocode_place, [f"village {i}" for i in range(12)]))
+    assert all(results)
+    assert len(nominatim) == 12
+    breaker = resilience._endpoint("geocode").breaker
+    assert breaker.state == "closed" and breaker.failures == 0
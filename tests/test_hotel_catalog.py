@@ -0,0 +1,99 @@
+import sqlite3
+from datetime import date, timedelta
+import pytest
+from helpers.hotel_catalog import HotelCatalog
+
+
+def hotel(hotel_id, name, rating="3", chain="HI", lat=38.72, lon=-9.14):
+    return {"hotelId": hotel_id, "name": name, "rating": rating, "chainCode": chain,
+            "geoCode": {"latitude": lat, "longitude": lon},
+            "distance": {"value": 1.5, "unit": "KM"}}
+
+
+@pytest.fixture
+def catalog():
+    return HotelCatalog(":memory:")
+
+
+def names(catalog, city, prefix="", **kwargs):
+    return sorted(h["name"] for h in catalog.query(city, prefix, **kwargs)[0])
+
+
+def test_same_hotel_listed_for_two_cities(catalog):
+    catalog.load("LIS", [hotel("H1", "Tagus Riverside"), hotel("H2", "Alfama Inn")])
+    catalog.load("OPO", [hotel("H1", "Tagus Riverside Porto"), hotel("H3", "Ribeira Suites")])
+    assert names(catalog, "LIS") == ["Alfama Inn", "Tagus Riverside"]
+    assert names(catalog, "OPO") == ["Ribeira Suites", "Tagus Riverside Porto"]
+    assert names(catalog, "LIS", "riverside") == ["Tagus Riverside"]
+
+    # Reloading one city leaves the other alone
+    catalog.load("OPO", [hotel("H3", "Ribeira Suites")])
+    assert names(catalog, "LIS", "tagus") == ["Tagus Riverside"]
+    assert names(catalog, "OPO", "tagus") == []
+
+
+def test_hotel_listed_twice_keeps_only_its_last_name(catalog):
+    assert catalog.load("LIS", [hotel("H1", "Old Name Hotel"), hotel("H1", "Fresh Name Hotel")]) == 1
+    assert names(catalog, "LIS", "fresh") == ["Fresh Name Hotel"]
+    assert names(catalog, "LIS", "old") == []
+    assert catalog.query("LIS", "hotel")[1] == 1
+
+
+def test_ratings_are_parsed_defensively(catalog):
+    catalog.load("LIS", [hotel("A", "Four", "4"), hotel("B", "Four and a half", "4.5"),
+                         hotel("C", "Unrated", "N/A"), hotel("D", "Blank", ""),
+                         hotel("E", "Missing", None), hotel("F", "Two", 2)])
+    ratings = {h["name"]: h["rating"] for h in catalog.query("LIS")[0]}
+    assert ratings == {"Four": 4, "Four and a half": 4.5, "Unrated": None,
+                       "Blank": None, "Missing": None, "Two": 2}
+    assert names(catalog, "LIS", min_rating=4) == ["Four", "Four and a half"]
+
+
+def test_catalog_from_before_per_city_keys_is_rebuilt(tmp_path):
+    path = str(tmp_path / "hotels.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.executescript("""
+            CREATE TABLE hotels (hotel_id TEXT PRIMARY KEY, city_code TEXT NOT NULL,
+                name TEXT NOT NULL, name_folded TEXT NOT NULL, chain_code TEXT NOT NULL,
+                rating INTEGER, lat REAL, lon REAL, distance_km REAL, raw TEXT NOT NULL);
+            CREATE TABLE cities (city_code TEXT PRIMARY KEY, refreshed_at REAL NOT NULL,
+                hotel_count INTEGER NOT NULL);
+            INSERT INTO cities VALUES ('LIS', 0, 1);
+        """)
+    catalog = HotelCatalog(path)
+    catalog.load("LIS", [hotel("H1", "Alfama Inn")])
+    catalog.load("OPO", [hotel("H1", "Ribeira Inn")])
+    assert names(catalog, "LIS") == ["Alfama Inn"]
+    assert names(catalog, "OPO") == ["Ribeira Inn"]
+
+
+def test_hotel_page_is_owned_by_session_state(app, monkeypatch):
+    from streamlit.elements.lib import policies
+    warnings = []
+    monkeypatch.setattr(policies, "_shown_default_value_warning", False)
+    monkeypatch.setattr(policies._LOGGER, "warning", lambda *args: warnings.append(args))
+
+    app.run()
+    app.text_input[0].input("Lisbon, Portugal")
+    app.button(key="submit_location_step0").click().run()
+    app.button(key="confirm_location_step1").click().run()
+    app.button(key="confirm_codes_step2").click().run()
+    depart = date.today() + timedelta(days=30)
+    app.date_input(key="dep_date").set_value(depart)
+    app.date_input(key="ret_date").set_value(depart + timedelta(days=4))
+    app.button(key="next_dates_step3").click().run()
+    app.button(key="confirm_flight_step4").click().run()
+    assert app.session_state["step"] == 5
+
+    app.radio(key="hotel_search_mode").set_value("Pick a hotel").run()
+    assert app.number_input(key="hotel_page").value == 1
+    app.number_input(key="hotel_page").set_value(3).run()
+    assert app.number_input(key="hotel_page").value == 3
+    first_on_page_3 = app.selectbox(key="hotel_selectbox").value
+
+    # Changing a filter goes back to the first page
+    app.selectbox(key="hotel_sort").set_value("name").run()
+    assert app.number_input(key="hotel_page").value == 1
+    assert app.selectbox(key="hotel_selectbox").value != first_on_page_3
+    assert not app.exception
+    assert not warnings
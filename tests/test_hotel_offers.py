@@ -0,0 +1,47 @@
+from urllib.parse import urlsplit, parse_qs
+import pytest
+from agents.hotel_agent import get_hotels_in_city, get_hotel_offers_bulk
+from helpers import resilience
+
+
+@pytest.fixture
+def searches(monkeypatch, cache, upstream):
+    """
+    Fresh breakers plus the hotel IDs of each offer search sent to Amadeus.
+    """
+    monkeypatch.setattr(resilience, "_endpoints", {})
+
+    def sent():
+        return [parse_qs(urlsplit(url).query)["hotelIds"][0].split(",")
+                for _, _, url in upstream if "/shopping/hotel-offers" in url]
+    return sent
+
+
+def test_whole_city_is_searched_in_chunks(searches):
+    hotels = get_hotels_in_city("LIS")
+    progress = []
+    offers = get_hotel_offers_bulk(hotels, "2026-05-12", "2026-05-16", chunk_size=20,
+                                   on_progress=lambda done, total: progress.append((done, total)))
+
+    chunks = searches()
+    assert sorted(hid for chunk in chunks for hid in chunk) == sorted(h["hotelId"] for h in hotels)
+    assert all(len(chunk) <= 20 for chunk in chunks)
+    assert progress == [(n, len(chunks)) for n in range(1, len(chunks) + 1)]
+
+    prices = [(o.price, o.distance_km) for o in offers]
+    assert prices and prices == sorted(prices)
+    assert {o.hotel_id for o in offers} <= {h["hotelId"] for h in hotels}
+
+
+def test_repeated_bulk_search_is_served_from_the_cache(searches):
+    hotels = get_hotels_in_city("OPO")
+    first = get_hotel_offers_bulk(hotels, "2026-05-12", "2026-05-16")
+    calls = len(searches())
+    second = get_hotel_offers_bulk(hotels, "2026-05-12", "2026-05-16")
+    assert len(searches()) == calls
+    assert first.ids == second.ids
+
+
+def test_no_hotels_means_no_search(searches):
+    assert len(get_hotel_offers_bulk([], "2026-05-12", "2026-05-16")) == 0
+    assert searches() == []
@@ -0,0 +1,54 @@
+import sys
+import subprocess
+import pytest
+from conftest import ROOT
+from helpers import resilience
+from helpers.session_store import snapshot_plan
+from helpers.warmup import warm_up
+
+HEAVY = ("langchain", "langchain_community", "openai", "amadeus", "requests", "numpy", "tiktoken")
+
+FIRST_PAGE = f"""
+import sys
+sys.path.insert(0, "tests")
+from conftest import APP
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(APP, default_timeout=60).run()
+assert not app.exception
+print(",".join(m for m in {HEAVY!r} if m in sys.modules))
+"""
+
+
+def test_first_page_renders_without_the_heavy_dependencies():
+    # A fresh interpreter, since this one has imported them all already
+    out = subprocess.run([sys.executable, "-c", FIRST_PAGE], cwd=ROOT, capture_output=True,
+                         text=True, timeout=120, check=True).stdout
+    assert out.strip() == ""
+
+
+def test_warm_up_builds_the_shared_clients_offline(upstream):
+    from helpers.llm_helpers import get_chat_model
+    timings = warm_up()
+    assert set(timings) == {"imports", "llm", "amadeus", "nominatim", "airport_index", "caches"}
+    assert upstream == []
+    assert get_chat_model() is get_chat_model()
+
+
+def test_picker_widgets_make_no_external_calls(app, cache, upstream, monkeypatch):
+    monkeypatch.setattr(resilience, "_endpoints", {})
+    app.query_params["trip"] = snapshot_plan({
+        "step": 3, "location_raw": "Lisbon", "city": "Lisbon",
+        "location_parsed": {"city": "Lisbon", "state": "", "country": "Portugal", "clarifications": ""},
+        "origin_code": "DTW", "destination_code": "LIS",
+        "depart_date": "2026-12-12", "return_date": "2026-12-16",
+    })
+    app.run()
+    app.button(key="next_dates_step3").click().run()
+    assert app.session_state["step"] == 4
+    assert any("/shopping/flight-offers" in url for _, _, url in upstream)
+
+    sent = len(upstream)
+    app.selectbox(key="flight_sort").select("duration").run()
+    app.selectbox(key="flight_max_stops").set_value(0).run()
+    assert not app.exception
+    assert len(upstream) == sent
@@ -0,0 +1,111 @@
+import json
+from datetime import date
+import pytest
+from helpers.backends import get_backend
+from helpers.llm_helpers import (
+    get_conversation_chain, extract_structured, cached_extract, parse_location, parse_dates,
+    LOCATION_FIELDS, LOCATION_PROMPT
+)
+
+
+@pytest.fixture
+def prompts(monkeypatch, cache):
+    """
+    The JSON bodies of the requests sent to OpenAI.
+    """
+    backend = get_backend()
+    exchange = backend.exchange
+    sent = []
+
+    def recording(service, method, url, headers, body, *args, **kwargs):
+        if service == "openai":
+            sent.append(json.loads(body))
+        return exchange(service, method, url, headers, body, *args, **kwargs)
+
+    monkeypatch.setattr(backend, "exchange", recording)
+    return sent
+
+
+class Reply:
+    def __init__(self, content):
+        self.content = content
+
+
+class FixedLLM:
+    """
+    Stands in for the chat model, answering every call with 'content'.
+    """
+
+    def __init__(self, content):
+        self.content = content
+
+    def invoke(self, messages, **kwargs):
+        return Reply(self.content)
+
+
+def test_extraction_is_one_history_free_strict_schema_call(prompts):
+    chain = get_conversation_chain()
+    chain.memory.chat_memory.add_user_message("Earlier small talk about the weather")
+    result = parse_location(chain, "the capital of Hungary")
+
+    assert set(result) == set(LOCATION_FIELDS)
+    [request] = prompts
+    assert len(request["messages"]) == 1
+    assert "weather" not in request["messages"][0]["content"]
+    schema = request["response_format"]["json_schema"]
+    assert schema["strict"] is True
+    assert schema["schema"]["required"] == list(LOCATION_FIELDS)
+    assert schema["schema"]["additionalProperties"] is False
+    # The conversation's memory is neither sent nor added to
+    assert len(chain.memory.chat_memory.messages) == 1
+
+
+def test_malformed_output_raises_value_error():
+    with pytest.raises(ValueError):
+        extract_structured(FixedLLM("Sure! The city is Budapest."), "prompt", "location", LOCATION_FIELDS)
+    assert extract_structured(FixedLLM('{"city": "Budapest"}'), "prompt", "location",
+                              LOCATION_FIELDS) == {"city": "Budapest"}
+
+
+def test_failed_llm_location_parse_reports_the_error(cache):
+    class Chain:
+        llm = FixedLLM("no json here")
+    result = parse_location(Chain(), "the capital of Hungary")
+    assert result["city"] == "" and "Could not parse" in result["clarifications"]
+
+
+def test_repeated_extractions_are_served_from_the_cache(prompts, cache):
+    first = parse_location(get_conversation_chain(), "the capital of Hungary")
+    # A new session asking the same thing reuses the answer
+    assert parse_location(get_conversation_chain(), "the capital of Hungary") == first
+    assert len(prompts) == 1
+    assert cache.stats["llm_location"]["hits"] == 1
+
+
+def test_relative_dates_are_cached_per_day(prompts):
+    chain = get_conversation_chain()
+    parse_dates(chain, "next weekend", today=date(2026, 5, 1))
+    parse_dates(chain, "next weekend", today=date(2026, 5, 1))
+    assert len(prompts) == 1
+    parse_dates(chain, "next weekend", today=date(2026, 5, 2))
+    assert len(prompts) == 2
+    assert "Today is 2026-05-02" in prompts[1]["messages"][0]["content"]
+
+
+def test_prompt_changes_start_fresh_entries(cache):
+    llm = FixedLLM('{"city": "Budapest"}')
+    cached_extract(llm, "llm_location", LOCATION_PROMPT, "location", LOCATION_FIELDS, location="x")
+    llm.content = '{"city": "Vienna"}'
+    assert cached_extract(llm, "llm_location", LOCATION_PROMPT, "location", LOCATION_FIELDS,
+                          location="x") == {"city": "Budapest"}
+    assert cached_extract(llm, "llm_location", LOCATION_PROMPT + "Be brief.", "location",
+                          LOCATION_FIELDS, location="x") == {"city": "Vienna"}
+
+
+def test_failed_extractions_are_not_cached(cache):
+    llm = FixedLLM("no json here")
+    with pytest.raises(ValueError):
+        cached_extract(llm, "llm_location", LOCATION_PROMPT, "location", LOCATION_FIELDS, location="x")
+    llm.content = '{"city": "Budapest"}'
+    assert cached_extract(llm, "llm_location", LOCATION_PROMPT, "location", LOCATION_FIELDS,
+                          location="x") == {"city": "Budapest"}
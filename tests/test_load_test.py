@@ -0,0 +1,25 @@
+import os
+import sys
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+from load_test import run_level, saturation  # noqa: E402
+
+
+def level(users, per_min, p95):
+    return {"users": users, "sessions_per_min": per_min, "steps": {"4": {"p95_ms": p95}}}
+
+
+def test_saturation_point():
+    assert saturation([level(1, 10, 100), level(2, 19, 120), level(4, 30, 150)]) is None
+    # Throughput stops growing
+    assert saturation([level(1, 10, 100), level(2, 19, 120), level(4, 20, 150)]) == 4
+    # A step gets more than twice as slow as for one user
+    assert saturation([level(1, 10, 100), level(2, 19, 201)]) == 2
+
+
+def test_concurrent_users_complete_the_flow(tmp_path):
+    result = run_level(users=2, rounds=1, timeout=60, latency="fixed:0", seed=1, cache_dir=str(tmp_path))
+    assert (result["sessions"], result["errors"]) == (2, 0), result["first_error"]
+    assert {str(step) for step in range(7)} <= set(result["steps"])
+    assert result["external_calls_per_session"]["mean"] > 0
@@ -0,0 +1,93 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from helpers import metrics
+
+
+@pytest.fixture(autouse=True)
+def fresh():
+    """
+    Empty metrics, untagged, and no test collectors left behind.
+    """
+    metrics.reset()
+    metrics.set_context(step="", session="")
+    collectors = dict(metrics._collectors)
+    yield
+    metrics._collectors.clear()
+    metrics._collectors.update(collectors)
+    metrics.set_context(step="", session="")
+    metrics.reset()
+
+
+def traces():
+    return json.loads(metrics.export_traces())
+
+
+def test_spans_are_tagged_with_step_and_session():
+    metrics.set_context(step=4, session="abc")
+    with metrics.span("find_flights", route="DTW-LIS"):
+        pass
+    [trace] = traces()
+    assert (trace["name"], trace["step"], trace["session"], trace["route"]) == \
+        ("find_flights", "4", "abc", "DTW-LIS")
+    assert trace["error"] is False
+
+
+def test_failed_spans_count_as_errors_and_reraise():
+    @metrics.traced("lookup")
+    def lookup():
+        raise KeyError("x")
+
+    with pytest.raises(KeyError):
+        lookup()
+    assert traces()[0]["error"] is True
+    assert {"name": "errors", "op": "lookup", "step": "", "value": 1} in metrics.counters()
+
+
+def test_bind_carries_the_tags_into_worker_threads():
+    metrics.set_context(step=5, session="s1")
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(metrics.bind(lambda: metrics.incr("external_calls", service="amadeus"))).result()
+        # Unbound work is untagged
+        pool.submit(lambda: metrics.incr("external_calls", service="amadeus")).result()
+    assert {c["step"]: c["value"] for c in metrics.counters()} == {"5": 1, "": 1}
+
+
+def test_summary_percentiles():
+    for ms in range(1, 101):
+        metrics.observe("parse", ms / 1000)
+    [row] = metrics.span_summary()
+    assert (row["count"], row["p50_ms"], row["p95_ms"], row["p99_ms"]) == (100, 51, 96, 100)
+
+
+def test_prometheus_export(tmp_path):
+    metrics.set_context(step=2)
+    metrics.observe("geocode", 0.02)
+    metrics.observe("geocode", 3.0)
+    metrics.incr("external_calls", service="nominatim")
+    metrics.register_collector("test", lambda: {"coalesced": 3, "lanes": {"geocode": {"depth": 1}}})
+    metrics.register_collector("broken", lambda: 1 / 0)
+
+    path = tmp_path / "travelbot.prom"
+    text = metrics.export_prometheus(str(path))
+    assert path.read_text() == text
+    lines = text.splitlines()
+    assert 'travelbot_span_seconds_bucket{span="geocode",step="2",le="0.025"} 1' in lines
+    assert 'travelbot_span_seconds_bucket{span="geocode",step="2",le="5"} 2' in lines
+    assert 'travelbot_span_seconds_count{span="geocode",step="2"} 2' in lines
+    assert 'travelbot_external_calls_total{service="nominatim",step="2"} 1' in lines
+    assert "travelbot_test_coalesced 3" in lines
+    assert 'travelbot_test_depth{key="lanes",key="geocode"} 1' in lines
+
+
+def test_counters_are_thread_safe():
+    def work():
+        for _ in range(1000):
+            metrics.incr("hits")
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert metrics.counters() == [{"name": "hits", "step": "", "value": 8000}]
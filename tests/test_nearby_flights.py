@@ -0,0 +1,67 @@
+from urllib.parse import urlsplit, parse_qs
+import pytest
+from agents import flight_agent
+from agents.flight_agent import find_nearby_flights
+from helpers import resilience
+from helpers.airport_index import get_airport_index
+
+
+@pytest.fixture
+def routes(monkeypatch, cache, upstream):
+    """
+    Fresh breakers plus the (origin, destination) of each flight search sent to Amadeus.
+    """
+    monkeypatch.setattr(resilience, "_endpoints", {})
+
+    def sent():
+        queries = [parse_qs(urlsplit(url).query) for _, _, url in upstream if "/shopping/flight-offers" in url]
+        return sorted((q["originLocationCode"][0], q["destinationLocationCode"][0]) for q in queries)
+    return sent
+
+
+def test_nearby_airports_are_nearest_first():
+    index = get_airport_index()
+    assert index.nearby_airports("JFK", 100, 3) == ["JFK", "LGA", "EWR"]
+    # A city code has no airport of its own at distance 0
+    assert set(index.nearby_airports("NYC", 100, 10)) >= {"JFK", "LGA", "EWR"}
+    assert index.nearby_airports("LIS", 100, 3) == ["LIS"]
+    assert index.nearby_airports("ZZZ", 100, 3) == ["ZZZ"]
+
+
+def test_every_route_is_searched_and_merged(routes):
+    offers = find_nearby_flights("JFK", "LON", "2026-12-12", "2026-12-16", radius_km=100)
+    index = get_airport_index()
+    expected = sorted((o, d) for o in index.nearby_airports("JFK", 100, flight_agent.NEARBY_AIRPORTS)
+                      for d in index.nearby_airports("LON", 100, flight_agent.NEARBY_AIRPORTS))
+    assert routes() == expected
+
+    assert {offer.id.rsplit("-", 1)[0] for offer in offers} <= {f"{o}-{d}" for o, d in expected}
+    assert len({offer.signature() for offer in offers}) == len(offers)
+    prices = [offer.price for offer in offers]
+    assert prices == sorted(prices)
+
+
+def test_the_same_offer_from_several_routes_is_kept_once(routes, monkeypatch):
+    data = flight_agent.find_flights("JFK", "LHR", "2026-12-12", "2026-12-16")
+    monkeypatch.setattr(flight_agent, "find_flights", lambda *args: data)
+    offers = find_nearby_flights("JFK", "LON", "2026-12-12", "2026-12-16", radius_km=100)
+    assert len(offers) == len(data)
+    assert all(offer.id.startswith(("JFK-LCY-", "JFK-LHR-", "JFK-LTN-")) for offer in offers)
+
+
+def test_origin_city_and_nearby_search_through_the_app(app, routes):
+    app.run()
+    app.text_input[0].input("Lisbon, Portugal")
+    app.text_input(key="origin_input").input("Chicago")
+    app.button(key="submit_location_step0").click().run()
+    assert app.session_state["origin_code"] == "CHI"
+
+    app.button(key="confirm_location_step1").click().run()
+    app.checkbox(key="nearby_step2").check().run()
+    app.button(key="confirm_codes_step2").click().run()
+    assert app.session_state["nearby_km"] == 100
+    app.button(key="next_dates_step3").click().run()
+    assert not app.exception and app.session_state["step"] == 4
+
+    origins = get_airport_index().nearby_airports("CHI", 100, flight_agent.NEARBY_AIRPORTS)
+    assert routes() == sorted((o, "LIS") for o in origins)
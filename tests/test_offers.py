@@ -0,0 +1,72 @@
+import math
+import pickle
+from helpers.offers import (
+    duration_minutes, parse_flight_offers, parse_hotel_offers, parse_activities, Pick
+)
+
+FLIGHT = {
+    "id": "7",
+    "price": {"grandTotal": "412.50", "currency": "EUR"},
+    "itineraries": [
+        {"duration": "PT7H35M", "segments": [
+            {"departure": {"iataCode": "DTW", "at": "2026-05-12T09:00:00"},
+             "arrival": {"iataCode": "JFK", "at": "2026-05-12T11:00:00"},
+             "carrierCode": "DL", "number": "100", "duration": "PT2H"},
+            {"departure": {"iataCode": "JFK", "at": "2026-05-12T13:00:00"},
+             "arrival": {"iataCode": "LIS", "at": "2026-05-13T01:00:00"},
+             "carrierCode": "TP", "number": "200", "duration": "PT7H"},
+        ]},
+        {"duration": "PT8H", "segments": [
+            {"departure": {"iataCode": "LIS", "at": "2026-05-16T10:00:00"},
+             "arrival": {"iataCode": "DTW", "at": "2026-05-16T14:00:00"},
+             "carrierCode": "TP", "number": "201", "duration": "PT8H"},
+        ]},
+    ],
+}
+
+
+def test_durations():
+    assert duration_minutes("PT7H35M") == 455
+    assert duration_minutes("PT45M") == 45
+    assert duration_minutes("PT") is None
+    assert duration_minutes(None) is None
+
+
+def test_flight_offers_are_parsed_once_into_a_model():
+    offers = parse_flight_offers([FLIGHT, {"id": "8", "price": {"grandTotal": "n/a"}}])
+    assert offers.ids == ("7", "8")
+    flight = offers["7"]
+    assert (flight.price, flight.currency, flight.stops) == (412.5, "EUR", 1)
+    assert flight.total_minutes == 455 + 480
+    assert flight.carriers == ("DL", "TP")
+    assert flight.summary() == ("Flight 7: DTW→LIS 2026-05-12 09:00 (1 stop, DL/TP), "
+                                "LIS→DTW 2026-05-16 10:00 (nonstop, TP) - $412.50")
+    assert offers["8"].price is None and math.isnan(offers.prices[1])
+
+
+def test_duplicate_ids_keep_the_first_offer():
+    offers = parse_flight_offers([FLIGHT, {**FLIGHT, "price": {"grandTotal": "1.00"}}])
+    assert len(offers) == 1 and offers["7"].price == 412.5
+
+
+def test_hotel_offers_are_flattened_per_offer():
+    data = [{"hotel": {"hotelId": "H1"}, "offers": [
+        {"id": "A", "price": {"total": "300.00", "currency": "USD"}},
+        {"id": "B", "price": {"total": "280.00", "currency": "USD"}},
+    ]}]
+    offers = parse_hotel_offers(data, {"H1": {"name": "Alfama Inn"}}, distance=lambda hid: 1.25)
+    assert offers.ids == ("A", "B")
+    assert [o.hotel_name for o in offers] == ["Alfama Inn", "Alfama Inn"]
+    assert offers["B"].label() == "Alfama Inn - Offer ID: B - Price: $280.00 (1.2 km)"
+    assert parse_hotel_offers(None).ids == ()
+
+
+def test_activities_and_picks():
+    acts = parse_activities([{"id": 5, "name": "Tram 28 tour",
+                              "price": {"amount": "25", "currencyCode": "EUR"},
+                              "geoCode": {"latitude": "38.71", "longitude": "-9.13"}}])
+    act = acts["5"]
+    assert (act.price, act.currency, act.latitude) == (25.0, "EUR", 38.71)
+    pick = Pick.of(act)
+    assert pick == ("5", 25.0, "EUR", "Tram 28 tour ($25.00)")
+    assert pickle.loads(pickle.dumps(pick)) == pick
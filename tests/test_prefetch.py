@@ -0,0 +1,111 @@
+import time
+import itertools
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from helpers import prefetch, scheduler
+from helpers.prefetch import start_prefetch, prefetched
+
+_names = itertools.count()
+
+
+@pytest.fixture
+def job(monkeypatch):
+    """
+    Register a prefetch job around 'fn' (one input, "city") with a 0.5 s
+    budget, on a private one-worker pool; returns its name.
+    """
+    monkeypatch.setattr(prefetch, "_executor", ThreadPoolExecutor(max_workers=1))
+
+    def register(fn):
+        name = f"test_job_{next(_names)}"
+        monkeypatch.setitem(prefetch.JOBS, name, (("city",), (), fn, 0.5, "empty"))
+        return name
+
+    yield register
+    prefetch._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def priority():
+    return scheduler._priority_of(scheduler._job.get())
+
+
+def test_finished_prefetch_is_used(job):
+    calls = []
+    name = job(lambda city: calls.append(city) or city.upper())
+    slots = {}
+    start_prefetch(slots, {"city": "paris"})
+    slots[name].future.result()
+    assert prefetched(slots, name, {"city": "paris"}) == "PARIS"
+    assert calls == ["paris"]
+
+
+def test_queued_prefetch_runs_at_once_as_interactive(job):
+    # The only worker is busy with other prefetch traffic
+    busy = threading.Event()
+    prefetch._executor.submit(busy.wait, 5)
+    seen = []
+    name = job(lambda city: seen.append((threading.current_thread(), priority())) or city)
+    slots = {}
+    start_prefetch(slots, {"city": "paris"})
+    assert prefetched(slots, name, {"city": "paris"}) == "paris"
+    busy.set()
+    assert seen == [(threading.current_thread(), scheduler.INTERACTIVE)]
+
+
+def test_running_prefetch_is_promoted(job):
+    running, release = threading.Event(), threading.Event()
+    seen = []
+
+    def slow(city):
+        seen.append(priority())
+        running.set()
+        release.wait(2)
+        seen.append(priority())
+        return city
+
+    name = job(slow)
+    slots = {}
+    start_prefetch(slots, {"city": "paris"})
+    running.wait(2)
+    threading.Timer(0.1, release.set).start()
+    assert prefetched(slots, name, {"city": "paris"}) == "paris"
+    assert seen == [scheduler.BACKGROUND, scheduler.INTERACTIVE]
+
+
+def test_failed_prefetch_is_looked_up_again(job):
+    calls = []
+
+    def flaky(city):
+        calls.append(city)
+        if len(calls) == 1:
+            raise RuntimeError("upstream hiccup")
+        return city
+
+    name = job(flaky)
+    slots = {}
+    start_prefetch(slots, {"city": "paris"})
+    while not slots[name].future.done():
+        time.sleep(0.01)
+    assert prefetched(slots, name, {"city": "paris"}) == "paris"
+    assert len(calls) == 2
+
+
+def test_failures_and_timeouts_give_the_empty_value(job):
+    def broken(city):
+        raise RuntimeError("down")
+
+    assert prefetched({}, job(broken), {"city": "paris"}) == "empty"
+
+    name = job(lambda city: time.sleep(2) or city)
+    slots = {}
+    start_prefetch(slots, {"city": "paris"})
+    time.sleep(0.05)
+    start = time.monotonic()
+    assert prefetched(slots, name, {"city": "paris"}) == "empty"
+    assert time.monotonic() - start < 1
+
+
+def test_missing_inputs(job):
+    name = job(lambda city: city)
+    assert prefetched({}, name, {"city": ""}) == "empty"
@@ -0,0 +1,130 @@
+import time
+import pytest
+from helpers import resilience, scheduler
+from helpers.resilience import call, CircuitOpen, DeadlineExceeded, UpstreamError, is_transient
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """
+    A fresh "test_api" endpoint: 0.5 s deadline, two retries, hedging, a
+    breaker opening after 3 failures, and a scheduler lane of 'rate'/s.
+    """
+    monkeypatch.setattr(resilience, "_endpoints", {})
+    monkeypatch.setattr(resilience, "BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(resilience.CircuitBreaker.__init__, "__defaults__", (3, 0.2))
+    monkeypatch.setitem(resilience.POLICIES, "test_api", (0.5, 2, True))
+
+    def lane(rate):
+        monkeypatch.setitem(scheduler.RATES, "test_api", rate)
+        monkeypatch.setitem(scheduler._lanes, "test_api", scheduler._Lane("test_api", rate))
+
+    lane(100.0)
+    return lane
+
+
+def flaky(failures, result="ok", delay=0.0):
+    """
+    A call failing with a transient error 'failures' times, then answering.
+    """
+    calls = []
+
+    def fn():
+        calls.append(time.monotonic())
+        time.sleep(delay)
+        if len(calls) <= failures:
+            raise UpstreamError(503, "unavailable")
+        return result
+
+    fn.calls = calls
+    return fn
+
+
+def test_transient_errors():
+    assert is_transient(UpstreamError(503, "x"))
+    assert is_transient(UpstreamError(429, "x"))
+    assert is_transient(ConnectionResetError())
+    assert not is_transient(UpstreamError(400, "x"))
+    assert not is_transient(ValueError())
+
+
+def test_transient_failures_are_retried(upstream):
+    fn = flaky(2)
+    assert call("test_api", fn) == "ok"
+    assert len(fn.calls) == 3
+
+
+def test_client_errors_are_not_retried(upstream):
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise UpstreamError(400, "bad request")
+
+    with pytest.raises(UpstreamError):
+        call("test_api", bad_request)
+    assert len(calls) == 1
+    assert resilience._endpoint("test_api").breaker.failures == 0
+
+
+def test_deadline(upstream, monkeypatch):
+    monkeypatch.setitem(resilience.POLICIES, "test_api", (0.2, 0, False))
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        call("test_api", flaky(0, delay=1.0))
+    assert time.monotonic() - start < 0.5
+
+
+def test_breaker_opens_and_recovers(upstream):
+    failing = flaky(100)
+    with pytest.raises(UpstreamError):
+        call("test_api", failing)
+    # Three failures open the breaker: calls are refused without going upstream
+    sent = len(failing.calls)
+    with pytest.raises(CircuitOpen):
+        call("test_api", failing)
+    assert len(failing.calls) == sent
+    # After the cool-down one trial call goes through and closes it again
+    time.sleep(0.25)
+    assert call("test_api", flaky(0)) == "ok"
+    assert resilience._endpoint("test_api").breaker.state == "closed"
+
+
+def test_slow_calls_are_hedged(upstream):
+    calls = []
+
+    def first_slow():
+        calls.append(1)
+        time.sleep(0.4 if len(calls) == 1 else 0.0)
+        return len(calls)
+
+    resilience._endpoint("test_api").latencies.extend([0.05] * resilience.HEDGE_MIN_SAMPLES)
+    assert call("test_api", first_slow) == 2
+
+
+def test_hedges_need_a_free_token(upstream):
+    upstream(1.0)
+    scheduler.throttle("test_api")     # the lane's only token
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.3)
+        return "ok"
+
+    resilience._endpoint("test_api").latencies.extend([0.05] * resilience.HEDGE_MIN_SAMPLES)
+    assert call("test_api", slow) == "ok"
+    assert len(calls) == 1
+
+
+def test_retries_wait_for_the_rate_outside_the_deadline(upstream):
+    # 2 requests/s: the lane's burst is spent, so the retry waits ~0.5 s for
+    # its turn, as long as the whole deadline
+    upstream(2.0)
+    scheduler.throttle("test_api")
+    scheduler.throttle("test_api")
+    fn = flaky(1)
+    assert call("test_api", fn) == "ok"
+    assert fn.calls[1] - fn.calls[0] >= 0.4
+    breaker = resilience._endpoint("test_api").breaker
+    assert breaker.state == "closed"
@@ -0,0 +1,74 @@
+import time
+from helpers.response_cache import ResponseCache, cached, make_key
+
+
+def test_keys_ignore_spelling_and_order():
+    assert make_key({"city": "Paris ", "codes": ["ORY", "CDG"], "adults": 2.0}) == \
+        make_key({"adults": 2, "codes": ["cdg", "ory"], "city": "  paris"})
+    assert make_key({"city": "Paris"}) != make_key({"city": "Lyon"})
+
+
+def test_fresh_stale_and_expired_entries():
+    cache = ResponseCache(":memory:")
+    cache.set("ns", "fresh", [1], ttl=60)
+    cache.set("ns", "stale", [2], ttl=0, stale_ttl=60)
+    cache.set("ns", "gone", [3], ttl=0)
+    time.sleep(0.01)
+    assert cache.get("ns", "fresh") == ([1], "fresh")
+    assert cache.get("ns", "stale") == ([2], "stale")
+    assert cache.get("ns", "gone") == (None, None)
+    assert cache.get("other", "fresh") == (None, None)
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(":memory:", max_entries=50)
+    for i in range(100):
+        cache.set("ns", str(i), i, ttl=60)
+    count = cache._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    assert count == 50
+    assert cache.get("ns", "0") == (None, None)
+    assert cache.get("ns", "99") == (99, "fresh")
+
+
+def test_cached_calls_upstream_once(cache):
+    calls = []
+
+    @cached("test_lookup")
+    def lookup(city, adults=1):
+        calls.append(city)
+        return {"city": city, "adults": adults}
+
+    assert lookup("Paris") == {"city": "Paris", "adults": 1}
+    assert lookup(" paris ", adults=1) == {"city": "Paris", "adults": 1}
+    assert calls == ["Paris"]
+
+
+def test_empty_results_are_not_cached(cache):
+    calls = []
+
+    @cached("test_lookup")
+    def lookup(city):
+        calls.append(city)
+        return []
+
+    lookup("Paris")
+    lookup("Paris")
+    assert calls == ["Paris", "Paris"]
+
+
+def test_stale_entries_are_served_and_refreshed(cache):
+    calls = []
+
+    @cached("test_lookup", ttl=0, stale_ttl=60)
+    def lookup(city):
+        calls.append(city)
+        return [len(calls)]
+
+    assert lookup("Paris") == [1]
+    time.sleep(0.01)
+    # Served from cache at once; the refresh runs in the background
+    assert lookup("Paris") == [1]
+    deadline = time.time() + 5
+    while len(calls) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert calls == ["Paris", "Paris"]
@@ -0,0 +1,120 @@
+import time
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from helpers import scheduler
+from helpers.metrics import bind
+from helpers.scheduler import Job, background, promote, scheduled, throttle
+
+
+@pytest.fixture
+def lane(monkeypatch):
+    """
+    A "test_lane" endpoint admitting 5 calls a second, its burst spent.
+    """
+    monkeypatch.setitem(scheduler.RATES, "test_lane", 5.0)
+    monkeypatch.setitem(scheduler._lanes, "test_lane", scheduler._Lane("test_lane", 5.0))
+    for _ in range(5):
+        throttle("test_lane")
+    return scheduler._lanes["test_lane"]
+
+
+def in_background(fn, *args, job=None):
+    with background(job):
+        return fn(*args)
+
+
+def wait_queued(lane, n):
+    deadline = time.monotonic() + 2
+    while len(lane.waiting) < n and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert len(lane.waiting) >= n
+
+
+def test_identical_calls_share_one_request(lane):
+    calls = []
+
+    @scheduled("test_lane")
+    def fetch(city):
+        calls.append(city)
+        time.sleep(0.1)
+        return city.upper()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(fetch, ["paris"] * 4))
+    assert results == ["PARIS"] * 4
+    assert calls == ["paris"]
+
+
+def test_interactive_calls_go_first(lane):
+    order = []
+
+    @scheduled("test_lane")
+    def fetch(name):
+        order.append(name)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        for i in range(3):
+            pool.submit(bind(in_background), fetch, f"background {i}")
+        wait_queued(lane, 3)
+        pool.submit(fetch, "interactive")
+    # Ahead of every background call still queued when it arrived
+    assert order.index("interactive") <= 1
+
+
+def test_joining_interactive_caller_raises_a_shared_request(lane):
+    # A background request is running when a user starts waiting on the
+    # same call; its retry must then go ahead of other background work
+    order = []
+    joined = threading.Event()
+
+    @scheduled("test_lane")
+    def fetch(name):
+        joined.wait(2)
+        throttle("test_lane")          # a retry of the shared request
+        order.append(name)
+        return name
+
+    def other():
+        throttle("test_lane")
+        order.append("other")
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        leader = pool.submit(bind(in_background), fetch, "shared")
+        while not lane.jobs or lane.waiting:
+            time.sleep(0.005)          # the shared request is admitted
+        others = [pool.submit(bind(in_background), other) for _ in range(3)]
+        wait_queued(lane, 3)
+        user = pool.submit(fetch, "shared")
+        while len(next(iter(lane.jobs.values())).waiters) < 2:
+            time.sleep(0.005)
+        joined.set()
+        assert user.result() == leader.result() == "shared"
+        for f in others:
+            f.result()
+    assert order[0] == "shared"
+
+
+def test_promote_moves_queued_work_up(lane):
+    order = []
+    job = Job()
+
+    def waiting(name):
+        throttle("test_lane")
+        order.append(name)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        for i in range(3):
+            pool.submit(bind(in_background), waiting, f"other {i}")
+        wait_queued(lane, 3)
+        pool.submit(bind(in_background), waiting, "promoted", job=job)
+        wait_queued(lane, 4)
+        promote(job)
+    assert order.index("promoted") <= 1
+
+
+def test_non_blocking_throttle(lane):
+    assert not throttle("test_lane", block=False)
+    time.sleep(0.25)
+    assert throttle("test_lane", block=False)
+    assert throttle("no_such_endpoint", block=False)
@@ -0,0 +1,111 @@
+import json
+import zlib
+import base64
+import pytest
+from helpers.offers import Pick
+from helpers.session_store import PayloadStore, snapshot_plan, resume_plan
+
+LOCATION = {"city": "Lisbon", "state": "", "country": "Portugal", "clarifications": ""}
+INTENT = {
+    "city": "Lisbon", "state": "", "country": "Portugal", "clarifications": "",
+    "airport_codes": ["LIS"], "start_date": "2026-11-16", "end_date": "2026-11-20",
+    "nights": 4, "adults": 2, "budget": 2000.0, "currency": "EUR",
+}
+PLAN = {
+    "step": 1, "location_raw": "4 nights in Lisbon", "location_parsed": LOCATION,
+    "city": "Lisbon", "trip_intent": INTENT, "origin_code": "DTW", "depart_date": "2026-11-16",
+    "flight_choice": ["F1", 337.77, "USD", "Flight 1"], "activity_choices": [],
+    "price_at_steps": {str(s): 0 for s in range(8)},
+}
+
+
+def token(plan):
+    raw = json.dumps(plan).encode("utf-8")
+    return base64.urlsafe_b64encode(zlib.compress(raw)).decode("ascii").rstrip("=")
+
+
+def with_changes(**changes):
+    plan = json.loads(json.dumps(PLAN))
+    for key, value in changes.items():
+        if value is KeyError:
+            plan.pop(key)
+        else:
+            plan[key] = value
+    return plan
+
+
+def with_intent(**changes):
+    intent = dict(INTENT)
+    for key, value in changes.items():
+        if value is KeyError:
+            intent.pop(key)
+        else:
+            intent[key] = value
+    return with_changes(trip_intent=intent)
+
+
+BAD_PLANS = {
+    "garbage": "not a token",
+    "not_an_object": token([1, 2]),
+    "step_out_of_range": token(with_changes(step=42)),
+    "step_bool": token(with_changes(step=True)),
+    "no_location": token(with_changes(location_parsed=KeyError)),
+    "null_location": token(with_changes(location_parsed=None)),
+    "location_without_country": token(with_changes(location_parsed={"city": "Lisbon"})),
+    "location_city_not_str": token(with_changes(location_parsed={"city": 1, "state": "", "country": "Portugal"})),
+    "intent_city_only": token(with_changes(trip_intent={"city": "Lisbon"})),
+    "intent_not_object": token(with_changes(trip_intent=[1])),
+    "intent_without_adults": token(with_intent(adults=KeyError)),
+    "intent_adults_str": token(with_intent(adults="2")),
+    "intent_adults_zero": token(with_intent(adults=0)),
+    "intent_without_currency": token(with_intent(currency=KeyError)),
+    "intent_codes_str": token(with_intent(airport_codes="LIS")),
+    "intent_budget_str": token(with_intent(budget="lots")),
+    "intent_bad_date": token(with_intent(start_date="mid-May")),
+    "bad_depart_date": token(with_changes(depart_date="tomorrow")),
+    "nearby_km_str": token(with_changes(nearby_km="far")),
+    "short_offer": token(with_changes(flight_choice=[1, 2])),
+    "prices_list": token(with_changes(price_at_steps=[1])),
+    "prices_missing_steps": token(with_changes(price_at_steps={"0": 1})),
+}
+
+
+def test_round_trip():
+    state = dict(PLAN, flight_choice=Pick("F1", 337.77, "USD", "Flight 1"),
+                 price_at_steps={s: 0 for s in range(8)}, unrelated="dropped")
+    plan = resume_plan(snapshot_plan(state))
+    assert plan["flight_choice"] == Pick("F1", 337.77, "USD", "Flight 1")
+    assert plan["trip_intent"] == INTENT
+    assert plan["price_at_steps"] == {s: 0.0 for s in range(8)}
+    assert "unrelated" not in plan
+
+
+@pytest.mark.parametrize("bad", BAD_PLANS.values(), ids=BAD_PLANS.keys())
+def test_bad_tokens_are_rejected(bad):
+    assert resume_plan(bad) is None
+
+
+@pytest.mark.parametrize("bad", BAD_PLANS.values(), ids=BAD_PLANS.keys())
+def test_bad_tokens_start_a_new_trip(app, bad):
+    app.query_params["trip"] = bad
+    app.run()
+    assert not app.exception
+    assert app.session_state["step"] == 0
+
+
+@pytest.mark.parametrize("step", [1, 2])
+def test_good_token_resumes_with_its_intent(app, step):
+    app.query_params["trip"] = token(with_changes(step=step))
+    app.run()
+    assert not app.exception
+    assert app.session_state["step"] == step
+    assert app.session_state["trip_intent"]["adults"] == 2
+
+
+def test_payload_store_evicts_least_recently_used():
+    store = PayloadStore(max_bytes=2000)
+    for i in range(10):
+        store.put(("flights", i), "x" * 500)
+    assert store.get(("flights", 0)) is None
+    assert store.get(("flights", 9)) == "x" * 500
+    assert store.stats["bytes"] <= 2000
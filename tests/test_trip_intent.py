@@ -0,0 +1,74 @@
+from datetime import date, timedelta
+import pytest
+from helpers.llm_helpers import get_chat_model, stream_trip_intent, _finish_trip_intent, TRIP_FIELDS
+
+TODAY = date(2026, 4, 1)
+REQUEST = "4 nights in Lisbon mid-May, 2 adults, under $2k"
+
+
+class Chunk:
+    def __init__(self, content):
+        self.content = content
+
+
+class StreamingLLM:
+    """
+    Stands in for the chat model, streaming 'content' in 5-character chunks.
+    """
+
+    def __init__(self, content):
+        self.content = content
+        self.calls = 0
+
+    def stream(self, messages, **kwargs):
+        self.calls += 1
+        for i in range(0, len(self.content), 5):
+            yield Chunk(self.content[i:i + 5])
+
+
+def openai_calls(upstream):
+    return sum(1 for service, _, _ in upstream if service == "openai")
+
+
+def test_fields_stream_in_then_the_finished_intent(cache, upstream):
+    *partials, intent = stream_trip_intent(get_chat_model(), REQUEST, today=TODAY)
+    assert [list(p) for p in partials] == [list(TRIP_FIELDS)[:n] for n in range(1, len(TRIP_FIELDS) + 1)]
+    assert partials[0] == {"city": "Lisbon"}
+    assert intent == {**intent, "city": "Lisbon", "airport_codes": ["LIS"], "nights": 4,
+                      "adults": 2, "budget": 2000.0, "currency": "USD"}
+    start = date.fromisoformat(intent["start_date"])
+    assert intent["end_date"] == (start + timedelta(days=4)).isoformat()
+    assert openai_calls(upstream) == 1
+
+    # The same request (modulo whitespace) comes straight from the cache
+    assert list(stream_trip_intent(get_chat_model(), f"  {REQUEST} ", today=TODAY)) == [intent]
+    assert openai_calls(upstream) == 1
+
+
+def test_unparseable_output_raises_and_is_not_cached(cache):
+    llm = StreamingLLM('{"city": "Lisbon", "sta')
+    with pytest.raises(ValueError):
+        list(stream_trip_intent(llm, REQUEST, today=TODAY))
+    llm.content = '{"city": "Lisbon"}'
+    assert list(stream_trip_intent(llm, REQUEST, today=TODAY))[-1]["city"] == "Lisbon"
+    assert llm.calls == 2
+
+
+def test_fields_are_typed_and_checked():
+    intent = _finish_trip_intent({
+        "city": "Lisbon", "airport_codes": "xyz, lis / lis, Lisbon", "start_date": "2026-05-12",
+        "end_date": "mid-May", "nights": "4 nights", "adults": "0", "budget": "$2,500", "currency": "eur",
+    }, TODAY)
+    # Codes the airport index knows come first; words that aren't codes are dropped
+    assert intent["airport_codes"] == ["LIS", "XYZ"]
+    assert (intent["start_date"], intent["end_date"], intent["nights"]) == ("2026-05-12", "2026-05-16", 4)
+    assert (intent["adults"], intent["budget"], intent["currency"]) == (1, 2500.0, "EUR")
+    assert intent["clarifications"] == ""
+
+
+def test_missing_fields_get_defaults():
+    intent = _finish_trip_intent({"city": "Lisbon", "start_date": "2026-03-01", "budget": "2k"}, TODAY)
+    assert intent["airport_codes"] == ["LIS"]
+    assert (intent["end_date"], intent["nights"], intent["adults"]) == ("", None, 1)
+    assert (intent["budget"], intent["currency"]) == (2000.0, "USD")
+    assert intent["clarifications"] == "Start date is in the past."
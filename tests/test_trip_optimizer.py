@@ -0,0 +1,79 @@
+import random
+from itertools import combinations, product
+import pytest
+from helpers.offers import FlightOffer, HotelOffer, Activity
+from helpers.trip_optimizer import optimize_trip, to_usd
+
+# Price and activity count only, so trips can be scored independently
+PRICE_ONLY = {"duration": 0, "stops": 0, "distance": 0}
+
+
+def flight(i, price, currency="USD", hours=8):
+    return FlightOffer({
+        "id": f"F{i}", "price": {"grandTotal": str(price), "currency": currency},
+        "itineraries": [{"duration": f"PT{hours}H", "segments": [
+            {"carrierCode": "TP", "number": str(i), "departure": {"at": "2026-05-12T09:00:00"}}
+        ]}],
+    })
+
+
+def hotel(i, price, currency="USD", distance_km=2.0):
+    return HotelOffer({"id": f"O{i}", "price": {"total": str(price), "currency": currency}},
+                      f"H{i}", f"Hotel {i}", distance_km)
+
+
+def activity(i, price, currency="USD"):
+    return Activity({"id": f"A{i}", "name": f"Activity {i}",
+                     "price": {"amount": str(price), "currencyCode": currency}})
+
+
+@pytest.fixture
+def offers():
+    rng = random.Random(7)
+    return ([flight(i, rng.randint(150, 900)) for i in range(12)],
+            [hotel(i, rng.randint(200, 1500)) for i in range(10)],
+            [activity(i, rng.randint(10, 120)) for i in range(6)])
+
+
+def brute_force(flights, hotels, acts, budget, travellers, rooms):
+    """
+    Scores of the best activity set for each flight and hotel pair, best first.
+    """
+    trips = []
+    for f, h in product(flights, hotels):
+        scores = []
+        for n in range(len(acts) + 1):
+            for chosen in combinations(acts, n):
+                total = f.price * travellers + h.price * rooms + sum(a.price for a in chosen) * travellers
+                if total <= budget:
+                    scores.append(round(-total / budget + 0.3 * n, 4))
+        if scores:
+            trips.append(max(scores))
+    return sorted(trips, reverse=True)
+
+
+@pytest.mark.parametrize("budget", [900, 2500, 4000])
+def test_best_trips_match_exhaustive_search(offers, budget):
+    trips = optimize_trip(*offers, budget, k=5, travellers=2, weights=PRICE_ONLY, resolution=1)
+    assert [t["score"] for t in trips] == brute_force(*offers, budget, 2, 1)[:5]
+
+
+def test_trips_fit_the_budget_in_usd(offers):
+    flights, hotels, acts = offers
+    flights.append(flight(99, 100, "EUR"))
+    acts.append(activity(99, 50, "GBP"))
+    trips = optimize_trip(flights, hotels, acts, 3000, k=5, travellers=3)
+    assert 0 < len(trips) <= 5
+    assert [t["score"] for t in trips] == sorted((t["score"] for t in trips), reverse=True)
+    for trip in trips:
+        total = (to_usd(trip["flight"].price, trip["flight"].currency) * 3
+                 + to_usd(trip["hotel"].price, trip["hotel"].currency) * 2
+                 + sum(to_usd(a.price, a.currency) for a in trip["activities"]) * 3)
+        assert trip["total"] == pytest.approx(total, abs=0.01) and total <= 3000
+
+
+def test_unpriced_and_unaffordable_offers_are_skipped():
+    flights = [flight(0, 5000), FlightOffer({"id": "free", "price": {}})]
+    assert optimize_trip(flights, [hotel(0, 100)], [], 1000) == []
+    assert optimize_trip([flight(1, 300)], [], [], 1000)[0]["hotel"] is None
+    assert optimize_trip([flight(1, 300)], [hotel(0, 100)], [], 0) == []